@@ -12,14 +12,21 @@ bl_info = {
 
 import bpy
 import os
-import subprocess
-import shutil
 from pathlib import Path
-import mathutils
-import winreg
+from bpy.app.handlers import persistent
 from bl_ui.generic_ui_list import draw_ui_list
 import threading
-from io import StringIO
+import json
+import time
+from contextlib import nullcontext
+
+# only what registering needs is imported here, the exporters (numpy), studiomdl
+# handling (subprocess) and winreg are imported where they're used, so enabling
+# the addon stays fast and works on every platform
+from . import game_discovery
+from . import watch
+from . import compile_profile
+from . import workspace
 
 game_select_method_is_dropdown = None
 temp_path = bpy.app.tempdir
@@ -28,6 +35,41 @@ game_path = None
 steam_path = None
 studiomdl_path = None
 gameManualTextGameinfoPath = None
+steam_discovery_thread = None
+steam_discovery_result = {}
+# Wine prefix studiomdl.exe runs in outside of Windows, made on the first compile
+wine_session = None
+export_cache_store = None
+model_cache_store = None
+active_compile_job = None
+# the AutoMDLOperator exporting a slice at a time, before its compile starts
+active_export = None
+active_batch_pool = None
+compile_log_lines = []
+# vertex count of every convex hull piece made for the last compiled collision mesh
+collision_hull_pieces = None
+# triangles of the visual mesh and of every lod, as of the last export
+lod_triangle_counts = None
+# live statistics of the chosen meshes by object name, the objects whose geometry changed since, and the jobs working them out
+live_mesh_stats = {}
+live_mesh_stats_dirty = set()
+live_mesh_stats_jobs = {}
+# CollectionMesh of the chosen collections by collection name, for the handlers and the mesh stats timer, see getLiveCollectionMesh
+live_collection_meshes = {}
+# VTF conversions still running after their compile finished, see startTextureConversion
+texture_conversions = []
+# watch mode: triggers waiting to become a compile, when the compile watch mode started was triggered, and what the last one delivered
+watch_scheduler = watch.WatchScheduler()
+watch_compile_trigger = None
+watch_last_compile_key = None
+watch_last_latency = None
+watch_exporting = False
+COMPILE_LOG_MAX_LINES = 200
+# profile of the single model compile in progress (stages deep down add themselves to it), and of the last one for the panel
+active_profile = None
+last_compile_profile = None
+COMPILE_PROFILE_SHOWN_STAGES = 6
+COMPILE_LOG_SHOWN_LINES = 8
 gameManualTextInputIsInvalid = False
 massTextInputIsInvalid = False
 visMeshInputIsInvalid = False
@@ -57,7 +99,7 @@ def onMassTextInputChanged(self, context):
     massTextInputIsInvalid = not is_float(context.scene.mass_text_input)
 
 def onGameManualTextInputChanged(self, context):
-    global gameManualTextInputIsInvalid
+    global gameManualTextInputIsInvalid, gameManualTextGameinfoPath
     gameManualTextInputIsInvalid = False
     
     in_folder = str(Path(os.path.join(context.scene.studiomdl_manual_input, ''))) # make sure to have a trailing slash, and its a string
@@ -69,21 +111,8 @@ def onGameManualTextInputChanged(self, context):
         return
     
     base_path = Path(os.path.dirname(in_folder))
-    gameinfo_path = None
-    # oh no, code copy pasted from getGamesList()
-    # anyway
-    # 
-    # although we need the path to the folder which contains the gameinfo
-    # so we need to iterate now again
-    _subdirectories = [x for x in base_path.iterdir() if x.is_dir()]
-    for k in range(len(_subdirectories)):
-        _subdir = _subdirectories[k]
-        has_gameinfo = os.path.exists( os.path.join(_subdir, "gameinfo.txt") )
-        
-        # currently we're returning the first folder which has a gameinfo.txt, in alot of games there are multiple folders which match this criteria. todo: is this an issue?
-        if( has_gameinfo ):
-            gameinfo_path = str(_subdir)
-            break
+    # we need the path to the folder which contains the gameinfo
+    gameinfo_path = game_discovery.find_gameinfo_folder(base_path)
     
     if gameinfo_path == None:
         gameManualTextInputIsInvalid = True
@@ -100,49 +129,34 @@ def setGamePath(self, context, new_game_path_value):
     studiomdl_path = os.path.join(os.path.dirname(game_path), "bin", "studiomdl.exe")
 
 # returns list of source games which have a studiomdl.exe in the bin folder
-def getGamesList():
+# results are cached on disk, only game folders that changed since the last launch are scanned again
+# (this may run on the discovery thread, so cache_path is looked up by the caller there)
+def getGamesList(force_rescan=False, cache_path=None):
     global steam_path
-    common = Path(os.path.join(steam_path, r"steamapps/common"))
-    
-    # get all subdirectories in common
-    subdirectories = [x for x in common.iterdir() if x.is_dir()]
     
-    # okay let's filter games
+    if cache_path is None:
+        cache_path = getGameDiscoveryCachePath()
+    discovery = game_discovery.GameDiscoveryCache(cache_path)
     list = []
-    
-    for i in range(len(subdirectories)):
-        subdir = subdirectories[i]
-        subdir_bin = os.path.join(subdir, "bin")
-        has_bin_folder = os.path.exists( subdir_bin )
-        if( not has_bin_folder ):
-            continue
-        
-        subdir_studiomdl = os.path.join(subdir_bin, "studiomdl.exe")
-        has_studiomdl = os.path.exists( subdir_studiomdl )
-        
-        if( not has_studiomdl ):
-            continue
-        
-        # okay!
-        # although we need the path to the folder which contains the gameinfo
-        # so we need to iterate now again
-        _subdirectories = [x for x in subdir.iterdir() if x.is_dir()]
-        for k in range(len(_subdirectories)):
-            _subdir = _subdirectories[k]
-            has_gameinfo = os.path.exists( os.path.join(_subdir, "gameinfo.txt") )
-            
-            # currently we're returning the first folder which has a gameinfo.txt, in alot of games there are multiple folders which match this criteria. todo: is this an issue?
-            if( has_gameinfo ):
-                list.append(_subdir)
-                break
+    scanned = reused = 0
+    for library in game_discovery.steam_library_folders(steam_path):
+        list += discovery.games(Path(os.path.join(library, r"steamapps/common")), force=force_rescan)
+        scanned += discovery.scanned
+        reused += discovery.reused
+    print(f"AutoMDL: found {len(list)} games ({scanned} folders scanned, {reused} from cache)")
     
     return list
 
+def getGameDiscoveryCachePath():
+    return os.path.join(bpy.utils.user_resource('CONFIG', path="automdl", create=True), "game_discovery.json")
+
 # attempt to figure out where steam is installed
 def getSteamInstallationPath():
     
     # windows specific attempts
     if(os.name == 'nt'):
+        import winreg
+        
         # check in registry (x86)
         try:
             with winreg.OpenKey(winreg.HKEY_CURRENT_USER, r"SOFTWARE\Valve\Steam") as key:
@@ -157,7 +171,9 @@ def getSteamInstallationPath():
         except Exception as e:
             print(e)
     
-    # todo: linux specific attempts?
+    else:
+        from . import wine
+        return wine.find_steam_path()
     
     return None
 
@@ -168,100 +184,98 @@ def refreshGameSelectDropdown(self, context):
 
 
 
-class AutoMDLOperator(bpy.types.Operator):
-    bl_idname = "wm.automdl"
-    bl_label = "Update MDL"
-    bl_description = "Compile model"
+# the steps of a compile that don't depend on which operator runs them (single model or batch)
+class CompileSteps:
     
-    
-    def execute(self, context):
-        
-        if game_select_method_is_dropdown:
-            setGamePath(self, context, context.scene.game_select)
-        else:
-            setGamePath(self, context, gameManualTextGameinfoPath)
-        
-        blend_path = bpy.data.filepath
-        
-        # check if we have saved a blend file in the first place
-        if (len(blend_path) == 0):
-            self.report({'ERROR'}, "Please save the project inside a models folder")
-            return {'CANCELLED'}
-        
-        has_collision = False
-        phy_mesh_obj = context.scene.phy_mesh
-        if phy_mesh_obj and phy_mesh_obj.name in bpy.data.objects:
-            has_collision = True
-        
-        vis_mesh_valid = checkVisMeshHasMesh(context)
-        phy_mesh_valid = checkPhyMeshHasMesh(context)
-        
-        # check if meshes aren't even meshes
-        if (not vis_mesh_valid):
-            self.report({'ERROR'}, "Please select a mesh for Visual mesh")
-            return {'CANCELLED'}
-        
-        if (not phy_mesh_valid) and has_collision == True:
-            self.report({'ERROR'}, "Please select a mesh for Collision mesh")
-            return {'CANCELLED'}
-        
-        # check if visual mesh and collision mesh point to valid objects in the scene
-        if (context.scene.vis_mesh != None) and context.scene.vis_mesh.name not in bpy.context.scene.objects:
-            self.report({'ERROR'}, "Visual mesh points to a deleted object!")
-            visMeshInputIsInvalid = True
-            vis_mesh_valid = False
-            return {'CANCELLED'}
-        
-        if (context.scene.phy_mesh != None) and context.scene.phy_mesh.name not in bpy.context.scene.objects:
-            self.report({'ERROR'}, "Collision mesh points to a deleted object!")
-            phyMeshInputIsInvalid = True
-            phy_mesh_valid = False
-            return {'CANCELLED'}
-        
-        mesh_ext = "smd"
-        qc_path = os.path.join(temp_path, "qc.qc")
+    def writeModelSources(self, context, settings, qc_modelpath, workspace):
+        """Export the meshes of a model into workspace and write its qc next to them.
         
+        settings is anything with vis_mesh, phy_mesh, their collections, surfaceprop, mass_text_input, staticprop and mostlyopaque (the scene, or a batch job).
+        Returns (qc_path, qc_cdmaterials_list, has_materials).
+        """
+        steps = self.iterModelSources(context, settings, qc_modelpath, workspace, ExportProgress())
+        while True:
+            try:
+                next(steps)
+            except StopIteration as finished:
+                return finished.value
+    
+    def iterModelSources(self, context, settings, qc_modelpath, workspace, progress):
+        """writeModelSources a slice at a time, for running from a modal operator.
         
-        qc_modelpath = to_models_relative_path(blend_path)
+        Every mesh is read from Blender in a slice of its own, then the collision hulls are built an island per slice,
+        and the files written and the collision islands counted a bounded number of triangles (or edges) per slice,
+        with progress kept up to date along the way.
+        Closing the generator early stops the export and leaves partial files in workspace.
+        """
+        mesh_ext = context.scene.mesh_format.lower()
+        qc_path = os.path.join(workspace, "qc.qc")
         
-        if(qc_modelpath is None):
-            self.report({'ERROR'}, "Please save the project inside a models folder")
-            return {'CANCELLED'}
-            
+        vis_mesh_obj = getVisMesh(settings)
+        phy_mesh_obj = getPhyMesh(settings)
+        has_collision = phy_mesh_obj is not None
         
         qc_vismesh = os.path.basename(qc_modelpath) + "_ref"
         qc_phymesh = os.path.basename(qc_modelpath) + "_phy"
-            
-        qc_staticprop = context.scene.staticprop
-        qc_mass = context.scene.mass_text_input if not qc_staticprop else 1
-        
-        if not is_float(qc_mass):
-            self.report({'ERROR'}, "Mass is invalid")
-            return {'CANCELLED'}
-        
-        # wait do we need this check? shouldn't it be compared with None instead
-        if(qc_modelpath == -1):
-            self.report({'ERROR'}, "blend file must be inside a models folder")
-            return {'CANCELLED'}
         
-
+        qc_staticprop = settings.staticprop
+        qc_mass = settings.mass_text_input if not qc_staticprop else 1
         
-        # export smd
-        self.exportObjectToSmd(context.scene.vis_mesh, os.path.join(temp_path, qc_vismesh), False)
+        # read every mesh from Blender first, a mesh per slice, the lods are decimated from the same evaluated mesh
+        global lod_triangle_counts
+        lods = getLodSettings(context.scene)
+        qc_lodmeshes = [f"{qc_vismesh}_lod{i + 1}" for i in range(len(lods))]
+        convex_pieces = 0
+        island_edges = None
+        # in object mode once for all of them, not once per mesh
+        mode_snapshot = enterObjectMode()
+        try:
+            exports = [(vis_mesh_obj, os.path.join(workspace, qc_vismesh), False, getObjectMeshArrays(vis_mesh_obj))]
+            yield
+            for lod, qc_lodmesh in zip(lods, qc_lodmeshes):
+                exports.append((vis_mesh_obj, os.path.join(workspace, qc_lodmesh), False, getObjectMeshArrays(vis_mesh_obj, decimate_ratio=lod.ratio)))
+                yield
+            
+            if(has_collision):
+                phy_arrays = getObjectMeshArrays(phy_mesh_obj)
+                if not context.scene.generate_convex_hulls:
+                    with profileStage("island_edges", object=phy_mesh_obj.name):
+                        island_edges = getIslandEdges(phy_mesh_obj)
+                yield
+        finally:
+            restoreMode(mode_snapshot)
         
         if(has_collision):
-            self.exportObjectToSmd(context.scene.phy_mesh, os.path.join(temp_path, qc_phymesh), True)
+            if context.scene.generate_convex_hulls:
+                # replace every island with its convex hull before studiomdl sees it
+                global collision_hull_pieces
+                from . import convex_hulls
+                progress.total += phy_arrays.triangle_count
+                hull_steps = convex_hulls.iter_build_hull_arrays(phy_arrays, context.scene.convex_hull_max_vertices)
+                (phy_arrays, collision_hull_pieces), seconds = yield from runSlices(hull_steps, progress)
+                addProfileStage("convex_hulls", seconds, object=phy_mesh_obj.name)
+                convex_pieces = len(collision_hull_pieces)
+            exports.append((phy_mesh_obj, os.path.join(workspace, qc_phymesh), True, phy_arrays))
+            yield
+        
+        # then write smd (or dmx) files a block of triangles at a time
+        if island_edges is not None:
+            progress.total += len(island_edges[1])
+        triangle_counts = yield from self.iterExportObjectMeshes(exports, mesh_ext, progress)
+        lod_triangle_counts = triangle_counts[:len(lods) + 1]
+        
+        if island_edges is not None:
+            from . import islands
+            convex_pieces, seconds = yield from runSlices(islands.iter_count_components(*island_edges, EXPORT_SLICE_EDGES), progress)
+            addProfileStage("count_islands", seconds, object=phy_mesh_obj.name)
         
         
         # set up qc
-        convex_pieces = 0
-        if has_collision:
-            convex_pieces = CountIslands(phy_mesh_obj)
         
-        qc_surfaceprop = context.scene.surfaceprop
+        qc_surfaceprop = settings.surfaceprop
         
         qc_cdmaterials_list = []
-        has_materials = context.scene.vis_mesh.material_slots
+        has_materials = len(vis_mesh_obj.material_slots) > 0
         
         if has_materials:
             if context.scene.cdmaterials_type == '1':
@@ -277,7 +291,7 @@ class AutoMDLOperator(bpy.types.Operator):
         
         qc_concave = convex_pieces > 1
         qc_maxconvexpieces = convex_pieces
-        qc_mostlyopaque = context.scene.mostlyopaque
+        qc_mostlyopaque = settings.mostlyopaque
         qc_inertia = 1
         qc_damping = 0
         qc_rotdamping = 0
@@ -285,16 +299,20 @@ class AutoMDLOperator(bpy.types.Operator):
         #self.report({'ERROR'}, f"qc_maxconvexpieces: {qc_maxconvexpieces}") # debug
         
         # write qc
-        with open(qc_path, "w") as file:
+        with profileStage("write_qc"), open(qc_path, "w") as file:
             file.write(f"$modelname \"{qc_modelpath}.mdl\"\n")
             file.write("\n")
             file.write(f"$bodygroup \"Body\"\n{{\n\tstudio \"{qc_vismesh}.{mesh_ext}\"\n}}\n")
             
+            for lod, qc_lodmesh in zip(lods, qc_lodmeshes):
+                file.write("\n")
+                file.write(f"$lod {lod.distance:g}\n{{\n\treplacemodel \"{qc_vismesh}.{mesh_ext}\" \"{qc_lodmesh}.{mesh_ext}\"\n}}\n")
+            
             if(qc_staticprop):
                 file.write("\n")
                 file.write(f"$staticprop")
                 file.write("\n")
-                
+            
             if(qc_mostlyopaque):
                 file.write("\n")
                 file.write(f"$mostlyopaque")
@@ -326,7 +344,9 @@ class AutoMDLOperator(bpy.types.Operator):
                 file.write(str)
         # end of writing qc
         
-        # compile qc!
+        return qc_path, qc_cdmaterials_list, has_materials
+    
+    def getStudiomdlArgs(self, qc_path):
         studiomdl_quiet = True
         studiomdl_fastbuild = False # doesn't seem to have an effect
         studiomdl_nowarnings = True
@@ -347,49 +367,72 @@ class AutoMDLOperator(bpy.types.Operator):
         
         studiomdl_args.append(qc_path) # qc needs to be the last argument
         #print(studiomdl_args)
-        subprocess.run(studiomdl_args)
-        
-        
-        # move compiled stuff
-        compile_path = os.path.join(game_path, "models", os.path.dirname(qc_modelpath))
-        move_path = os.path.dirname(blend_path)
+        return studiomdl_args
+    
+    def getCompilePath(self, qc_modelpath):
+        """Folder in the game that studiomdl writes the compiled model to."""
+        return os.path.join(game_path, "models", os.path.dirname(qc_modelpath))
+    
+    def deliverCompiledModel(self, qc_modelpath, move_path):
+        """Move the files studiomdl wrote into the game's models folder to move_path. Returns the moved files' new paths."""
+        from . import model_cache
+        compile_path = self.getCompilePath(qc_modelpath)
         
         compiled_model_name = Path(os.path.basename(qc_modelpath)).stem
         
-        compiled_exts = [".dx80.vtx", ".dx90.vtx", ".mdl", ".phy", ".sw.vtx", ".vvd"]
+        delivered = []
+        methods = []
+        compiled_exts = model_cache.COMPILED_EXTENSIONS
+        deliver_start = time.perf_counter()
         for i in range(len(compiled_exts)):
             path_old = os.path.join(compile_path, compiled_model_name + compiled_exts[i])
             path_new = os.path.join(move_path, compiled_model_name + compiled_exts[i])
             if(os.path.isfile(path_old)):
-                shutil.move(path_old, path_new)
-        
-        # delete folder in game if empty
-        if os.path.isdir(compile_path):
-            if(len(os.listdir(temp_path)) == 0):
-                os.rmdir(compile_path)
-        
-        
-        # delete temp folder contents
-        if False: # todo, important, notice: if we are going to not export everything everytime, we need to leave this off
-            for filename in os.listdir(temp_path): 
-                file_path = os.path.join(temp_path, filename)  
-                try:
-                    if os.path.isfile(file_path):
-                        os.remove(file_path)  
-                    elif os.path.isdir(file_path):
-                        os.rmdir(file_path)
-                except Exception as e:  
-                    print(f"Error deleting {file_path}: {e}")
-        
+                # a rename when the game and the blend are on the same drive, a copy only when they aren't
+                methods.append(workspace.move_file(path_old, path_new))
+                delivered.append(path_new)
         
-        # create appropriate folders in materials
-        self.create_material_folders(context, blend_path, qc_cdmaterials_list, has_materials)
-        
-        
-        self.report({'INFO'}, f"If compile was successful, output should be in \"{os.path.join(move_path, '')}\"")
-        return {'FINISHED'}
+        addProfileStage("deliver", time.perf_counter() - deliver_start, files=len(delivered), copied=methods.count("copied"))
+        return delivered
+    
+    def createJobFolder(self):
+        """A fresh folder to export one model's meshes and qc into."""
+        return workspace.create_job_folder(os.path.join(temp_path, "jobs"))
+    
+    def cleanUpJob(self, job_folder, game_folders):
+        """Remove the job's folder, and the folders studiomdl made in the game for it that are empty again."""
+        workspace.remove_job_folder(job_folder)
+        workspace.remove_empty_folders(game_folders)
+    
+    def restoreCachedModel(self, qc_path, studiomdl_args, qc_modelpath, move_path, key=None):
+        """Look the compile up in the compiled model cache, and restore its output to move_path on a hit.
+        
+        key is the compile's model_cache.compile_key when already known.
+        Returns (key, restored) where key is None when the cache is off, and restored tells if studiomdl can be skipped.
+        """
+        cache = getModelCache()
+        if cache is None:
+            return None, False
+        
+        with profileStage("model_cache") as stage:
+            if key is None:
+                from . import model_cache
+                key = model_cache.compile_key(qc_path, studiomdl_args, studiomdl_path, game_path)
+            compiled_model_name = Path(os.path.basename(qc_modelpath)).stem
+            stage["hit"] = cache.fetch(key, compiled_model_name, move_path) is not None
+        return key, stage["hit"]
+    
+    def storeCompiledModel(self, key, qc_modelpath, delivered):
+        cache = getModelCache()
+        if cache is None or key is None or len(delivered) == 0:
+            return
+        try:
+            with profileStage("model_cache_store"):
+                cache.store(key, Path(os.path.basename(qc_modelpath)).stem, delivered)
+        except OSError as e:
+            print(f"Error caching compiled model: {e}")
     
-    def create_material_folders(self, context, blend_path, qc_cdmaterials_list, has_materials):
+    def create_material_folders(self, context, blend_path, qc_cdmaterials_list, has_materials, vis_mesh_obj):
         """Create appropriate folders in materials."""
         make_folders = bpy.context.preferences.addons[__package__].preferences.do_make_folders_for_cdmaterials
         if has_materials and make_folders:
@@ -399,171 +442,653 @@ class AutoMDLOperator(bpy.types.Operator):
                 fullpath = Path(os.path.join(root, "materials", entry).replace("\\", "/"))
                 print(f"root path = {root}. full path = {fullpath}")
                 self.create_folder_if_not_exists(fullpath)
-                self.create_vmt_files(context, fullpath, entry)
-
+                self.create_vmt_files(context, fullpath, entry, vis_mesh_obj)
+    
     def create_folder_if_not_exists(self, fullpath):
         """Create folder if it does not exist."""
         try:
             os.makedirs(fullpath, exist_ok=True)
         except FileExistsError:
             pass
-
-    def create_vmt_files(self, context, fullpath, entry):
+    
+    def create_vmt_files(self, context, fullpath, entry, vis_mesh_obj):
         """Create VMT files in the specified folder if 'Same as MDL' option is selected."""
-        make_vmts = bpy.context.preferences.addons[__package__].preferences.do_make_vmts
+        prefs = bpy.context.preferences.addons[__package__].preferences
+        make_vmts = prefs.do_make_vmts
         if make_vmts and context.scene.cdmaterials_type == '0':  # if "Same as MDL" is selected
-            for slot in context.scene.vis_mesh.material_slots:
+            basetextures = {}
+            if prefs.do_convert_textures:
+                basetextures = self.convert_material_textures(fullpath, entry, vis_mesh_obj)
+            
+            for slot in vis_mesh_obj.material_slots:
                 vmt_path = os.path.join(fullpath, slot.name + '.vmt')
-                if not os.path.exists(vmt_path):
-                    self.create_vmt_file(vmt_path, entry)
-
-    def create_vmt_file(self, vmt_path, entry):
-        """Create a single VMT file with the specified path and entry."""
-        with open(vmt_path, "w") as file:
-            vmt_basetexture = os.path.join(entry, "_PLACEHOLDER_").replace("\\", "/")
-            file.write(f"VertexLitGeneric\n{{\n\t$basetexture \"{vmt_basetexture}\"\n}}")
+                basetexture = basetextures.get(slot.name)
+                # placeholders made earlier get their real texture once there is one
+                if not os.path.exists(vmt_path) or (basetexture is not None and is_placeholder_vmt(vmt_path, entry)):
+                    self.create_vmt_file(vmt_path, entry, basetexture)
     
+    def create_vmt_file(self, vmt_path, entry, basetexture=None):
+        """Create a single VMT file with the specified path and entry, pointing at basetexture or a placeholder."""
+        with open(vmt_path, "w") as file:
+            file.write(get_vmt_text(entry, basetexture))
     
-    def exportObjectToSmd(self, obj, path, is_collision_smd):
-        
-        # switch to object mode
-        context_mode_snapshot = "null"
-        if bpy.context.mode != 'OBJECT':
-            context_mode_snapshot = bpy.context.active_object.mode
-            bpy.ops.object.mode_set(mode='OBJECT')
+    def convert_material_textures(self, fullpath, entry, vis_mesh_obj):
+        """Convert the base color image of every material to a VTF next to its VMT.
+        
+        Images that haven't changed since they were last converted are skipped.
+        Returns the $basetexture of every material slot that has an image.
+        """
+        from . import vtf_export
+        
+        images = {}
+        texture_names = {}  # image name -> name of its VTF
+        basetextures = {}
+        for slot in vis_mesh_obj.material_slots:
+            image = get_material_base_image(slot.material)
+            if image is None or image.size[0] == 0 or image.size[1] == 0:
+                continue
+            texture_name = texture_names.get(image.name)
+            if texture_name is None:
+                texture_name = get_unique_texture_name(bpy.path.clean_name(os.path.splitext(image.name)[0]), images)
+                texture_names[image.name] = texture_name
+                images[texture_name] = image
+            basetextures[slot.name] = os.path.join(entry, texture_name).replace("\\", "/")
+        
+        if not images:
+            return basetextures
+        
+        with profileStage("textures") as stage:
+            manifest_path = os.path.join(fullpath, TEXTURE_MANIFEST_NAME)
+            manifest = load_texture_manifest(manifest_path)
             
-        # todo: check if object obj exists?
-        
-        # get mesh, apply modifiers
-        depsgraph = bpy.context.evaluated_depsgraph_get()
-        object_eval = obj.evaluated_get(depsgraph)
-        mesh = object_eval.to_mesh()
-        mesh.calc_loop_triangles()
-        
-        # Apply object transform to the mesh vertices
-        mesh.transform(obj.matrix_world)
-        
-        # write!
-        with open(path + ".smd", "w") as file:
+            converting = {path for conversion in texture_conversions for path in conversion.paths}
+            
+            # pixels already read while hashing images that don't come from a file
+            read_pixels = {}
+            to_convert = []
+            for texture_name, image in images.items():
+                source = get_image_source(image)
+                if source is None:
+                    source = read_pixels[texture_name] = read_image_pixels(image)
+                key = vtf_export.texture_key(source)
+                vtf_path = os.path.join(fullpath, texture_name + ".vtf")
+                # a VTF still being written by an earlier compile is left to it, the next compile catches up if the image changed since
+                if (manifest.get(texture_name) != key or not os.path.isfile(vtf_path)) and vtf_path not in converting:
+                    to_convert.append((texture_name, vtf_path, key))
             
-            # hardcoded but yea
-            file.write("version 1\nnodes\n0 \"root\" -1\nend\nskeleton\ntime 0\n0 0 0 0 0 0 0\nend\ntriangles\n")
+            # read on this thread, a texture or two ahead of the processes compressing them
+            def sources():
+                for texture_name, vtf_path, key in to_convert:
+                    pixels = read_pixels.pop(texture_name, None)
+                    yield vtf_path, pixels if pixels is not None else read_image_pixels(images[texture_name])
             
-            sb = StringIO() # string builder
-            has_materials = len(obj.material_slots) > 0
+            stage["textures"] = len(to_convert)
+            stage["unchanged"] = len(images) - len(to_convert)
+        
+        if to_convert:
+            # compressing goes on after the compile is done, the VMTs can point at the VTFs already
+            prefs = bpy.context.preferences.addons[__package__].preferences
+            workers = min(prefs.export_workers or os.cpu_count() or 1, len(to_convert))
+            keys = {texture_name: key for texture_name, _, key in to_convert}
+            paths = [vtf_path for _, vtf_path, _ in to_convert]
+            startTextureConversion(TextureConversion(vtf_export.iter_convert_textures(sources(), workers, wait=bpy.app.background), manifest_path, keys, paths))
+            if not bpy.app.background:
+                self.report({'INFO'}, f"Converting {len(to_convert)} textures to VTF in the background, {len(images) - len(to_convert)} unchanged")
+        return basetextures
+    
+    def iterExportObjectMeshes(self, exports, mesh_ext, progress):
+        """Export meshes a slice at a time, exports being (obj, path, is_collision_smd, arrays), arrays None for obj's evaluated mesh.
+        
+        Everything touching Blender happens up front. The files are then written interleaved on this thread, a block of
+        triangles of each in turn per slice, adding up in progress. Only the smd format workers (separate processes, for
+        large meshes) work on several files at the same time. Returns the triangle count of every export.
+        """
+        from . import dmx_export, export_cache, smd_export
+        
+        prefs = bpy.context.preferences.addons[__package__].preferences
+        cache = getExportCache()
+        triangle_counts = []
+        pending = []
+        for obj, path, is_collision_smd, arrays in exports:
+            if arrays is None:
+                arrays = getObjectMeshArrays(obj)
+            triangle_counts.append(arrays.triangle_count)
+            material_names = self.getSmdMaterialNames(obj, is_collision_smd)
+            model_name = os.path.basename(path)
+            file_path = path + "." + mesh_ext
+            
+            # collision smds always use the smooth vertex normals
+            use_flat_shading = not is_collision_smd
             
-            # okay so now, i sacrifice everything that goes into making good code
-            # just to squeeze out some performance of out this
-            # because we REALLY do need the extra boost
-            # no need to check for every triangle whether or not its a collision smd or presence of materials
-            # so we check here and call the appropriate variant of the function
-            if is_collision_smd:
-                self.exportMeshToSmd_Collision(sb, mesh)
+            # skip the export if this exact mesh was exported before
+            key = None
+            if cache is not None:
+                with profileStage("export_cache", object=obj.name) as stage:
+                    key = export_cache.fingerprint(arrays, obj.matrix_world, material_names, mesh_ext, use_flat_shading, model_name)
+                    stage["hit"] = cache.fetch(key, file_path)
+                if stage["hit"]:
+                    continue
+            
+            pending.append((obj.name, key, file_path, arrays, material_names, use_flat_shading, model_name))
+        
+        progress.total += sum(arrays.triangle_count for _, _, _, arrays, _, _, _ in pending)
+        
+        # the files take turns a slice at a time, the smd format workers are shared between them
+        workers = max(1, (prefs.export_workers or os.cpu_count() or 1) // max(1, len(pending)))
+        steps = []
+        smd_stats = []
+        for obj_name, key, file_path, arrays, material_names, use_flat_shading, model_name in pending:
+            stats = {}
+            smd_stats.append(stats)
+            if mesh_ext == "dmx":
+                steps.append(dmx_export.iter_write_dmx(file_path, arrays, material_names, use_flat_shading, model_name))
             else:
-                if has_materials:
-                    self.exportMeshToSmd_WithMaterials(sb, obj, mesh)
-                else:
-                    self.exportMeshToSmd_NoMaterials(sb, mesh)
+                steps.append(smd_export.iter_write_smd(file_path, arrays, material_names, use_flat_shading, workers=workers, parallel_min_triangles=prefs.parallel_export_min_triangles, stats=stats))
+        
+        _, file_seconds = yield from runSlicesRoundRobin(steps, progress)
+        
+        for (obj_name, key, file_path, *_), seconds, stats in zip(pending, file_seconds, smd_stats):
+            if mesh_ext == "dmx":
+                addProfileStage("write_dmx", seconds, object=obj_name, bytes=os.path.getsize(file_path))
+            else:
+                # formatting and writing are interleaved block by block, write_smd tells them apart
+                addProfileStage("format_smd", seconds - stats["write_seconds"], object=obj_name)
+                addProfileStage("write_smd", stats["write_seconds"], object=obj_name, bytes=os.path.getsize(file_path))
             
-            file.write(sb.getvalue())
-            file.write("end\n")
+            if cache is not None:
+                cache.store(key, file_path)
         
-        # switch mode back
-        if(context_mode_snapshot != "null"):
-            bpy.ops.object.mode_set(mode=context_mode_snapshot)
+        return triangle_counts
+    
+    
+    def getSmdMaterialNames(self, obj, is_collision_smd):
+        """Material names indexed by triangle material index, or a single name shared by every triangle."""
+        if is_collision_smd:
+            return ["Phy"]
         
+        if len(obj.material_slots) > 0:
+            return [slot.name for slot in obj.material_slots]
         
-    def exportMeshToSmd_Collision(self, sb, mesh):
-        for tri in mesh.loop_triangles:
-            material_name = "Phy"
-            
-            # tri vertices
-            vert_a = mesh.vertices[tri.vertices[0]]
-            vert_b = mesh.vertices[tri.vertices[1]]
-            vert_c = mesh.vertices[tri.vertices[2]]
-            
-            # tri positions
-            pos_a = vert_a.co
-            pos_b = vert_b.co
-            pos_c = vert_c.co
-              
-            # tri normals (smooth shading)
-            normal_a = vert_a.normal
-            normal_b = vert_b.normal
-            normal_c = vert_c.normal
-            
-            # tri uv coords
-            uv_a = mesh.uv_layers.active.data[tri.loops[0]].uv
-            uv_b = mesh.uv_layers.active.data[tri.loops[1]].uv
-            uv_c = mesh.uv_layers.active.data[tri.loops[2]].uv
-            
-            sb.write(f"{material_name}\n0  {pos_a.x:.6f} {pos_a.y:.6f} {pos_a.z:.6f}  {normal_a.x:.6f} {normal_a.y:.6f} {normal_a.z:.6f}  {uv_a.x:.6f} {uv_a.y:.6f} 0\n0  {pos_b.x:.6f} {pos_b.y:.6f} {pos_b.z:.6f}  {normal_b.x:.6f} {normal_b.y:.6f} {normal_b.z:.6f}  {uv_b.x:.6f} {uv_b.y:.6f} 0\n0  {pos_c.x:.6f} {pos_c.y:.6f} {pos_c.z:.6f}  {normal_c.x:.6f} {normal_c.y:.6f} {normal_c.z:.6f}  {uv_c.x:.6f} {uv_c.y:.6f} 0\n")
+        return ["None"]
 
 
-    def exportMeshToSmd_WithMaterials(self, sb, obj, mesh):
-        for tri in mesh.loop_triangles:
-            material_name = obj.material_slots[tri.material_index].name
-            
-            # tri vertices
-            vert_a = mesh.vertices[tri.vertices[0]]
-            vert_b = mesh.vertices[tri.vertices[1]]
-            vert_c = mesh.vertices[tri.vertices[2]]
-            
-            # tri positions
-            pos_a = vert_a.co
-            pos_b = vert_b.co
-            pos_c = vert_c.co
-              
-            # tri normals
-            normal_a = vert_a.normal
-            normal_b = vert_b.normal
-            normal_c = vert_c.normal
-            
-            if(tri.use_smooth == False):
-                normal = (pos_b - pos_a).cross(pos_c - pos_a).normalized()
-                normal_a = normal
-                normal_b = normal
-                normal_c = normal
-            
-            # tri uv coords
-            uv_a = mesh.uv_layers.active.data[tri.loops[0]].uv
-            uv_b = mesh.uv_layers.active.data[tri.loops[1]].uv
-            uv_c = mesh.uv_layers.active.data[tri.loops[2]].uv
-            
-            sb.write(f"{material_name}\n0  {pos_a.x:.6f} {pos_a.y:.6f} {pos_a.z:.6f}  {normal_a.x:.6f} {normal_a.y:.6f} {normal_a.z:.6f}  {uv_a.x:.6f} {uv_a.y:.6f} 0\n0  {pos_b.x:.6f} {pos_b.y:.6f} {pos_b.z:.6f}  {normal_b.x:.6f} {normal_b.y:.6f} {normal_b.z:.6f}  {uv_b.x:.6f} {uv_b.y:.6f} 0\n0  {pos_c.x:.6f} {pos_c.y:.6f} {pos_c.z:.6f}  {normal_c.x:.6f} {normal_c.y:.6f} {normal_c.z:.6f}  {uv_c.x:.6f} {uv_c.y:.6f} 0\n")
+class AutoMDLOperator(CompileSteps, bpy.types.Operator):
+    bl_idname = "wm.automdl"
+    bl_label = "Update MDL"
+    bl_description = "Compile model"
+    
+    @classmethod
+    def poll(cls, context):
+        # one compile at a time, and not before the games have been looked up
+        return active_compile_job is None and active_export is None and active_batch_pool is None and game_select_method_is_dropdown is not None
+    
+    def execute(self, context):
+        
+        if game_select_method_is_dropdown:
+            setGamePath(self, context, context.scene.game_select)
+        else:
+            setGamePath(self, context, gameManualTextGameinfoPath)
+        
+        blend_path = bpy.data.filepath
+        
+        # check if we have saved a blend file in the first place
+        if (len(blend_path) == 0):
+            self.report({'ERROR'}, "Please save the project inside a models folder")
+            return {'CANCELLED'}
+        
+        has_collision = context.scene.phy_collection is not None
+        phy_mesh_obj = context.scene.phy_mesh
+        if phy_mesh_obj and phy_mesh_obj.name in bpy.data.objects:
+            has_collision = True
+        
+        vis_mesh_valid = checkVisMeshHasMesh(context)
+        phy_mesh_valid = checkPhyMeshHasMesh(context)
+        
+        # check if meshes aren't even meshes
+        if (not vis_mesh_valid):
+            self.report({'ERROR'}, "Please select a mesh (or a collection with meshes) for Visual mesh")
+            return {'CANCELLED'}
+        
+        if (not phy_mesh_valid) and has_collision == True:
+            self.report({'ERROR'}, "Please select a mesh (or a collection with meshes) for Collision mesh")
+            return {'CANCELLED'}
+        
+        # check if visual mesh and collision mesh point to valid objects in the scene (a collection takes the object's place)
+        if context.scene.vis_collection is None and (context.scene.vis_mesh != None) and context.scene.vis_mesh.name not in bpy.context.scene.objects:
+            self.report({'ERROR'}, "Visual mesh points to a deleted object!")
+            visMeshInputIsInvalid = True
+            vis_mesh_valid = False
+            return {'CANCELLED'}
+        
+        if context.scene.phy_collection is None and (context.scene.phy_mesh != None) and context.scene.phy_mesh.name not in bpy.context.scene.objects:
+            self.report({'ERROR'}, "Collision mesh points to a deleted object!")
+            phyMeshInputIsInvalid = True
+            phy_mesh_valid = False
+            return {'CANCELLED'}
+        
+        qc_modelpath = to_models_relative_path(blend_path)
+        
+        if(qc_modelpath is None):
+            self.report({'ERROR'}, "Please save the project inside a models folder")
+            return {'CANCELLED'}
+        
+        qc_staticprop = context.scene.staticprop
+        qc_mass = context.scene.mass_text_input if not qc_staticprop else 1
+        
+        if not is_float(qc_mass):
+            self.report({'ERROR'}, "Mass is invalid")
+            return {'CANCELLED'}
+        
+        # wait do we need this check? shouldn't it be compared with None instead
+        if(qc_modelpath == -1):
+            self.report({'ERROR'}, "blend file must be inside a models folder")
+            return {'CANCELLED'}
+        
+        # time every stage from here on
+        global active_profile
+        prefs = context.preferences.addons[__package__].preferences
+        self.profile = compile_profile.CompileProfile(qc_modelpath, track_memory=prefs.track_compile_memory)
+        active_profile = self.profile
+        
+        # export meshes and write the qc a slice at a time, Blender stays responsive and Esc stops it
+        self.job_folder = self.createJobFolder()
+        self.game_folders = []
+        self.blend_path = blend_path
+        self.qc_modelpath = qc_modelpath
+        self.cancel_requested = False
+        self.export_progress = ExportProgress()
+        self.export_steps = self.iterModelSources(context, context.scene, qc_modelpath, self.job_folder, self.export_progress)
+        
+        # no window to keep responsive (background blender), export in one go
+        if context.window is None:
+            return self.startCompile(context, *self.runExportSlices(None))
+        
+        global active_export
+        active_export = self
+        context.window_manager.progress_begin(0, 100)
+        self._timer = context.window_manager.event_timer_add(EXPORT_SLICE_INTERVAL, window=context.window)
+        context.window_manager.modal_handler_add(self)
+        return {'RUNNING_MODAL'}
+    
+    def runExportSlices(self, budget):
+        """Run export slices for about budget seconds, or to the end when it's None.
+        
+        Returns (qc_path, qc_cdmaterials_list, has_materials) once the export is done, None while there's more to do.
+        """
+        global watch_exporting
+        deadline = None if budget is None else time.perf_counter() + budget
+        # watch mode mustn't take the depsgraph updates the export causes for edits, edits between slices it does take
+        watch_exporting = True
+        try:
+            while deadline is None or time.perf_counter() < deadline:
+                next(self.export_steps)
+        except StopIteration as finished:
+            self.export_steps = None
+            return finished.value
+        except Exception:
+            self.export_steps = None
+            self.cleanUpJob(self.job_folder, self.game_folders)
+            finishCompileProfile(self.profile, "failed")
+            raise
+        finally:
+            watch_exporting = False
+        return None
+    
+    def modalExport(self, context, event):
+        if self.cancel_requested or (event.type == 'ESC' and event.value == 'PRESS'):
+            self.cancelExport(context)
+            return {'CANCELLED'}
+        
+        if event.type != 'TIMER':
+            return {'PASS_THROUGH'}
+        
+        try:
+            result = self.runExportSlices(EXPORT_SLICE_SECONDS)
+        except Exception:
+            self.endExport(context)
+            finishWatchCompile(False, None)
+            raise
+        
+        context.window_manager.progress_update(int(self.export_progress.fraction * 100))
+        redrawAutoMDLPanel(context)
+        if result is None:
+            return {'RUNNING_MODAL'}
+        
+        self.endExport(context)
+        return self.startCompile(context, *result)
+    
+    def endExport(self, context):
+        global active_export
+        active_export = None
+        context.window_manager.event_timer_remove(self._timer)
+        context.window_manager.progress_end()
+        redrawAutoMDLPanel(context)
+    
+    def cancelExport(self, context):
+        # closing the export closes the file being written, the partial files go with the job folder
+        self.export_steps.close()
+        self.export_steps = None
+        self.endExport(context)
+        self.cleanUpJob(self.job_folder, self.game_folders)
+        finishWatchCompile(False, None)
+        finishCompileProfile(self.profile, "cancelled")
+        self.report({'WARNING'}, "Export cancelled")
+    
+    def startCompile(self, context, qc_path, qc_cdmaterials_list, has_materials):
+        global active_profile
+        blend_path = self.blend_path
+        qc_modelpath = self.qc_modelpath
+        
+        # compile qc!
+        studiomdl_args = self.getStudiomdlArgs(qc_path)
+        
+        # started by watch mode and nothing that goes into the model changed since its last compile, the files in place are current
+        restore_start = time.perf_counter()
+        key = None
+        if watch_compile_trigger is not None:
+            from . import model_cache
+            key = model_cache.compile_key(qc_path, studiomdl_args, studiomdl_path, game_path)
+            if key == watch_last_compile_key:
+                self.cleanUpJob(self.job_folder, self.game_folders)
+                finishWatchCompile(True, key)
+                finishCompileProfile(self.profile, "unchanged")
+                return {'FINISHED'}
+        
+        # the exact same compile was done before, its output just needs copying back
+        move_path = os.path.dirname(blend_path)
+        self.model_cache_key, restored = self.restoreCachedModel(qc_path, studiomdl_args, qc_modelpath, move_path, key)
+        if restored:
+            self.cleanUpJob(self.job_folder, self.game_folders)
+            with profileStage("material_folders"):
+                self.create_material_folders(context, blend_path, qc_cdmaterials_list, has_materials, getVisMesh(context.scene))
+            finishWatchCompile(True, self.model_cache_key)
+            finishCompileProfile(self.profile, "restored")
+            self.report({'INFO'}, f"Unchanged, restored the compiled model from the cache in {(time.perf_counter() - restore_start) * 1000:.0f}ms")
+            return {'FINISHED'}
+        self.model_cache_key = self.model_cache_key or key
+        
+        # remember what the steps after compiling need, they run once studiomdl is done
+        self.qc_cdmaterials_list = qc_cdmaterials_list
+        self.has_materials = has_materials
+        
+        # whatever studiomdl has to create in the game for the output is removed again once the files are delivered
+        self.game_folders = workspace.missing_folders(self.getCompilePath(qc_modelpath), game_path)
+        
+        command, env = getCompilerCommand(studiomdl_args)
+        if command is None:
+            self.cleanUpJob(self.job_folder, self.game_folders)
+            finishWatchCompile(False, None)
+            finishCompileProfile(self.profile, "failed")
+            self.report({'ERROR'}, WINE_NOT_FOUND_MESSAGE)
+            return {'CANCELLED'}
+        
+        # compile in the background so the UI doesn't freeze while studiomdl runs
+        global active_compile_job, compile_log_lines
+        compile_log_lines = []
+        from . import compile_job
+        active_compile_job = compile_job.CompileJob(command, cwd=self.job_folder, env=env).start()
+        active_profile = None
+        
+        # no window to keep responsive (background blender), just wait for it
+        if context.window is None:
+            active_compile_job.wait()
+            return self.finishCompile(context)
+        
+        # the operator is modal already (it exported a slice at a time), it only needs a slower timer now
+        self._timer = context.window_manager.event_timer_add(0.1, window=context.window)
+        return {'RUNNING_MODAL'}
+    
+    def modal(self, context, event):
+        if self.export_steps is not None:
+            return self.modalExport(context, event)
+        
+        if event.type == 'ESC' and event.value == 'PRESS':
+            active_compile_job.cancel()
+            return {'RUNNING_MODAL'}
+        
+        if event.type != 'TIMER':
+            return {'PASS_THROUGH'}
+        
+        collectCompileOutput()
+        redrawAutoMDLPanel(context)
+        
+        if not active_compile_job.poll():
+            return {'PASS_THROUGH'}
+        
+        context.window_manager.event_timer_remove(self._timer)
+        return self.finishCompile(context)
+    
+    def finishCompile(self, context):
+        global active_compile_job, active_profile
+        collectCompileOutput()
+        job = active_compile_job
+        active_compile_job = None
+        redrawAutoMDLPanel(context)
+        
+        self.profile.add("studiomdl", job.elapsed)
+        active_profile = self.profile
+        
+        if job.cancelled:
+            self.cleanUpJob(self.job_folder, self.game_folders)
+            finishWatchCompile(False, None)
+            finishCompileProfile(self.profile, "cancelled")
+            self.report({'WARNING'}, "Compile cancelled")
+            return {'CANCELLED'}
+        
+        if not job.succeeded:
+            self.cleanUpJob(self.job_folder, self.game_folders)
+            finishWatchCompile(False, None)
+            finishCompileProfile(self.profile, "failed")
+            self.report({'ERROR'}, f"studiomdl failed (exit code {job.process.returncode}), see the compile log in the AutoMDL panel")
+            return {'CANCELLED'}
+        
+        # move compiled stuff
+        move_path = os.path.dirname(self.blend_path)
+        delivered = self.deliverCompiledModel(self.qc_modelpath, move_path)
+        self.storeCompiledModel(self.model_cache_key, self.qc_modelpath, delivered)
+        finishWatchCompile(True, self.model_cache_key)
+        
+        # delete the job folder, the export cache keeps its own copies of the meshes
+        self.cleanUpJob(self.job_folder, self.game_folders)
+        
+        # create appropriate folders in materials
+        with profileStage("material_folders"):
+            self.create_material_folders(context, self.blend_path, self.qc_cdmaterials_list, self.has_materials, getVisMesh(context.scene))
+        
+        finishCompileProfile(self.profile, "compiled")
+        self.report({'INFO'}, f"Compiled in {job.elapsed:.1f}s, output is in \"{os.path.join(move_path, '')}\"")
+        return {'FINISHED'}
 
 
-    def exportMeshToSmd_NoMaterials(self, sb, mesh):
-        for tri in mesh.loop_triangles:
-            material_name = "None"
+class AutoMDLBatchOperator(CompileSteps, bpy.types.Operator):
+    bl_idname = "wm.automdl_batch"
+    bl_label = "Compile All"
+    bl_description = "Compile every model in the batch list, running several studiomdl processes at once"
+    
+    @classmethod
+    def poll(cls, context):
+        return active_compile_job is None and active_export is None and active_batch_pool is None and game_select_method_is_dropdown is not None and len(context.scene.batch_jobs) > 0
+    
+    def execute(self, context):
+        global active_batch_pool, compile_log_lines
+        
+        if game_select_method_is_dropdown:
+            setGamePath(self, context, context.scene.game_select)
+        else:
+            setGamePath(self, context, gameManualTextGameinfoPath)
+        
+        blend_path = bpy.data.filepath
+        models_path = get_models_path(blend_path) if len(blend_path) != 0 else None
+        if models_path is None:
+            self.report({'ERROR'}, "Please save the project inside a models folder")
+            return {'CANCELLED'}
+        
+        self.blend_path = blend_path
+        self.models_path = models_path
+        self.pending = []
+        self.running = {}
+        self.start_time = time.perf_counter()
+        
+        # every job needs its own output name, or they would overwrite each other in the game's models folder
+        seen_model_paths = set()
+        for index, job in enumerate(context.scene.batch_jobs):
+            job.export_time = 0
+            job.compile_time = 0
             
-            # tri vertices
-            vert_a = mesh.vertices[tri.vertices[0]]
-            vert_b = mesh.vertices[tri.vertices[1]]
-            vert_c = mesh.vertices[tri.vertices[2]]
+            error = getBatchJobError(job)
+            if error is None and job.model_path in seen_model_paths:
+                error = "Another job already compiles to this model path"
             
-            # tri positions
-            pos_a = vert_a.co
-            pos_b = vert_b.co
-            pos_c = vert_c.co
-              
-            # tri normals
-            normal_a = vert_a.normal
-            normal_b = vert_b.normal
-            normal_c = vert_c.normal
+            if error is not None:
+                job.status = f"Failed: {error}"
+                continue
             
-            if(tri.use_smooth == False):
-                normal = (pos_b - pos_a).cross(pos_c - pos_a).normalized()
-                normal_a = normal
-                normal_b = normal
-                normal_c = normal
+            seen_model_paths.add(job.model_path)
+            job.status = "Queued"
+            self.pending.append(index)
+        
+        # folders studiomdl creates in the game, only removed once every job is done since jobs may share them
+        self.game_folders = []
+        
+        compile_log_lines = []
+        from . import compile_job
+        active_batch_pool = compile_job.CompilePool(context.scene.batch_workers or os.cpu_count() or 1)
+        
+        if context.window is None:
+            try:
+                while not self.step(context):
+                    time.sleep(0.1)
+            except Exception:
+                self.abortBatch(context)
+                raise
+            return self.finishBatch(context)
+        
+        self._timer = context.window_manager.event_timer_add(0.1, window=context.window)
+        context.window_manager.modal_handler_add(self)
+        return {'RUNNING_MODAL'}
+    
+    def modal(self, context, event):
+        if event.type != 'TIMER':
+            return {'PASS_THROUGH'}
+        
+        try:
+            done = self.step(context)
+        except Exception:
+            context.window_manager.event_timer_remove(self._timer)
+            self.abortBatch(context)
+            raise
+        redrawAutoMDLPanel(context)
+        if not done:
+            return {'PASS_THROUGH'}
+        
+        context.window_manager.event_timer_remove(self._timer)
+        return self.finishBatch(context)
+    
+    def abortBatch(self, context):
+        """Stop everything after an error outside of any one job, so the pool doesn't outlive the operator."""
+        active_batch_pool.cancel()
+        for index, (_, _, _, _, job_folder) in self.running.items():
+            context.scene.batch_jobs[index].status = "Cancelled"
+            workspace.remove_job_folder(job_folder)
+        self.running = {}
+        for index in self.pending:
+            context.scene.batch_jobs[index].status = "Cancelled"
+        self.pending = []
+        self.finishBatch(context)
+    
+    def step(self, context):
+        """Collect finished compiles and start new ones. Returns True once every job is done."""
+        jobs = context.scene.batch_jobs
+        
+        for index, job in active_batch_pool.collect():
+            batch_job = jobs[index]
+            batch_job.compile_time = job.elapsed
+            qc_modelpath, qc_cdmaterials_list, has_materials, model_cache_key, job_folder = self.running.pop(index)
+            compile_log_lines.extend(f"[{batch_job.model_path}] {line}" for line in job.lines)
             
-            # tri uv coords
-            uv_a = mesh.uv_layers.active.data[tri.loops[0]].uv
-            uv_b = mesh.uv_layers.active.data[tri.loops[1]].uv
-            uv_c = mesh.uv_layers.active.data[tri.loops[2]].uv
+            try:
+                if job.cancelled:
+                    batch_job.status = "Cancelled"
+                elif not job.succeeded:
+                    batch_job.status = f"Failed: studiomdl exit code {job.process.returncode}"
+                else:
+                    move_path = os.path.join(self.models_path, os.path.dirname(qc_modelpath))
+                    os.makedirs(move_path, exist_ok=True)
+                    delivered = self.deliverCompiledModel(qc_modelpath, move_path)
+                    self.storeCompiledModel(model_cache_key, qc_modelpath, delivered)
+                    self.create_material_folders(context, self.blend_path, qc_cdmaterials_list, has_materials, getVisMesh(batch_job))
+                    batch_job.status = "Done"
+            except Exception as e:
+                # one job going wrong doesn't stop the others
+                batch_job.status = f"Failed: {e}"
+            finally:
+                workspace.remove_job_folder(job_folder)
+        
+        del compile_log_lines[:-COMPILE_LOG_MAX_LINES]
+        
+        if active_batch_pool.cancelled:
+            for index in self.pending:
+                jobs[index].status = "Cancelled"
+            self.pending = []
+        
+        # exports have to happen here on the main thread, one per tick, while earlier jobs keep compiling
+        if self.pending and active_batch_pool.has_free_worker():
+            index = self.pending.pop(0)
+            batch_job = jobs[index]
+            batch_job.status = "Exporting"
             
-            sb.write(f"{material_name}\n0  {pos_a.x:.6f} {pos_a.y:.6f} {pos_a.z:.6f}  {normal_a.x:.6f} {normal_a.y:.6f} {normal_a.z:.6f}  {uv_a.x:.6f} {uv_a.y:.6f} 0\n0  {pos_b.x:.6f} {pos_b.y:.6f} {pos_b.z:.6f}  {normal_b.x:.6f} {normal_b.y:.6f} {normal_b.z:.6f}  {uv_b.x:.6f} {uv_b.y:.6f} 0\n0  {pos_c.x:.6f} {pos_c.y:.6f} {pos_c.z:.6f}  {normal_c.x:.6f} {normal_c.y:.6f} {normal_c.z:.6f}  {uv_c.x:.6f} {uv_c.y:.6f} 0\n")
+            # a fresh folder for every job, so their qc's and meshes never collide
+            job_folder = self.createJobFolder()
+            try:
+                self.startJob(context, index, batch_job, job_folder)
+            except Exception as e:
+                # one job going wrong doesn't stop the others
+                self.running.pop(index, None)
+                workspace.remove_job_folder(job_folder)
+                batch_job.status = f"Failed: {e}"
+        
+        return not self.pending and active_batch_pool.is_idle()
+    
+    def startJob(self, context, index, batch_job, job_folder):
+        """Export a job into job_folder, then restore it from the model cache or hand it to the pool to compile."""
+        export_start = time.perf_counter()
+        qc_path, qc_cdmaterials_list, has_materials = self.writeModelSources(context, batch_job, batch_job.model_path, job_folder)
+        batch_job.export_time = time.perf_counter() - export_start
+        
+        studiomdl_args = self.getStudiomdlArgs(qc_path)
+        move_path = os.path.join(self.models_path, os.path.dirname(batch_job.model_path))
+        model_cache_key, restored = self.restoreCachedModel(qc_path, studiomdl_args, batch_job.model_path, move_path)
+        if restored:
+            workspace.remove_job_folder(job_folder)
+            self.create_material_folders(context, self.blend_path, qc_cdmaterials_list, has_materials, getVisMesh(batch_job))
+            batch_job.status = "Done"
+            return
+        
+        command, env = getCompilerCommand(studiomdl_args)
+        if command is None:
+            workspace.remove_job_folder(job_folder)
+            batch_job.status = "Failed: Wine not found"
+            return
+        
+        from . import compile_job
+        self.game_folders += workspace.missing_folders(self.getCompilePath(batch_job.model_path), game_path)
+        active_batch_pool.submit(index, compile_job.CompileJob(command, cwd=job_folder, env=env))
+        self.running[index] = (batch_job.model_path, qc_cdmaterials_list, has_materials, model_cache_key, job_folder)
+        batch_job.status = "Compiling"
+    
+    def finishBatch(self, context):
+        global active_batch_pool
+        active_batch_pool = None
+        redrawAutoMDLPanel(context)
+        workspace.remove_empty_folders(self.game_folders)
+        
+        jobs = context.scene.batch_jobs
+        done = sum(1 for job in jobs if job.status == "Done")
+        elapsed = time.perf_counter() - self.start_time
+        
+        level = 'INFO' if done == len(jobs) else 'WARNING'
+        self.report({level}, f"Batch compiled {done} of {len(jobs)} models in {elapsed:.1f}s")
+        return {'FINISHED'}
 
 
 class AutoMDLPanel(bpy.types.Panel):
@@ -576,15 +1101,20 @@ class AutoMDLPanel(bpy.types.Panel):
     def draw(self, context):
         layout = self.layout
         
-        vis_mesh_valid = checkVisMeshHasMesh(context)
-        phy_mesh_valid = checkPhyMeshHasMesh(context)
+        # everything derived from the scene comes precomputed, draw runs on every redraw of the sidebar
+        state = panel_state.get(context)
+        vis_mesh_valid = state.vis_mesh_valid
+        phy_mesh_valid = state.phy_mesh_valid
         
         row = layout.row()
         global steam_path
-        if(steam_path is not None):
+        if game_select_method_is_dropdown is None:
+            row.label(text= "Looking for games...", icon='TIME')
+        elif(steam_path is not None):
             row.label(text= "Choose compiler:")
             row = layout.row()
             row.prop(context.scene, "game_select", text="")
+            row.operator("wm.automdl_rescan_games", text="", icon='FILE_REFRESH')
         else:
             row.label(text= "Directory containing studiomdl.exe:")
             row = layout.row()
@@ -596,15 +1126,74 @@ class AutoMDLPanel(bpy.types.Panel):
         row = layout.row()
         row.enabled = vis_mesh_valid
         row.operator("wm.automdl")
+        
+        row = layout.row()
+        row.prop(context.scene, "watch_mode", icon='HIDE_OFF')
+        if context.scene.watch_mode:
+            row.prop(context.scene, "watch_debounce", text="Delay")
+            remaining = watch_scheduler.remaining(time.perf_counter(), context.scene.watch_debounce)
+            if remaining is not None:
+                row = layout.row()
+                row.label(text=f"Change seen, compiling in {remaining:.1f}s", icon='TIME')
+            elif watch_last_latency is not None:
+                row = layout.row()
+                row.label(text=f"Last change was in the model {watch_last_latency:.1f}s later", icon='CHECKMARK')
+        
+        if active_export is not None:
+            row = layout.row()
+            row.label(text=f"Exporting... {active_export.export_progress.fraction * 100:.0f}%", icon='TIME')
+            row.operator("wm.automdl_cancel_compile", icon='CANCEL')
+        
+        if active_compile_job is not None:
+            row = layout.row()
+            row.label(text=f"Compiling... {active_compile_job.elapsed:.1f}s", icon='TIME')
+            row.operator("wm.automdl_cancel_compile", icon='CANCEL')
+        
+        if active_batch_pool is not None:
+            row = layout.row()
+            row.label(text=f"Batch compiling... {len(active_batch_pool.running)} running", icon='TIME')
+            row.operator("wm.automdl_cancel_compile", icon='CANCEL')
+        
+        if compile_log_lines:
+            box = layout.box()
+            for line in compile_log_lines[-COMPILE_LOG_SHOWN_LINES:]:
+                box.label(text=line)
+        
+        if last_compile_profile is not None and active_compile_job is None:
+            profile = last_compile_profile
+            box = layout.box()
+            box.label(text=f"Last compile ({profile.status}): {profile.total_seconds:.2f}s", icon='SORTTIME')
+            for stage, seconds in profile.totals()[:COMPILE_PROFILE_SHOWN_STAGES]:
+                row = box.row()
+                row.label(text=stage)
+                row.label(text=f"{seconds:.3f}s")
+            details = f"{profile.sum('triangles')} tris read, {profile.sum('bytes') / (1024 * 1024):.1f}MB written"
+            if profile.track_memory:
+                details += f", peak {profile.peak_bytes() / (1024 * 1024):.1f}MB"
+            box.label(text=details)
+        
         row = layout.row()
         
         row = layout.row()
         row.label(text= "Visual mesh:")
-        row.prop_search(context.scene, "vis_mesh", bpy.context.scene, "objects", text="")
+        col = row.column(align=True)
+        sub = col.row(align=True)
+        sub.enabled = context.scene.vis_collection is None
+        sub.prop_search(context.scene, "vis_mesh", bpy.context.scene, "objects", text="")
+        col.prop_search(context.scene, "vis_collection", bpy.data, "collections", text="", icon='OUTLINER_COLLECTION')
         
         row = layout.row()
         row.label(text= "Collision mesh:")
-        row.prop_search(context.scene, "phy_mesh", bpy.context.scene, "objects", text="")
+        col = row.column(align=True)
+        sub = col.row(align=True)
+        sub.enabled = context.scene.phy_collection is None
+        sub.prop_search(context.scene, "phy_mesh", bpy.context.scene, "objects", text="")
+        col.prop_search(context.scene, "phy_collection", bpy.data, "collections", text="", icon='OUTLINER_COLLECTION')
+        
+        if vis_mesh_valid:
+            self.draw_mesh_stats(layout, state.vis_mesh, False)
+        if phy_mesh_valid:
+            self.draw_mesh_stats(layout, state.phy_mesh, True)
         
         row = layout.row()
         
@@ -622,6 +1211,14 @@ class AutoMDLPanel(bpy.types.Panel):
                     row.prop(context.scene, "mass_text_input")
                 else:
                     row.label(text= "No mass")
+                
+                row = layout.row()
+                row.prop(context.scene, "generate_convex_hulls")
+                if context.scene.generate_convex_hulls:
+                    row.prop(context.scene, "convex_hull_max_vertices", text="Max verts")
+                    if collision_hull_pieces:
+                        row = layout.row()
+                        row.label(text=f"Convex hulls: {len(collision_hull_pieces)} pieces, {min(collision_hull_pieces)}-{max(collision_hull_pieces)} verts", icon='MESH_ICOSPHERE')
         
                 #row = layout.row()
                 #row.enabled = phy_mesh_valid
@@ -633,25 +1230,19 @@ class AutoMDLPanel(bpy.types.Panel):
         
 
         if vis_mesh_valid:
-            if context.scene.vis_mesh.material_slots:
+            if state.has_materials:
                 row.label(text= "Path to VMT files will be:")
                 row = layout.row()
                 row.prop(context.scene, 'cdmaterials_type', expand=True)
                 row = layout.row()
                 
                 if context.scene.cdmaterials_type == '0':
-                    if len(bpy.data.filepath) != 0:
-                        modelpath = to_models_relative_path(bpy.data.filepath)
-                        if modelpath != None:
-                            if vis_mesh_valid:
-                                modelpath_dirname = os.path.dirname(modelpath)
-                                for slot in context.scene.vis_mesh.material_slots:
-                                    row = layout.row()
-                                    row.label(text=os.path.join("materials/models/", modelpath_dirname, slot.name).replace("\\", "/") + ".vmt", icon='MATERIAL')
-                        else:
-                            row.label(text="Blend file is not inside a models folder", icon='ERROR')
+                    if state.vmt_path_error is None:
+                        for vmt_path in state.vmt_paths:
+                            row = layout.row()
+                            row.label(text=vmt_path, icon='MATERIAL')
                     else:
-                        row.label(text="Blend file not saved", icon='ERROR')
+                        row.label(text=state.vmt_path_error, icon='ERROR')
                 else:
                     draw_ui_list(
                         layout,
@@ -672,12 +1263,316 @@ class AutoMDLPanel(bpy.types.Panel):
         
         row = layout.row()
         row.prop(context.scene, "staticprop", text="Static Prop")
+        
+        row = layout.row()
+        row.label(text="Mesh format:")
+        row.prop(context.scene, "mesh_format", expand=True)
+    
+    # only shows what the mesh stats timer worked out, the handlers queue the meshes it hasn't seen yet
+    def draw_mesh_stats(self, layout, obj, is_collision):
+        stats = live_mesh_stats.get(getMeshStatsKey(obj))
+        if stats is None:
+            layout.row().label(text="Counting...", icon='TIME')
+            return
+        
+        from . import mesh_stats
+        box = layout.box()
+        row = box.row()
+        row.alert = stats.over_limits and not is_collision
+        members = f" in {len(obj.objects)} objects" if isinstance(obj, CollectionMesh) else ""
+        row.label(text=f"{stats.triangles:,} tris, {stats.vertices:,} verts{members}", icon='MESH_DATA')
+        if row.alert:
+            box.label(text=f"Over studiomdl's limit of {mesh_stats.MAX_STUDIO_TRIANGLES:,} tris / {mesh_stats.MAX_STUDIO_VERTS:,} verts", icon='ERROR')
+        
+        if is_collision:
+            if stats.islands is not None:
+                box.label(text=f"{stats.islands} loose part{'s' if stats.islands != 1 else ''} (convex pieces)", icon='MESH_ICOSPHERE')
+            return
+        
+        for slot, triangles in zip(obj.material_slots, stats.material_triangles):
+            row = box.row()
+            row.label(text=slot.name or "(empty slot)", icon='MATERIAL')
+            row.label(text=f"{triangles:,} tris")
+
+
+class AutoMDLCancelCompileOperator(bpy.types.Operator):
+    bl_idname = "wm.automdl_cancel_compile"
+    bl_label = "Cancel"
+    bl_description = "Stop the running export or studiomdl compile"
+    
+    @classmethod
+    def poll(cls, context):
+        return active_compile_job is not None or active_export is not None or active_batch_pool is not None
+    
+    def execute(self, context):
+        # the export stops on its next event, cleaning up after itself
+        if active_export is not None:
+            active_export.cancel_requested = True
+        if active_compile_job is not None:
+            active_compile_job.cancel()
+        if active_batch_pool is not None:
+            active_batch_pool.cancel()
+        return {'FINISHED'}
 
 
+class AutoMDLBatchAddOperator(bpy.types.Operator):
+    bl_idname = "wm.automdl_batch_add"
+    bl_label = "Add Batch Job"
+    bl_description = "Add a model to the batch list, using the active object as its visual mesh"
+    
+    def execute(self, context):
+        scene = context.scene
+        job = scene.batch_jobs.add()
+        
+        obj = context.active_object
+        if obj is not None and obj.type == 'MESH':
+            job.vis_mesh = obj
+            job.name = obj.name
+            
+            # default to a model named after the object, next to the blend's model
+            modelpath = to_models_relative_path(bpy.data.filepath) if len(bpy.data.filepath) != 0 else None
+            model_dir = os.path.dirname(modelpath) if modelpath is not None else ""
+            job.model_path = "/".join(part for part in (model_dir, obj.name) if part)
+        
+        scene.batch_jobs_active_index = len(scene.batch_jobs) - 1
+        return {'FINISHED'}
+
+
+class AutoMDLBatchRemoveOperator(bpy.types.Operator):
+    bl_idname = "wm.automdl_batch_remove"
+    bl_label = "Remove Batch Job"
+    bl_description = "Remove the selected model from the batch list"
+    
+    @classmethod
+    def poll(cls, context):
+        return active_batch_pool is None and 0 <= context.scene.batch_jobs_active_index < len(context.scene.batch_jobs)
+    
+    def execute(self, context):
+        scene = context.scene
+        scene.batch_jobs.remove(scene.batch_jobs_active_index)
+        scene.batch_jobs_active_index = min(scene.batch_jobs_active_index, len(scene.batch_jobs) - 1)
+        return {'FINISHED'}
+
+
+class AutoMDLRescanGamesOperator(bpy.types.Operator):
+    bl_idname = "wm.automdl_rescan_games"
+    bl_label = "Rescan"
+    bl_description = "Look through the Steam library for games with studiomdl again, ignoring the cached results"
+    
+    @classmethod
+    def poll(cls, context):
+        return steam_path is not None
+    
+    def execute(self, context):
+        global games_paths_list
+        previous_game = context.scene.game_select
+        games_paths_list = getGamesList(force_rescan=True)
+        refreshGameSelectDropdown(None, context)
+        
+        # keep the chosen game if it's still there
+        if any(str(path) == previous_game for path in games_paths_list):
+            context.scene.game_select = previous_game
+        else:
+            select_default_game_path()
+        
+        self.report({'INFO'}, f"Found {len(games_paths_list)} games")
+        return {'FINISHED'}
+
+
+class AutoMDLClearExportCacheOperator(bpy.types.Operator):
+    bl_idname = "wm.automdl_clear_export_cache"
+    bl_label = "Clear Export Cache"
+    bl_description = "Delete every cached mesh export"
+    
+    def execute(self, context):
+        cache = getExportCache()
+        if cache is not None:
+            cache.clear()
+        return {'FINISHED'}
+
+
+class AutoMDLClearModelCacheOperator(bpy.types.Operator):
+    bl_idname = "wm.automdl_clear_model_cache"
+    bl_label = "Clear Model Cache"
+    bl_description = "Delete every cached compiled model"
+    
+    def execute(self, context):
+        cache = getModelCache()
+        if cache is not None:
+            cache.clear()
+        return {'FINISHED'}
+
+
+class AutoMDLLodAddOperator(bpy.types.Operator):
+    bl_idname = "wm.automdl_lod_add"
+    bl_label = "Add LOD"
+    bl_description = "Add a level of detail, with half the triangles of the last one at twice its distance"
+    
+    def execute(self, context):
+        scene = context.scene
+        last = getLodSettings(scene)[-1] if len(scene.lods) > 0 else None
+        lod = scene.lods.add()
+        if last is not None:
+            lod.ratio = max(0.01, last.ratio * 0.5)
+            lod.distance = last.distance * 2 if last.distance > 0 else 10
+        scene.lods_active_index = len(scene.lods) - 1
+        return {'FINISHED'}
+
+
+class AutoMDLLodRemoveOperator(bpy.types.Operator):
+    bl_idname = "wm.automdl_lod_remove"
+    bl_label = "Remove LOD"
+    bl_description = "Remove the selected level of detail"
+    
+    @classmethod
+    def poll(cls, context):
+        return 0 <= context.scene.lods_active_index < len(context.scene.lods)
+    
+    def execute(self, context):
+        scene = context.scene
+        scene.lods.remove(scene.lods_active_index)
+        scene.lods_active_index = min(scene.lods_active_index, len(scene.lods) - 1)
+        return {'FINISHED'}
+
+
+class AutoMDLLodPanel(bpy.types.Panel):
+    bl_label = "LODs"
+    bl_idname = "VIEW3D_PT_automdl_lod_panel"
+    bl_parent_id = "VIEW3D_PT_automdl_panel"
+    bl_space_type = 'VIEW_3D'
+    bl_region_type = 'UI'
+    bl_category = 'AutoMDL'
+    bl_options = {'DEFAULT_CLOSED'}
+    
+    def draw(self, context):
+        layout = self.layout
+        scene = context.scene
+        
+        row = layout.row()
+        row.label(text="Ratio")
+        row.label(text="Distance")
+        layout.template_list("AUTOMDL_UL_lods", "", scene, "lods", scene, "lods_active_index")
+        row = layout.row(align=True)
+        row.operator("wm.automdl_lod_add", icon='ADD', text="Add")
+        row.operator("wm.automdl_lod_remove", icon='REMOVE', text="Remove")
+        
+        # triangle counts are only known once the lods have been exported
+        if lod_triangle_counts:
+            box = layout.box()
+            box.label(text=f"LOD 0: {lod_triangle_counts[0]} tris", icon='MESH_DATA')
+            for i, count in enumerate(lod_triangle_counts[1:]):
+                box.label(text=f"LOD {i + 1}: {count} tris ({count / max(1, lod_triangle_counts[0]):.0%})", icon='MOD_DECIM')
+
+
+class AutoMDLBatchPanel(bpy.types.Panel):
+    bl_label = "Batch Compile"
+    bl_idname = "VIEW3D_PT_automdl_batch_panel"
+    bl_parent_id = "VIEW3D_PT_automdl_panel"
+    bl_space_type = 'VIEW_3D'
+    bl_region_type = 'UI'
+    bl_category = 'AutoMDL'
+    bl_options = {'DEFAULT_CLOSED'}
+    
+    def draw(self, context):
+        layout = self.layout
+        scene = context.scene
+        
+        layout.template_list("AUTOMDL_UL_batch_jobs", "", scene, "batch_jobs", scene, "batch_jobs_active_index")
+        row = layout.row(align=True)
+        row.operator("wm.automdl_batch_add", icon='ADD', text="Add")
+        row.operator("wm.automdl_batch_remove", icon='REMOVE', text="Remove")
+        
+        if 0 <= scene.batch_jobs_active_index < len(scene.batch_jobs):
+            job = scene.batch_jobs[scene.batch_jobs_active_index]
+            box = layout.box()
+            box.prop(job, "model_path")
+            box.prop_search(job, "vis_mesh", scene, "objects")
+            box.prop_search(job, "vis_collection", bpy.data, "collections")
+            box.prop_search(job, "phy_mesh", scene, "objects")
+            box.prop_search(job, "phy_collection", bpy.data, "collections")
+            if job.phy_mesh is not None or job.phy_collection is not None:
+                box.prop(job, "surfaceprop")
+                if not job.staticprop:
+                    box.prop(job, "mass_text_input")
+            box.prop(job, "staticprop")
+            box.prop(job, "mostlyopaque")
+        
+        row = layout.row()
+        row.prop(scene, "batch_workers")
+        row = layout.row()
+        row.operator("wm.automdl_batch")
+
+
+SURFACEPROP_ITEMS = [
+    ("Concrete", "Concrete", ""),
+    ("Chainlink", "Chainlink", ""),
+    ("Canister", "Canister", ""),
+    ("Crowbar", "Crowbar", ""),
+    ("Metal", "Metal", ""),
+    ("Metalvent", "Metalvent", ""),
+    ("Popcan", "Popcan", ""),
+    ("Wood", "Wood", ""),
+    ("Plaster", "Plaster", ""),
+    ("Dirt", "Dirt", ""),
+    ("Grass", "Grass", ""),
+    ("Sand", "Sand", ""),
+    ("Snow", "Snow", ""),
+    ("Ice", "Ice", ""),
+    ("Flesh", "Flesh", ""),
+    ("Glass", "Glass", ""),
+    ("Tile", "Tile", ""),
+    ("Paper", "Paper", ""),
+    ("Cardboard", "Cardboard", ""),
+    ("Plastic_Box", "Plastic_Box", ""),
+    ("Plastic_barrel", "Plastic_barrel", ""),
+    ("Plastic", "Plastic", ""),
+    ("Rubber", "Rubber", ""),
+    ("Clay", "Clay", ""),
+    ("Porcelain", "Porcelain", ""),
+    ("Computer", "Computer", "")
+]
+
 # for cdmaterials list
 class CdMaterialsPropGroup(bpy.types.PropertyGroup):
     name: bpy.props.StringProperty()
 
+# for the batch compile list, the qc settings mirror the ones on the scene
+class BatchJobPropGroup(bpy.types.PropertyGroup):
+    model_path: bpy.props.StringProperty(name="Model Path", description="Path of the compiled model, relative to the models folder and without extension (e.g. props/crate01)")
+    vis_mesh: bpy.props.PointerProperty(type=bpy.types.Object, name="Visual mesh")
+    vis_collection: bpy.props.PointerProperty(type=bpy.types.Collection, name="Visual collection", description="Export every mesh in this collection as the visual mesh, instead of the object")
+    phy_mesh: bpy.props.PointerProperty(type=bpy.types.Object, name="Collision mesh")
+    phy_collection: bpy.props.PointerProperty(type=bpy.types.Collection, name="Collision collection", description="Export every mesh in this collection as the collision mesh, instead of the object")
+    surfaceprop: bpy.props.EnumProperty(name="Surface type", items=SURFACEPROP_ITEMS)
+    mass_text_input: bpy.props.StringProperty(name="Mass", default="35", description="Mass in kilograms (KG)")
+    staticprop: bpy.props.BoolProperty(name="Static Prop", default=False)
+    mostlyopaque: bpy.props.BoolProperty(name="Has Transparent Materials", default=False)
+    
+    # results of the last batch compile
+    status: bpy.props.StringProperty(name="Status", default="")
+    export_time: bpy.props.FloatProperty(name="Export Time", unit='TIME_ABSOLUTE')
+    compile_time: bpy.props.FloatProperty(name="Compile Time", unit='TIME_ABSOLUTE')
+
+class AUTOMDL_UL_batch_jobs(bpy.types.UIList):
+    def draw_item(self, context, layout, data, item, icon, active_data, active_propname, index):
+        row = layout.row()
+        row.label(text=item.model_path or item.name or "(no model path)", icon='MESH_DATA')
+        if item.status:
+            row.label(text=item.status)
+        if item.status == "Done":
+            row.label(text=f"{item.export_time:.1f}s + {item.compile_time:.1f}s")
+
+# for the lod list
+class LodPropGroup(bpy.types.PropertyGroup):
+    ratio: bpy.props.FloatProperty(name="Ratio", description="Share of the visual mesh's triangles this LOD keeps", default=0.5, min=0.01, max=1.0, subtype='FACTOR')
+    distance: bpy.props.FloatProperty(name="Distance", description="Distance the model switches to this LOD at ($lod threshold in the QC)", default=10, min=0)
+
+class AUTOMDL_UL_lods(bpy.types.UIList):
+    def draw_item(self, context, layout, data, item, icon, active_data, active_propname, index):
+        row = layout.row()
+        row.prop(item, "ratio", text="", emboss=False)
+        row.prop(item, "distance", text="", emboss=False)
+
 class AddonPrefs(bpy.types.AddonPreferences):
     bl_idname = __package__
     
@@ -687,12 +1582,83 @@ class AddonPrefs(bpy.types.AddonPreferences):
         default=True
     )
     
+    do_convert_textures: bpy.props.BoolProperty(
+        name="Convert Textures",
+        description="On compile, convert the base color image of each of the model's materials to a VTF (DXT1, or DXT5 with alpha, with mipmaps) next to its VMT, and point the VMT at it. Images that haven't changed are skipped",
+        default=True
+    )
+    
     do_make_vmts: bpy.props.BoolProperty(
         name="Make placeholder VMTs",
         description="On compile, make placeholder VMT files named after the model's materials, placed inside appropriate folder inside the materials folder\nThis won't replace existing VMTs",
         default=True
     )
     
+    use_export_cache: bpy.props.BoolProperty(
+        name="Cache Exports",
+        description="Reuse the exported meshes of a previous compile when the mesh, its transform and its materials haven't changed",
+        default=True
+    )
+    
+    export_cache_size: bpy.props.IntProperty(
+        name="Export Cache Size (MB)",
+        description="Once the cached meshes take up more than this, the least recently used ones are deleted",
+        default=1024,
+        min=16
+    )
+    
+    use_model_cache: bpy.props.BoolProperty(
+        name="Cache Compiled Models",
+        description="When the qc, the meshes, studiomdl and the game are exactly the same as in an earlier compile, restore that compile's output instead of running studiomdl",
+        default=True
+    )
+    
+    model_cache_size: bpy.props.IntProperty(
+        name="Model Cache Size (MB)",
+        description="Once the cached compiled models take up more than this, the least recently used ones are deleted",
+        default=512,
+        min=16
+    )
+    
+    track_compile_memory: bpy.props.BoolProperty(
+        name="Track Compile Memory",
+        description="Measure the peak Python memory of every compile stage (tracemalloc). Makes exporting a little slower",
+        default=True
+    )
+    
+    log_compile_profiles: bpy.props.BoolProperty(
+        name="Log Compile Profiles",
+        description="Append the stage timings of every compile as a JSON line to automdl/compile_profiles.jsonl in Blender's config folder",
+        default=True
+    )
+    
+    wine_path: bpy.props.StringProperty(
+        name="Wine",
+        description="Wine executable to run studiomdl.exe with outside of Windows (for Proton, its files/bin/wine). Empty looks for wine on the PATH, then for Proton in the Steam libraries",
+        default="",
+        subtype='FILE_PATH'
+    )
+    
+    keep_wine_warm: bpy.props.BoolProperty(
+        name="Keep Wine Running",
+        description="Keep a wineserver and an idle Wine process running between compiles, so studiomdl.exe starts in a fraction of a second instead of several seconds",
+        default=True
+    )
+    
+    export_workers: bpy.props.IntProperty(
+        name="Export Processes",
+        description="How many processes format the SMD text of very large meshes. 0 uses one per CPU core, 1 always formats in Blender itself",
+        default=0,
+        min=0
+    )
+    
+    parallel_export_min_triangles: bpy.props.IntProperty(
+        name="Multi-process Export From (triangles)",
+        description="Meshes with fewer triangles than this are always formatted in Blender itself, starting the processes isn't worth it for them",
+        default=500000, # smd_export.PARALLEL_MIN_TRIANGLES, not imported here to keep registering fast
+        min=0
+    )
+    
     def draw(self, context):
         layout = self.layout
         row = layout.row()
@@ -700,11 +1666,66 @@ class AddonPrefs(bpy.types.AddonPreferences):
         row = layout.row()
         row.enabled = self.do_make_folders_for_cdmaterials
         row.prop(self, "do_make_vmts", text="Also make placeholder VMTs (Only when compiling with the \"Same as MDL\" option)")
+        row = layout.row()
+        row.enabled = self.do_make_folders_for_cdmaterials and self.do_make_vmts
+        row.prop(self, "do_convert_textures", text="Convert the materials' image textures to VTF and use them in the VMTs")
+        
+        row = layout.row()
+        row.prop(self, "use_export_cache", text="Skip exporting meshes that haven't changed since the last compile")
+        row = layout.row()
+        row.enabled = self.use_export_cache
+        row.prop(self, "export_cache_size")
+        row.operator("wm.automdl_clear_export_cache")
+        
+        row = layout.row()
+        row.prop(self, "use_model_cache", text="Skip studiomdl when the compile is identical to an earlier one")
+        row = layout.row()
+        row.enabled = self.use_model_cache
+        row.prop(self, "model_cache_size")
+        row.operator("wm.automdl_clear_model_cache")
+        if model_cache_store is not None and model_cache_store.hits + model_cache_store.misses > 0:
+            row = layout.row()
+            row.label(text=f"This session: {model_cache_store.hits} restored, {model_cache_store.misses} compiled ({model_cache_store.hit_rate() * 100:.0f}% hit rate)", icon='INFO')
+        
+        row = layout.row()
+        row.prop(self, "track_compile_memory")
+        row.prop(self, "log_compile_profiles")
+        
+        row = layout.row()
+        row.prop(self, "export_workers")
+        row.prop(self, "parallel_export_min_triangles")
+        
+        if os.name != 'nt':
+            row = layout.row()
+            row.prop(self, "wine_path")
+            row.prop(self, "keep_wine_warm")
+            if wine_session is not None:
+                row = layout.row()
+                row.label(text=f"Using {wine_session.wine} ({'warm' if wine_session.is_warm else 'not running'})", icon='INFO')
+        
+        if export_cache_store is not None:
+            row = layout.row()
+            row.label(text=f"Export cache: {export_cache_store.hits} hits, {export_cache_store.misses} misses this session ({export_cache_store.hit_rate():.0%} hit rate)")
 
 classes = [
     AutoMDLOperator,
+    AutoMDLBatchOperator,
+    AutoMDLCancelCompileOperator,
+    AutoMDLBatchAddOperator,
+    AutoMDLBatchRemoveOperator,
+    AutoMDLLodAddOperator,
+    AutoMDLLodRemoveOperator,
+    AutoMDLRescanGamesOperator,
+    AutoMDLClearExportCacheOperator,
+    AutoMDLClearModelCacheOperator,
     AutoMDLPanel,
+    AutoMDLLodPanel,
+    AutoMDLBatchPanel,
     CdMaterialsPropGroup,
+    BatchJobPropGroup,
+    AUTOMDL_UL_batch_jobs,
+    LodPropGroup,
+    AUTOMDL_UL_lods,
     AddonPrefs
 ]
 
@@ -712,6 +1733,7 @@ class_register, class_unregister = bpy.utils.register_classes_factory(classes)
 
 def register():
     from bpy.utils import register_class
+    register_start = time.perf_counter()
 
     # Register classes
     for cls in classes:
@@ -723,13 +1745,19 @@ def register():
     # Define custom properties for the addon
     register_custom_properties()
 
-    # Initialize Steam path and game paths list
+    # Find Steam and its games on a background thread, the game dropdown fills in when it's done
     setup_steam_path()
+    
+    for handlers, handler in LIVE_MESH_HANDLERS + PANEL_STATE_HANDLERS + WATCH_HANDLERS + MESH_STATS_HANDLERS:
+        if handler not in handlers:
+            handlers.append(handler)
+    panel_state.invalidate()
+    bpy.app.timers.register(queueSceneMeshStats, first_interval=MESH_STATS_INTERVAL)
 
     # Set default values after a short delay to allow context initialization
     bpy.app.timers.register(set_default_values, first_interval=1)
 
-    print("AutoMDL addon registered successfully")
+    print(f"AutoMDL addon registered successfully in {(time.perf_counter() - register_start) * 1000:.1f}ms")
 
 def unregister():
     from bpy.utils import unregister_class
@@ -741,6 +1769,27 @@ def unregister():
         except Exception as e:
             print(f"Error unregistering class {cls.__name__}: {e}")
 
+    if bpy.app.timers.is_registered(finish_steam_discovery):
+        bpy.app.timers.unregister(finish_steam_discovery)
+    if bpy.app.timers.is_registered(watch_tick):
+        bpy.app.timers.unregister(watch_tick)
+    if bpy.app.timers.is_registered(mesh_stats_tick):
+        bpy.app.timers.unregister(mesh_stats_tick)
+    if bpy.app.timers.is_registered(queueSceneMeshStats):
+        bpy.app.timers.unregister(queueSceneMeshStats)
+    live_collection_meshes.clear()
+    if bpy.app.timers.is_registered(texture_conversion_tick):
+        bpy.app.timers.unregister(texture_conversion_tick)
+    for conversion in texture_conversions:
+        conversion.steps.close()
+    texture_conversions.clear()
+    
+    stopWineSession()
+    
+    for handlers, handler in LIVE_MESH_HANDLERS + PANEL_STATE_HANDLERS + WATCH_HANDLERS + MESH_STATS_HANDLERS:
+        if handler in handlers:
+            handlers.remove(handler)
+    
     # Remove custom properties
     unregister_custom_properties()
 
@@ -751,10 +1800,9 @@ def set_default_values():
         # Initialize default values for custom properties
         initialize_cdmaterials_list()
         
-        if game_select_method_is_dropdown:
-            select_default_game_path()
-        else:
-            onGameManualTextInputChanged(None, bpy.context)
+        # the game defaults are set once steam discovery is done
+        if game_select_method_is_dropdown is not None:
+            set_default_game()
 
         print("Default values set successfully")
     except Exception as e:
@@ -769,36 +1817,11 @@ def register_custom_properties():
     )
     bpy.types.Scene.vis_mesh = bpy.props.PointerProperty(type=bpy.types.Object, name="Selected Object", description="Select an object from the scene")
     bpy.types.Scene.phy_mesh = bpy.props.PointerProperty(type=bpy.types.Object, name="Selected Object", description="Select an object from the scene")
+    bpy.types.Scene.vis_collection = bpy.props.PointerProperty(type=bpy.types.Collection, name="Visual collection", description="Export every mesh in this collection (and its children) as the visual mesh, as if they were joined. Takes the place of the object")
+    bpy.types.Scene.phy_collection = bpy.props.PointerProperty(type=bpy.types.Collection, name="Collision collection", description="Export every mesh in this collection (and its children) as the collision mesh, as if they were joined. Takes the place of the object")
     bpy.types.Scene.surfaceprop = bpy.props.EnumProperty(
         name="Selected Option",
-        items = [
-            ("Concrete", "Concrete", ""),
-            ("Chainlink", "Chainlink", ""),
-            ("Canister", "Canister", ""),
-            ("Crowbar", "Crowbar", ""),
-            ("Metal", "Metal", ""),
-            ("Metalvent", "Metalvent", ""),
-            ("Popcan", "Popcan", ""),
-            ("Wood", "Wood", ""),
-            ("Plaster", "Plaster", ""),
-            ("Dirt", "Dirt", ""),
-            ("Grass", "Grass", ""),
-            ("Sand", "Sand", ""),
-            ("Snow", "Snow", ""),
-            ("Ice", "Ice", ""),
-            ("Flesh", "Flesh", ""),
-            ("Glass", "Glass", ""),
-            ("Tile", "Tile", ""),
-            ("Paper", "Paper", ""),
-            ("Cardboard", "Cardboard", ""),
-            ("Plastic_Box", "Plastic_Box", ""),
-            ("Plastic_barrel", "Plastic_barrel", ""),
-            ("Plastic", "Plastic", ""),
-            ("Rubber", "Rubber", ""),
-            ("Clay", "Clay", ""),
-            ("Porcelain", "Porcelain", ""),
-            ("Computer", "Computer", "")
-        ]
+        items = SURFACEPROP_ITEMS
     )
     bpy.types.Scene.staticprop = bpy.props.BoolProperty(name="Static Prop", description="Enable if used as prop_static\n($staticprop in QC)", default=False)
     bpy.types.Scene.mostlyopaque = bpy.props.BoolProperty(name="Has Transparency", description="Enabling this may fix sorting issues...", default=False)
@@ -808,42 +1831,133 @@ def register_custom_properties():
             ('1','Other','')
         )
     )
+    bpy.types.Scene.mesh_format = bpy.props.EnumProperty(
+        name="Mesh Format",
+        items = (
+            ('SMD', 'SMD', "Text SMD files. Works with every studiomdl"),
+            ('DMX', 'DMX', "Indexed binary DMX files. Smaller, and faster for studiomdl to read")
+        )
+    )
+    bpy.types.Scene.generate_convex_hulls = bpy.props.BoolProperty(
+        name="Convex Hulls",
+        description="Replace every loose part of the collision mesh with its convex hull before compiling. Faster compiles and cheaper physics for loosely modelled collision meshes",
+        default=False
+    )
+    bpy.types.Scene.convex_hull_max_vertices = bpy.props.IntProperty(
+        name="Max Hull Vertices",
+        description="Most vertices a single convex hull may keep. 0 for no limit",
+        default=32, min=0, soft_min=8
+    )
+    bpy.types.Scene.watch_mode = bpy.props.BoolProperty(
+        name="Watch",
+        description="Compile by itself after saving, or after editing or moving the visual or collision mesh. A compile that is still running when the next one is due gets replaced",
+        default=False
+    )
+    bpy.types.Scene.watch_debounce = bpy.props.FloatProperty(
+        name="Watch Delay",
+        description="Seconds without further changes before watch mode compiles. Changes made in the meantime are all compiled together",
+        default=1.0, min=0.1, soft_max=10.0
+    )
     bpy.types.Scene.cdmaterials_list = bpy.props.CollectionProperty(type=CdMaterialsPropGroup)
     bpy.types.Scene.cdmaterials_list_active_index = bpy.props.IntProperty()
+    bpy.types.Scene.lods = bpy.props.CollectionProperty(type=LodPropGroup)
+    bpy.types.Scene.lods_active_index = bpy.props.IntProperty()
+    bpy.types.Scene.batch_jobs = bpy.props.CollectionProperty(type=BatchJobPropGroup)
+    bpy.types.Scene.batch_jobs_active_index = bpy.props.IntProperty()
+    bpy.types.Scene.batch_workers = bpy.props.IntProperty(
+        name="Parallel Compiles",
+        description="How many studiomdl processes to run at once. 0 uses one per CPU core",
+        default=0, min=0
+    )
 
 def unregister_custom_properties():
     try:
         del bpy.types.Scene.surfaceprop_text_input
         del bpy.types.Scene.vis_mesh
         del bpy.types.Scene.phy_mesh
+        del bpy.types.Scene.vis_collection
+        del bpy.types.Scene.phy_collection
         del bpy.types.Scene.surfaceprop
         del bpy.types.Scene.staticprop
         del bpy.types.Scene.mostlyopaque
         del bpy.types.Scene.mass_text_input
-        if game_select_method_is_dropdown:
-            del bpy.types.Scene.game_select
-        else:
+        del bpy.types.Scene.game_select
+        if game_select_method_is_dropdown == False:
             del bpy.types.Scene.studiomdl_manual_input
         del bpy.types.Scene.cdmaterials_type
+        del bpy.types.Scene.mesh_format
+        del bpy.types.Scene.generate_convex_hulls
+        del bpy.types.Scene.convex_hull_max_vertices
+        del bpy.types.Scene.watch_mode
+        del bpy.types.Scene.watch_debounce
         del bpy.types.Scene.cdmaterials_list
         del bpy.types.Scene.cdmaterials_list_active_index
+        del bpy.types.Scene.lods
+        del bpy.types.Scene.lods_active_index
+        del bpy.types.Scene.batch_jobs
+        del bpy.types.Scene.batch_jobs_active_index
+        del bpy.types.Scene.batch_workers
     except AttributeError as e:
         print(f"Error removing property: {e}")
 
 def setup_steam_path():
-    global steam_path, games_paths_list, game_select_method_is_dropdown
-    steam_path = getSteamInstallationPath()
+    global steam_discovery_thread, game_select_method_is_dropdown
+    game_select_method_is_dropdown = None
+    steam_discovery_result.clear()
+    
+    # empty until the discovery thread is done
+    defineGameSelectDropdown(None, bpy.context)
+    
+    steam_discovery_thread = threading.Thread(target=discoverSteamGames, args=(getGameDiscoveryCachePath(),), daemon=True)
+    steam_discovery_thread.start()
+    bpy.app.timers.register(finish_steam_discovery, first_interval=0.1, persistent=True)
+
+# runs on the discovery thread, only touches the filesystem (and the registry) and leaves the results for finish_steam_discovery
+def discoverSteamGames(cache_path):
+    global steam_path
+    try:
+        found_steam_path = getSteamInstallationPath()
+        if found_steam_path is not None:
+            found_steam_path = os.path.join(found_steam_path, "").replace("\\", "/")
+            steam_path = found_steam_path
+            steam_discovery_result["games"] = getGamesList(cache_path=cache_path)
+        steam_discovery_result["steam_path"] = found_steam_path
+    except Exception as e:
+        print(f"Error finding Steam games: {e}")
+        steam_discovery_result["steam_path"] = None
+
+# timer on the main thread, waits for the discovery thread and then fills in the game dropdown
+def finish_steam_discovery():
+    global steam_path, games_paths_list, game_select_method_is_dropdown, steam_discovery_thread
+    if steam_discovery_thread is None:
+        return None
+    if steam_discovery_thread.is_alive() or bpy.context.scene is None:
+        return 0.1
+    steam_discovery_thread = None
+    
+    steam_path = steam_discovery_result.get("steam_path")
     if steam_path is not None:
         game_select_method_is_dropdown = True
-        steam_path = os.path.join(steam_path, "").replace("\\", "/")
-        games_paths_list = getGamesList()
-        defineGameSelectDropdown(None, bpy.context)
+        games_paths_list = steam_discovery_result.get("games", [])
+        refreshGameSelectDropdown(None, bpy.context)
     else:
         game_select_method_is_dropdown = False
-        steam_path = None
         bpy.types.Scene.studiomdl_manual_input = bpy.props.StringProperty(
             name="", default="", description="Path to the studiomdl.exe file", update=onGameManualTextInputChanged
         )
+    
+    set_default_game()
+    redrawAutoMDLPanel(bpy.context)
+    return None
+
+def set_default_game():
+    try:
+        if game_select_method_is_dropdown:
+            select_default_game_path()
+        else:
+            onGameManualTextInputChanged(None, bpy.context)
+    except Exception as e:
+        print(f"Error setting default game: {e}")
 
 def initialize_cdmaterials_list():
     bpy.context.scene.cdmaterials_list.clear()
@@ -882,15 +1996,933 @@ def select_default_game_path():
 
 
 def checkVisMeshHasMesh(context):
+    if context.scene.vis_collection is not None:
+        return isExportableMesh(getVisMesh(context.scene))
     vis_mesh_obj = context.scene.vis_mesh
     return (vis_mesh_obj and vis_mesh_obj.type == 'MESH' and vis_mesh_obj.name in bpy.data.objects) == True
 
 
 def checkPhyMeshHasMesh(context):
+    if context.scene.phy_collection is not None:
+        return isExportableMesh(getPhyMesh(context.scene))
     phy_mesh_obj = context.scene.phy_mesh
     return (phy_mesh_obj and phy_mesh_obj.type == 'MESH' and phy_mesh_obj.name in bpy.data.objects) == True
 
 
+# what AutoMDLPanel shows about the scene, worked out once and kept until the handlers below see a change it depends on
+class PanelState:
+    
+    def __init__(self):
+        self.valid = False
+        self.key = None
+        self.tracked_objects = set()
+        self.vis_mesh = None
+        self.phy_mesh = None
+        self.vis_mesh_valid = False
+        self.phy_mesh_valid = False
+        self.has_materials = False
+        self.vmt_paths = []
+        self.vmt_path_error = None
+    
+    def invalidate(self):
+        self.valid = False
+    
+    def get(self, context):
+        # a different scene or blend path is always a change, whatever the handlers saw
+        key = (context.scene.as_pointer(), bpy.data.filepath)
+        if not self.valid or key != self.key:
+            self.update(context)
+            self.key = key
+            self.valid = True
+        return self
+    
+    def update(self, context):
+        scene = context.scene
+        self.vis_mesh_valid = checkVisMeshHasMesh(context)
+        self.phy_mesh_valid = checkPhyMeshHasMesh(context)
+        self.vis_mesh = getVisMesh(scene)
+        self.phy_mesh = getPhyMesh(scene)
+        self.tracked_objects = getTrackedObjectNames(scene)
+        
+        self.has_materials = self.vis_mesh_valid and len(self.vis_mesh.material_slots) > 0
+        self.vmt_paths = []
+        self.vmt_path_error = None
+        if not self.has_materials:
+            return
+        
+        if len(bpy.data.filepath) == 0:
+            self.vmt_path_error = "Blend file not saved"
+            return
+        
+        modelpath = to_models_relative_path(bpy.data.filepath)
+        if modelpath is None:
+            self.vmt_path_error = "Blend file is not inside a models folder"
+            return
+        
+        modelpath_dirname = os.path.dirname(modelpath)
+        for slot in self.vis_mesh.material_slots:
+            self.vmt_paths.append(os.path.join("materials/models/", modelpath_dirname, slot.name).replace("\\", "/") + ".vmt")
+
+panel_state = PanelState()
+
+# scene changes (mesh pointers, deleted objects), material slots of the chosen meshes and material renames
+@persistent
+def onDepsgraphUpdatePanelState(scene, depsgraph):
+    if not panel_state.valid:
+        return
+    for update in depsgraph.updates:
+        changed_id = update.id
+        if isinstance(changed_id, (bpy.types.Scene, bpy.types.Collection, bpy.types.Material)):
+            panel_state.invalidate()
+            return
+        if isinstance(changed_id, bpy.types.Object) and changed_id.name in panel_state.tracked_objects:
+            panel_state.invalidate()
+            return
+
+# saving can move the blend file, loading and undo replace the data entirely
+@persistent
+def onFileChangedPanelState(*args):
+    panel_state.invalidate()
+
+# building a CollectionMesh walks the whole collection, the depsgraph handlers and the mesh stats timer share one per collection
+# it's dropped when the collection (or one of its children) changes, and its material slots remapped when one of its objects or a material does
+def getLiveCollectionMesh(collection):
+    mesh = live_collection_meshes.get(collection.name)
+    try:
+        if mesh is not None and mesh.collection == collection:
+            return mesh
+    except ReferenceError:
+        pass
+    mesh = live_collection_meshes[collection.name] = CollectionMesh(collection)
+    return mesh
+
+def getLiveVisMesh(scene):
+    return getLiveCollectionMesh(scene.vis_collection) if scene.vis_collection is not None else scene.vis_mesh
+
+def getLivePhyMesh(scene):
+    return getLiveCollectionMesh(scene.phy_collection) if scene.phy_collection is not None else scene.phy_mesh
+
+# registered before the other depsgraph handlers, so they see the collections as they are now
+@persistent
+def onDepsgraphUpdateLiveMeshes(scene, depsgraph):
+    if not live_collection_meshes:
+        return
+    for update in depsgraph.updates:
+        changed_id = update.id
+        if isinstance(changed_id, bpy.types.Collection):
+            for name, mesh in list(live_collection_meshes.items()):
+                if changed_id.name in mesh.collection_names:
+                    del live_collection_meshes[name]
+        elif isinstance(changed_id, bpy.types.Material):
+            for mesh in live_collection_meshes.values():
+                mesh.forget_materials()
+        elif isinstance(changed_id, bpy.types.Object):
+            for mesh in live_collection_meshes.values():
+                if changed_id.name in mesh.object_names:
+                    mesh.forget_materials()
+
+@persistent
+def onFileChangedLiveMeshes(*args):
+    live_collection_meshes.clear()
+
+# live mesh stats: geometry changes of the chosen meshes queue them, a timer works them out a few milliseconds per tick
+
+# time the mesh stats timer may take per tick, and how often it runs while there's work left
+MESH_STATS_BUDGET = 0.004
+MESH_STATS_INTERVAL = 0.05
+
+# live_mesh_stats is keyed by ('OBJECT', name) or ('COLLECTION', name), objects and collections can share names
+def getMeshStatsKey(mesh):
+    return ('COLLECTION' if isinstance(mesh, CollectionMesh) else 'OBJECT', mesh.name)
+
+def getMeshFromStatsKey(key):
+    kind, name = key
+    if kind == 'COLLECTION':
+        collection = bpy.data.collections.get(name)
+        return getLiveCollectionMesh(collection) if collection is not None else None
+    obj = bpy.data.objects.get(name)
+    return obj if obj is not None and obj.type == 'MESH' else None
+
+def queueMeshStats(key):
+    live_mesh_stats_dirty.add(key)
+    if not bpy.app.timers.is_registered(mesh_stats_tick):
+        bpy.app.timers.register(mesh_stats_tick, first_interval=MESH_STATS_INTERVAL)
+
+# the chosen meshes the timer hasn't worked out yet, after choosing another mesh, loading a file or enabling the add-on
+def queueMissingMeshStats(scene):
+    phy_mesh = getLivePhyMesh(scene)
+    for mesh in (getLiveVisMesh(scene), phy_mesh):
+        if mesh is None:
+            continue
+        key = getMeshStatsKey(mesh)
+        if key in live_mesh_stats_jobs or key in live_mesh_stats_dirty:
+            continue
+        stats = live_mesh_stats.get(key)
+        if stats is None or (mesh is phy_mesh and stats.islands is None):
+            queueMeshStats(key)
+
+def queueSceneMeshStats():
+    if bpy.context.scene is not None:
+        queueMissingMeshStats(bpy.context.scene)
+    return None
+
+# reads one object of the mesh at a time, for MeshStatsJob to spread over the ticks of the timer
+def iterReadMeshStats(mesh, count_islands):
+    import numpy as np
+    members = zip(mesh.objects, mesh.material_maps) if isinstance(mesh, CollectionMesh) else [(mesh, None)]
+    
+    vertex_count = 0
+    loop_totals = []
+    material_indices = []
+    edges = []
+    for obj, material_map in members:
+        object_eval = obj.evaluated_get(bpy.context.evaluated_depsgraph_get())
+        member_mesh = object_eval.to_mesh()
+        try:
+            face_count = len(member_mesh.polygons)
+            member_loop_totals = np.empty(face_count, dtype=np.int32)
+            member_mesh.polygons.foreach_get("loop_total", member_loop_totals)
+            member_material_indices = np.empty(face_count, dtype=np.int32)
+            member_mesh.polygons.foreach_get("material_index", member_material_indices)
+            if material_map is not None:
+                # into the collection's shared material slots
+                material_map = np.asarray(material_map or [0], dtype=np.int32)
+                member_material_indices = material_map[np.clip(member_material_indices, 0, len(material_map) - 1)]
+            if count_islands:
+                member_edges = np.empty(len(member_mesh.edges) * 2, dtype=np.int32)
+                member_mesh.edges.foreach_get("vertices", member_edges)
+                edges.append(member_edges.reshape(-1, 2) + vertex_count)
+            loop_totals.append(member_loop_totals)
+            material_indices.append(member_material_indices)
+            vertex_count += len(member_mesh.vertices)
+        finally:
+            object_eval.to_mesh_clear()
+        yield
+    
+    return vertex_count, np.concatenate(loop_totals), np.concatenate(material_indices), len(mesh.material_slots), np.concatenate(edges) if count_islands else None
+
+def mesh_stats_tick():
+    from . import mesh_stats
+    context = bpy.context
+    scene = context.scene
+    if scene is None:
+        return MESH_STATS_INTERVAL
+    
+    # a mesh that changed again is started over, the arrays a job has read are out of date
+    phy_mesh = getLivePhyMesh(scene)
+    phy_mesh_key = getMeshStatsKey(phy_mesh) if phy_mesh is not None else None
+    while live_mesh_stats_dirty:
+        key = live_mesh_stats_dirty.pop()
+        live_mesh_stats_jobs.pop(key, None)
+        mesh = getMeshFromStatsKey(key)
+        if mesh is None or not getMeshObjects(mesh):
+            live_mesh_stats.pop(key, None)
+            continue
+        count_islands = key == phy_mesh_key
+        live_mesh_stats_jobs[key] = mesh_stats.MeshStatsJob(iterReadMeshStats(mesh, count_islands), count_islands)
+    
+    deadline = time.perf_counter() + MESH_STATS_BUDGET
+    for key, job in list(live_mesh_stats_jobs.items()):
+        remaining = deadline - time.perf_counter()
+        if remaining <= 0:
+            break
+        try:
+            finished = job.step(remaining)
+        except ReferenceError:
+            # one of its objects was deleted while it was being read, the depsgraph update for that queues it again
+            del live_mesh_stats_jobs[key]
+            if key[0] == 'COLLECTION':
+                live_collection_meshes.pop(key[1], None)
+            continue
+        if finished:
+            live_mesh_stats[key] = job.result
+            del live_mesh_stats_jobs[key]
+            redrawAutoMDLPanel(context)
+    
+    return MESH_STATS_INTERVAL if live_mesh_stats_jobs or live_mesh_stats_dirty else None
+
+@persistent
+def onDepsgraphUpdateMeshStats(scene, depsgraph):
+    # exporting adds and removes modifiers for the lods, the geometry is the same before and after
+    if watch_exporting:
+        return
+    
+    for mesh in (getLiveVisMesh(scene), getLivePhyMesh(scene)):
+        if mesh is None:
+            continue
+        names = mesh.object_names if isinstance(mesh, CollectionMesh) else {mesh.name}
+        # objects linked to or unlinked from a collection change what it exports as well
+        collection_names = mesh.collection_names if isinstance(mesh, CollectionMesh) else set()
+        for update in depsgraph.updates:
+            changed_id = update.id
+            if (isinstance(changed_id, bpy.types.Object) and changed_id.name in names and update.is_updated_geometry) or \
+                    (isinstance(changed_id, bpy.types.Collection) and changed_id.name in collection_names):
+                queueMeshStats(getMeshStatsKey(mesh))
+                break
+    
+    queueMissingMeshStats(scene)
+
+# loading and undo replace the data, the panel asks for whatever it shows again
+@persistent
+def onFileChangedMeshStats(*args):
+    live_mesh_stats.clear()
+    live_mesh_stats_jobs.clear()
+    live_mesh_stats_dirty.clear()
+    if bpy.context.scene is not None:
+        queueMissingMeshStats(bpy.context.scene)
+
+# watch mode: saves, and edits or moves of the chosen meshes, start a compile once things have been quiet for a moment
+
+def finishWatchCompile(succeeded, key):
+    """Note how a compile ended. key identifies what it delivered (model_cache.compile_key), None when unknown."""
+    global watch_compile_trigger, watch_last_compile_key, watch_last_latency
+    if watch_compile_trigger is not None:
+        if succeeded:
+            watch_last_latency = time.perf_counter() - watch_compile_trigger
+        watch_compile_trigger = None
+    
+    # a failed compile left the previous files in place, a successful one (watch mode's or a manual one) replaced them
+    if succeeded:
+        watch_last_compile_key = key
+
+def triggerWatchCompile():
+    watch_scheduler.trigger(time.perf_counter())
+    if not bpy.app.timers.is_registered(watch_tick):
+        bpy.app.timers.register(watch_tick, first_interval=0.1)
+
+def watch_tick():
+    global watch_compile_trigger
+    context = bpy.context
+    scene = context.scene
+    if scene is None or not scene.watch_mode:
+        watch_scheduler.take()
+        return None
+    
+    remaining = watch_scheduler.remaining(time.perf_counter(), scene.watch_debounce)
+    if remaining is None:
+        return None
+    redrawAutoMDLPanel(context)
+    if remaining > 0 or active_batch_pool is not None:
+        return 0.1
+    
+    # whatever is exporting or compiling is already out of date, stop it and compile the latest state once it's gone
+    if active_export is not None:
+        active_export.cancel_requested = True
+        return 0.1
+    if active_compile_job is not None:
+        active_compile_job.cancel()
+        return 0.1
+    
+    watch_compile_trigger, _ = watch_scheduler.take()
+    
+    # the operator needs a window to compile in the background
+    windows = context.window_manager.windows
+    try:
+        with context.temp_override(window=windows[0] if len(windows) > 0 else None):
+            bpy.ops.wm.automdl()
+    except RuntimeError as e:
+        print(f"AutoMDL watch mode: {e}")
+    
+    # it stopped before exporting (invalid settings)
+    if watch_compile_trigger is not None and active_compile_job is None and active_export is None:
+        finishWatchCompile(False, None)
+    
+    redrawAutoMDLPanel(context)
+    return None
+
+@persistent
+def onSavePostWatch(*args):
+    scene = bpy.context.scene
+    if scene is not None and scene.watch_mode:
+        triggerWatchCompile()
+
+@persistent
+def onDepsgraphUpdateWatch(scene, depsgraph):
+    # edit mode edits are taken when leaving edit mode (or saving), compiling exits edit mode every time
+    if not scene.watch_mode or watch_exporting or bpy.context.mode != 'OBJECT':
+        return
+    
+    watched = set()
+    collections = set()
+    for mesh in (getLiveVisMesh(scene), getLivePhyMesh(scene)):
+        if isinstance(mesh, CollectionMesh):
+            watched |= mesh.object_names
+            collections |= mesh.collection_names
+        elif mesh is not None:
+            watched.add(mesh.name)
+    for update in depsgraph.updates:
+        if isinstance(update.id, bpy.types.Object) and update.id.name in watched and (update.is_updated_geometry or update.is_updated_transform):
+            triggerWatchCompile()
+            return
+        if isinstance(update.id, bpy.types.Collection) and update.id.name in collections:
+            triggerWatchCompile()
+            return
+
+LIVE_MESH_HANDLERS = [
+    (bpy.app.handlers.depsgraph_update_post, onDepsgraphUpdateLiveMeshes),
+    (bpy.app.handlers.load_post, onFileChangedLiveMeshes),
+    (bpy.app.handlers.undo_post, onFileChangedLiveMeshes),
+    (bpy.app.handlers.redo_post, onFileChangedLiveMeshes),
+]
+
+WATCH_HANDLERS = [
+    (bpy.app.handlers.save_post, onSavePostWatch),
+    (bpy.app.handlers.depsgraph_update_post, onDepsgraphUpdateWatch),
+]
+
+MESH_STATS_HANDLERS = [
+    (bpy.app.handlers.depsgraph_update_post, onDepsgraphUpdateMeshStats),
+    (bpy.app.handlers.load_post, onFileChangedMeshStats),
+    (bpy.app.handlers.undo_post, onFileChangedMeshStats),
+    (bpy.app.handlers.redo_post, onFileChangedMeshStats),
+]
+
+PANEL_STATE_HANDLERS = [
+    (bpy.app.handlers.depsgraph_update_post, onDepsgraphUpdatePanelState),
+    (bpy.app.handlers.save_post, onFileChangedPanelState),
+    (bpy.app.handlers.load_post, onFileChangedPanelState),
+    (bpy.app.handlers.undo_post, onFileChangedPanelState),
+    (bpy.app.handlers.redo_post, onFileChangedPanelState),
+]
+
+
+# returns why a batch job can't be compiled, or None if it can
+def getBatchJobError(job):
+    if len(job.model_path.strip()) == 0:
+        return "No model path"
+    
+    if not isExportableMesh(getVisMesh(job)):
+        return "Visual mesh is not a mesh in the scene"
+    
+    phy_mesh = getPhyMesh(job)
+    if phy_mesh is not None and not isExportableMesh(phy_mesh):
+        return "Collision mesh is not a mesh in the scene"
+    
+    if not job.staticprop and not is_float(job.mass_text_input):
+        return "Mass is invalid"
+    
+    return None
+
+
+# move new studiomdl output of the running compile into the log shown in the panel
+def collectCompileOutput():
+    if active_compile_job is None:
+        return
+    
+    # the panel (and batch_cli's summary) show the log, printing every line too would slow down a chatty compile
+    compile_log_lines.extend(active_compile_job.new_lines())
+    
+    # only the tail is shown, no need to keep everything
+    del compile_log_lines[:-COMPILE_LOG_MAX_LINES]
+
+
+def redrawAutoMDLPanel(context):
+    if context.screen is None:
+        return
+    for area in context.screen.areas:
+        if area.type == 'VIEW_3D':
+            area.tag_redraw()
+
+
+WINE_NOT_FOUND_MESSAGE = "studiomdl.exe needs Wine to run here, but none was found. Install Wine, or set it in the addon preferences"
+
+# the command (and environment) that runs studiomdl_args: as they are on Windows, under Wine elsewhere
+# returns (None, None) when studiomdl.exe needs Wine and there is none
+def getCompilerCommand(studiomdl_args):
+    if os.name == 'nt':
+        return studiomdl_args, None
+    
+    # anything else called studiomdl.exe (a stand-in script, a native build) runs as it is
+    from . import wine
+    if not wine.is_windows_executable(studiomdl_args[0]):
+        return studiomdl_args, None
+    
+    session = getWineSession()
+    if session is None:
+        return None, None
+    return session.command(studiomdl_args), session.env
+
+def getWineSession():
+    global wine_session
+    from . import wine
+    prefs = bpy.context.preferences.addons[__package__].preferences
+    wine_path = bpy.path.abspath(prefs.wine_path) if prefs.wine_path else None
+    
+    # a different wine set in the preferences gets a session of its own
+    if wine_session is not None and wine_path is not None and wine_session.wine != wine_path:
+        wine_session.stop()
+        wine_session = None
+    
+    if wine_session is None:
+        libraries = game_discovery.steam_library_folders(steam_path) if steam_path is not None else []
+        wine_path = wine_path or wine.find_wine(libraries)
+        if wine_path is None:
+            return None
+        prefix = os.path.join(bpy.utils.user_resource('CONFIG', path="automdl", create=True), "wineprefix")
+        wine_session = wine.WineSession(wine_path, prefix)
+    
+    # keeps the wineserver running for the next compiles, this one only gains if it was already warm
+    if prefs.keep_wine_warm:
+        wine_session.warm()
+    return wine_session
+
+def stopWineSession():
+    global wine_session
+    if wine_session is not None:
+        wine_session.stop()
+        wine_session = None
+
+# a stage of the compile being profiled, does nothing (but still yields a dict to fill in) when there is none
+def profileStage(name, **info):
+    if active_profile is None:
+        return nullcontext({})
+    return active_profile.stage(name, **info)
+
+def addProfileStage(name, seconds, **info):
+    if active_profile is not None:
+        active_profile.add(name, seconds, **info)
+
+def getCompileProfileLogPath():
+    return os.path.join(bpy.utils.user_resource('CONFIG', path="automdl", create=True), "compile_profiles.jsonl")
+
+def finishCompileProfile(profile, status):
+    global active_profile, last_compile_profile
+    active_profile = None
+    profile.finish(status)
+    last_compile_profile = profile
+    
+    if bpy.context.preferences.addons[__package__].preferences.log_compile_profiles:
+        try:
+            profile.append_to_log(getCompileProfileLogPath())
+        except OSError as e:
+            print(f"Error writing compile profile: {e}")
+
+
+# returns the export cache, or None if it's turned off in the addon preferences
+def getExportCache():
+    global export_cache_store
+    prefs = bpy.context.preferences.addons[__package__].preferences
+    if not prefs.use_export_cache:
+        return None
+    
+    if export_cache_store is None:
+        from . import export_cache
+        folder = bpy.utils.user_resource('CONFIG', path=os.path.join("automdl", "export_cache"), create=True)
+        export_cache_store = export_cache.ExportCache(folder, 0)
+    
+    export_cache_store.max_bytes = prefs.export_cache_size * 1024 * 1024
+    return export_cache_store
+
+
+# returns the compiled model cache, or None if it's turned off in the addon preferences
+def getModelCache():
+    global model_cache_store
+    prefs = bpy.context.preferences.addons[__package__].preferences
+    if not prefs.use_model_cache:
+        return None
+    
+    if model_cache_store is None:
+        from . import model_cache
+        folder = bpy.utils.user_resource('CONFIG', path=os.path.join("automdl", "model_cache"), create=True)
+        model_cache_store = model_cache.ModelCache(folder, 0)
+    
+    model_cache_store.max_bytes = prefs.model_cache_size * 1024 * 1024
+    return model_cache_store
+
+
+TEXTURE_MANIFEST_NAME = ".automdl_textures.json"
+
+def get_vmt_text(entry, basetexture=None):
+    if basetexture is None:
+        basetexture = os.path.join(entry, "_PLACEHOLDER_").replace("\\", "/")
+    return f"VertexLitGeneric\n{{\n\t$basetexture \"{basetexture}\"\n}}"
+
+def is_placeholder_vmt(vmt_path, entry):
+    try:
+        with open(vmt_path, "r") as file:
+            return file.read() == get_vmt_text(entry)
+    except OSError:
+        return False
+
+# image texture feeding the base color of a material, or the first image texture in it
+def get_material_base_image(material):
+    if material is None or not material.use_nodes or material.node_tree is None:
+        return None
+    
+    nodes = material.node_tree.nodes
+    for node in nodes:
+        if node.type == 'BSDF_PRINCIPLED':
+            for link in node.inputs["Base Color"].links:
+                if link.from_node.type == 'TEX_IMAGE' and link.from_node.image is not None:
+                    return link.from_node.image
+    
+    for node in nodes:
+        if node.type == 'TEX_IMAGE' and node.image is not None:
+            return node.image
+    return None
+
+# name, or name_2, name_3... when another image's texture has it already (like "wood.001" and "wood_001" both cleaning to "wood_001")
+# names are compared ignoring case, the engine and Windows don't tell them apart
+def get_unique_texture_name(name, taken):
+    taken = {other.lower() for other in taken}
+    unique_name = name
+    suffix = 2
+    while unique_name.lower() in taken:
+        unique_name = f"{name}_{suffix}"
+        suffix += 1
+    return unique_name
+
+# bytes the image is loaded from (packed or its file), or None when only its pixels say what it looks like
+def get_image_source(image):
+    if image.packed_file is not None:
+        return image.packed_file.data
+    
+    path = bpy.path.abspath(image.filepath_raw)
+    if image.source == 'FILE' and not image.is_dirty and os.path.isfile(path):
+        with open(path, "rb") as file:
+            return file.read()
+    return None
+
+# rgba pixels of the image as bytes, top row first like a vtf
+def read_image_pixels(image):
+    import numpy as np
+    width, height = image.size
+    pixels = np.empty(width * height * 4, dtype=np.float32)
+    image.pixels.foreach_get(pixels)
+    pixels = np.clip(pixels * 255 + 0.5, 0, 255).astype(np.uint8)
+    return np.ascontiguousarray(pixels.reshape(height, width, 4)[::-1])
+
+def load_texture_manifest(manifest_path):
+    try:
+        with open(manifest_path, "r", encoding="utf-8") as file:
+            return json.load(file)
+    except (OSError, ValueError):
+        return {}
+
+def save_texture_manifest(manifest_path, manifest):
+    temp_manifest_path = manifest_path + ".tmp"
+    with open(temp_manifest_path, "w", encoding="utf-8") as file:
+        json.dump(manifest, file, indent=1, sort_keys=True)
+    os.replace(temp_manifest_path, manifest_path)
+
+# a texture conversion runs TEXTURE_CONVERSION_BUDGET seconds at a time, TEXTURE_CONVERSION_INTERVAL apart:
+# reading an image's pixels (main thread only) or handing finished VTFs over, the compressing happens in worker processes
+TEXTURE_CONVERSION_BUDGET = 0.01
+TEXTURE_CONVERSION_INTERVAL = 0.05
+
+# the VTFs of one materials folder being converted, and the texture keys its manifest gets once they're all written
+class TextureConversion:
+    
+    def __init__(self, steps, manifest_path, keys, paths):
+        self.steps = steps
+        self.manifest_path = manifest_path
+        self.keys = keys
+        self.paths = paths
+        self.start_time = time.perf_counter()
+    
+    def finish(self):
+        # other conversions into the same folder may have saved the manifest since this one started
+        manifest = load_texture_manifest(self.manifest_path)
+        manifest.update(self.keys)
+        save_texture_manifest(self.manifest_path, manifest)
+        seconds = time.perf_counter() - self.start_time
+        print(f"AutoMDL: converted {len(self.keys)} textures to VTF in {seconds:.2f}s ({len(self.keys) / max(seconds, 1e-6):.1f} textures/s)")
+
+# background runs (batch_cli) have no timers, and Blender exits right after, so the conversion is done there and then
+def startTextureConversion(conversion):
+    if bpy.app.background:
+        for _ in conversion.steps:
+            pass
+        conversion.finish()
+        return
+    
+    texture_conversions.append(conversion)
+    if not bpy.app.timers.is_registered(texture_conversion_tick):
+        bpy.app.timers.register(texture_conversion_tick, first_interval=TEXTURE_CONVERSION_INTERVAL, persistent=True)
+
+def texture_conversion_tick():
+    deadline = time.perf_counter() + TEXTURE_CONVERSION_BUDGET
+    for conversion in list(texture_conversions):
+        try:
+            while time.perf_counter() < deadline:
+                next(conversion.steps)
+        except StopIteration:
+            texture_conversions.remove(conversion)
+            conversion.finish()
+        except Exception as e:
+            # an image removed before its pixels were read, a full disk: the manifest isn't updated, so it's tried again next compile
+            texture_conversions.remove(conversion)
+            conversion.steps.close()
+            print(f"AutoMDL: texture conversion failed: {e}")
+    
+    return TEXTURE_CONVERSION_INTERVAL if texture_conversions else None
+
+# lods of the scene in the order studiomdl wants them, nearest first
+def getLodSettings(scene):
+    return sorted(scene.lods, key=lambda lod: lod.distance)
+
+# a sliced export runs slices for EXPORT_SLICE_SECONDS on every timer tick, EXPORT_SLICE_INTERVAL apart
+# every slice is a mesh read from Blender, a block of triangles written (smd_export.FORMAT_BLOCK_SIZE) or EXPORT_SLICE_EDGES collision edges
+EXPORT_SLICE_SECONDS = 0.05
+EXPORT_SLICE_INTERVAL = 0.01
+EXPORT_SLICE_EDGES = 1 << 16
+
+# how far a sliced export has got, in triangles written and collision edges gone through
+class ExportProgress:
+    
+    def __init__(self):
+        self.done = 0
+        self.total = 0
+    
+    @property
+    def fraction(self):
+        return min(1.0, self.done / self.total) if self.total > 0 else 0.0
+
+# drives a sliced step (a generator yielding how much of its work is done so far) from another generator:
+# passes its slices on, counts its work into progress, and times only the slices, not the waits between them
+# returns (the step's return value, seconds)
+def runSlices(steps, progress):
+    base = progress.done
+    seconds = 0.0
+    try:
+        while True:
+            slice_start = time.perf_counter()
+            try:
+                done = next(steps)
+            except StopIteration as finished:
+                return finished.value, seconds + time.perf_counter() - slice_start
+            seconds += time.perf_counter() - slice_start
+            progress.done = base + done
+            yield
+    finally:
+        # stopped early: the step closes its files now, not whenever it's collected
+        steps.close()
+
+# runSlices for several steps at once, going round them a slice of each at a time
+# returns (the return value of every step, seconds of every step)
+def runSlicesRoundRobin(steps, progress):
+    base = progress.done
+    done = [0] * len(steps)
+    values = [None] * len(steps)
+    seconds = [0.0] * len(steps)
+    running = list(range(len(steps)))
+    try:
+        while running:
+            for index in list(running):
+                slice_start = time.perf_counter()
+                try:
+                    done[index] = next(steps[index])
+                except StopIteration as finished:
+                    values[index] = finished.value
+                    running.remove(index)
+                seconds[index] += time.perf_counter() - slice_start
+                progress.done = base + sum(done)
+                yield
+    finally:
+        for step in steps:
+            step.close()
+    return values, seconds
+
+# evaluated mesh of the object (modifiers applied, in world space), read into flat arrays for the exporters
+# with decimate_ratio, a decimate modifier is added on top of the object's own modifiers for just this evaluation
+def getObjectMeshArrays(obj, decimate_ratio=None):
+    if isinstance(obj, CollectionMesh):
+        return obj.read_arrays(decimate_ratio)
+    
+    mode_snapshot = enterObjectMode()
+    
+    # todo: check if object obj exists?
+    
+    # the lod is decimated from a copy, obj itself is left alone
+    source = obj
+    if decimate_ratio is not None:
+        with profileStage("copy_for_lod", object=obj.name):
+            source = makeLodCopies([obj], decimate_ratio)[0]
+    
+    try:
+        # get mesh, apply modifiers
+        with profileStage("depsgraph" if decimate_ratio is None else "decimate", object=obj.name):
+            depsgraph = bpy.context.evaluated_depsgraph_get()
+            object_eval = source.evaluated_get(depsgraph)
+        with profileStage("to_mesh", object=obj.name):
+            mesh = object_eval.to_mesh()
+        try:
+            from . import smd_export
+            with profileStage("calc_loop_triangles", object=obj.name):
+                mesh.calc_loop_triangles()
+            
+            # Apply object transform to the mesh vertices
+            with profileStage("transform", object=obj.name):
+                mesh.transform(obj.matrix_world)
+            
+            # pull everything out of the mesh in bulk
+            with profileStage("read_arrays", object=obj.name) as stage:
+                arrays = smd_export.read_mesh_arrays(mesh)
+                stage["triangles"] = arrays.triangle_count
+        finally:
+            # the arrays are copies, so the evaluated mesh can go before we start writing
+            object_eval.to_mesh_clear()
+    finally:
+        if source is not obj:
+            removeLodCopies([source])
+    
+    restoreMode(mode_snapshot)
+    return arrays
+
+# switches to object mode for reading meshes, returning the mode to go back to afterwards (None when already in object mode)
+def enterObjectMode():
+    if bpy.context.mode == 'OBJECT':
+        return None
+    mode_snapshot = bpy.context.active_object.mode
+    bpy.ops.object.mode_set(mode='OBJECT')
+    return mode_snapshot
+
+def restoreMode(mode_snapshot):
+    if mode_snapshot is not None:
+        bpy.ops.object.mode_set(mode=mode_snapshot)
+
+# temporary objects holding a copy of each object's evaluated mesh (modifiers applied) with a decimate modifier on top,
+# the user's objects and their modifier stacks are never touched. Only in the scene so the depsgraph evaluates them
+def makeLodCopies(objects, decimate_ratio):
+    depsgraph = bpy.context.evaluated_depsgraph_get()
+    copies = []
+    for obj in objects:
+        mesh = bpy.data.meshes.new_from_object(obj.evaluated_get(depsgraph), preserve_all_data_layers=True, depsgraph=depsgraph)
+        copy = bpy.data.objects.new("AutoMDL LOD", mesh)
+        copy.matrix_world = obj.matrix_world
+        copies.append(copy)
+    for copy in copies:
+        bpy.context.scene.collection.objects.link(copy)
+        modifier = copy.modifiers.new(name="AutoMDL LOD", type='DECIMATE')
+        modifier.decimate_type = 'COLLAPSE'
+        modifier.ratio = decimate_ratio
+        modifier.use_collapse_triangulate = True
+    return copies
+
+def removeLodCopies(copies):
+    for copy in copies:
+        mesh = copy.data
+        bpy.data.objects.remove(copy)
+        bpy.data.meshes.remove(mesh)
+    # evaluate without them again right away, so the update handlers (watch mode) see it while it's still part of the export
+    bpy.context.evaluated_depsgraph_get()
+
+# a collection standing in for the visual or collision mesh: every mesh object in it and its children, exported as if they were joined
+# has what the export needs of an object (name, material_slots, matrix_world), getObjectMeshArrays reads it as one mesh
+class CollectionMesh:
+    
+    def __init__(self, collection):
+        from mathutils import Matrix
+        self.collection = collection
+        self.name = collection.name
+        scene_objects = bpy.context.scene.objects
+        self.objects = [obj for obj in collection.all_objects if obj.type == 'MESH' and obj.name in scene_objects]
+        # kept as names, the handlers still need them once an object or collection is deleted
+        self.object_names = {obj.name for obj in self.objects}
+        # the collection and its children, linking or unlinking objects in any of them changes what's exported
+        self.collection_names = {collection.name} | {child.name for child in collection.children_recursive}
+        
+        self._material_slots = None
+        self._material_maps = None
+        
+        # the arrays are read in world space already
+        self.matrix_world = Matrix.Identity(4)
+    
+    @property
+    def material_slots(self):
+        """One list of material slots for all the objects, by name in the order they're first seen."""
+        if self._material_slots is None:
+            self.remap_materials()
+        return self._material_slots
+    
+    @property
+    def material_maps(self):
+        """Where each object's slots went in material_slots."""
+        if self._material_maps is None:
+            self.remap_materials()
+        return self._material_maps
+    
+    def remap_materials(self):
+        self._material_slots = []
+        self._material_maps = []
+        slot_indices = {}
+        for obj in self.objects:
+            material_map = []
+            for slot in obj.material_slots:
+                if slot.name not in slot_indices:
+                    slot_indices[slot.name] = len(self._material_slots)
+                    self._material_slots.append(slot)
+                material_map.append(slot_indices[slot.name])
+            self._material_maps.append(material_map)
+    
+    def forget_materials(self):
+        """Remap the material slots again the next time they're asked for."""
+        self._material_slots = None
+        self._material_maps = None
+    
+    def read_arrays(self, decimate_ratio=None):
+        """All the objects evaluated at once, read in their own space and then transformed and merged in bulk."""
+        import numpy as np
+        from . import smd_export
+        
+        mode_snapshot = enterObjectMode()
+        
+        # the lods are decimated from copies, the objects themselves are left alone
+        sources = self.objects
+        if decimate_ratio is not None:
+            with profileStage("copy_for_lod", object=self.name):
+                sources = makeLodCopies(self.objects, decimate_ratio)
+        
+        try:
+            with profileStage("depsgraph" if decimate_ratio is None else "decimate", object=self.name):
+                depsgraph = bpy.context.evaluated_depsgraph_get()
+            
+            parts = []
+            with profileStage("read_arrays", object=self.name) as stage:
+                for obj, source, material_map in zip(self.objects, sources, self.material_maps):
+                    object_eval = source.evaluated_get(depsgraph)
+                    mesh = object_eval.to_mesh()
+                    try:
+                        mesh.calc_loop_triangles()
+                        parts.append((smd_export.read_mesh_arrays(mesh), np.array(obj.matrix_world), material_map))
+                    finally:
+                        object_eval.to_mesh_clear()
+                stage["objects"] = len(parts)
+            
+            with profileStage("transform", object=self.name) as stage:
+                arrays = smd_export.merge_mesh_arrays(parts)
+                stage["triangles"] = arrays.triangle_count
+        finally:
+            if sources is not self.objects:
+                removeLodCopies(sources)
+        
+        restoreMode(mode_snapshot)
+        
+        return arrays
+
+# the visual and collision mesh of settings (the scene, or a batch job): a CollectionMesh when a collection is set, otherwise the object (or None)
+def getVisMesh(settings):
+    if settings.vis_collection is not None:
+        return CollectionMesh(settings.vis_collection)
+    return settings.vis_mesh
+
+def getPhyMesh(settings):
+    if settings.phy_collection is not None:
+        return CollectionMesh(settings.phy_collection)
+    return settings.phy_mesh
+
+def getMeshObjects(mesh):
+    return mesh.objects if isinstance(mesh, CollectionMesh) else [mesh]
+
+def isExportableMesh(mesh):
+    if isinstance(mesh, CollectionMesh):
+        return len(mesh.objects) > 0
+    return mesh is not None and mesh.type == 'MESH' and mesh.name in bpy.context.scene.objects
+
+# names of the objects whose changes matter to the scene's model
+def getTrackedObjectNames(scene):
+    return {obj.name for mesh in (getVisMesh(scene), getPhyMesh(scene)) if mesh is not None for obj in getMeshObjects(mesh)}
+
 def to_models_relative_path(file_path):
     MODELS_FOLDER_NAME = "models"
     
@@ -916,77 +2948,23 @@ def get_models_path(file_path):
     
     return None
 
-# lemon's answer in https://blender.stackexchange.com/questions/75332/how-to-find-the-number-of-loose-parts-with-blenders-python-api
-# i would implement it myself but i haven't done much graph stuff, and speed is really needed right now, and first implementation would be slow. This here is an efficient alogrithm to count the number of loose parts inside a mesh
-
-from collections import defaultdict
-
-def MakeVertPaths( verts, edges ):
-    #Initialize the path with all vertices indexes
-    result = {v.index: set() for v in verts}
-    #Add the possible paths via edges
-    for e in edges:
-        result[e.vertices[0]].add(e.vertices[1])
-        result[e.vertices[1]].add(e.vertices[0])
-    return result
-
-def FollowEdges( startingIndex, paths ):
-    current = [startingIndex]
-
-    follow = True
-    while follow:
-        #Get indexes that are still in the paths
-        eligible = set( [ind for ind in current if ind in paths] )
-        if len( eligible ) == 0:
-            follow = False #Stops if no more
-        else:
-            #Get the corresponding links
-            next = [paths[i] for i in eligible]
-            #Remove the previous from the paths
-            for key in eligible: paths.pop( key )
-            #Get the new links as new inputs
-            current = set( [ind for sub in next for ind in sub] )
-
-def CountIslands( obj ):
-    #Prepare the paths/links from each vertex to others
-    paths = MakeVertPaths( obj.data.vertices, obj.data.edges )
-    found = True
-    n = 0
-    while found:
-        try:
-            #Get one input as long there is one
-            startingIndex = next( iter( paths.keys() ) )
-            n = n + 1
-            #Deplete the paths dictionary following this starting index
-            FollowEdges( startingIndex, paths )               
-        except:
-            found = False
-    return n
-
-def CountIslands2(obj):
-    mesh = obj.data
-    paths={v.index:set() for v in mesh.vertices}
-    for e in mesh.edges:
-        paths[e.vertices[0]].add(e.vertices[1])
-        paths[e.vertices[1]].add(e.vertices[0])
-    lparts=[]
-    while True:
+# (vertex count, edges) of the evaluated mesh (or the objects of a collection, one after another), to count the islands of a slice at a time
+def getIslandEdges(obj):
+    import numpy as np
+    depsgraph = bpy.context.evaluated_depsgraph_get()
+    vertex_count = 0
+    edges = []
+    for member in getMeshObjects(obj):
+        object_eval = member.evaluated_get(depsgraph)
+        mesh = object_eval.to_mesh()
         try:
-            i=next(iter(paths.keys()))
-        except StopIteration:
-            break
-        lpart={i}
-        cur={i}
-        while True:
-            eligible={sc for sc in cur if sc in paths}
-            if not eligible:
-                break
-            cur={ve for sc in eligible for ve in paths[sc]}
-            lpart.update(cur)
-            for key in eligible: paths.pop(key)
-        lparts.append(lpart)
-    
-    return len(lparts)
+            member_edges = np.empty(len(mesh.edges) * 2, dtype=np.int32)
+            mesh.edges.foreach_get("vertices", member_edges)
+            edges.append(member_edges.reshape(-1, 2) + vertex_count)
+            vertex_count += len(mesh.vertices)
+        finally:
+            object_eval.to_mesh_clear()
+    return vertex_count, np.concatenate(edges)
 
 def is_float(value):
   if value is None:
@@ -0,0 +1,315 @@
+"""Compile every .blend under a folder from the command line.
+
+    blender -b --python batch_cli.py -- MODELS_FOLDER [--workers N] [--game NAME] [--studiomdl DIR] [--summary PATH]
+
+The process started like this only coordinates. It finds the .blend files and
+hands them out to a pool of background Blender workers (this same script run
+with --worker), which stay alive and open one file after the other, so
+Blender's startup is paid once per worker instead of once per file. Every
+file is compiled with the addon's own operators: wm.automdl_batch when the
+file has batch jobs, wm.automdl otherwise.
+
+When everything is done a JSON summary with the timings and failures of every
+file is written to --summary (or printed), and the exit code is 1 if any file
+failed.
+
+Workers talk to the coordinator in lines on stdin/stdout: the coordinator
+sends one JSON object per file, the worker answers with a line starting with
+RESULT_PREFIX. Everything else a worker prints (Blender's own output) is
+ignored.
+"""
+
+import argparse
+import json
+import os
+import queue
+import subprocess
+import sys
+import threading
+import time
+
+ADDON_DIR = os.path.dirname(os.path.abspath(__file__))
+ADDON_NAME = os.path.basename(ADDON_DIR)
+
+READY_LINE = "AUTOMDL_WORKER_READY"
+RESULT_PREFIX = "AUTOMDL_RESULT "
+
+
+def parse_args():
+    argv = sys.argv[sys.argv.index("--") + 1:] if "--" in sys.argv else sys.argv[1:]
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("folder", nargs="?", help="folder to look for .blend files in (usually a models folder)")
+    parser.add_argument("--workers", type=int, default=0, help="background Blender processes to compile with. 0 uses one per CPU core")
+    parser.add_argument("--game", help="game to compile for: its gameinfo folder, or part of its name. Defaults to what each file has selected")
+    parser.add_argument("--studiomdl", help="folder containing studiomdl.exe, for when Steam isn't found")
+    parser.add_argument("--summary", help="write the JSON summary here instead of printing it")
+    parser.add_argument("--blender", help="Blender executable for the workers. Defaults to the one running this script")
+    parser.add_argument("--worker", action="store_true", help=argparse.SUPPRESS)
+    return parser.parse_args(argv)
+
+
+def find_blend_files(folder):
+    """Every .blend below folder, in a stable order (.blend1 backups are skipped)."""
+    paths = []
+    for root, dirs, files in os.walk(os.path.abspath(folder)):
+        dirs.sort()
+        for name in sorted(files):
+            if name.lower().endswith(".blend"):
+                paths.append(os.path.join(root, name))
+    return paths
+
+
+# ---------------------------------------------------------------------------
+# coordinator
+
+class Worker:
+    """One background Blender running this script with --worker."""
+
+    def __init__(self, command):
+        self.command = command
+        self.process = None
+        self.current = None
+        self.ready = False
+        self.messages = queue.Queue()
+
+    def start(self):
+        self.ready = False
+        self.current = None
+        self.process = subprocess.Popen(
+            self.command,
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT,
+            text=True,
+            errors="replace",
+            bufsize=1
+        )
+        threading.Thread(target=self._read_output, args=(self.process,), daemon=True).start()
+        return self
+
+    def _read_output(self, process):
+        for line in process.stdout:
+            line = line.rstrip("\n")
+            if line == READY_LINE:
+                self.messages.put(("ready", None))
+            elif line.startswith(RESULT_PREFIX):
+                self.messages.put(("result", json.loads(line[len(RESULT_PREFIX):])))
+        self.messages.put(("exit", process.wait()))
+
+    def send(self, blend_path):
+        self.current = blend_path
+        self.process.stdin.write(json.dumps({"blend": blend_path}) + "\n")
+        self.process.stdin.flush()
+
+    def stop(self):
+        """Let the worker finish, it exits once its stdin is closed."""
+        if self.process is not None and self.process.poll() is None:
+            self.process.stdin.close()
+
+
+def get_blender_path(args):
+    if args.blender:
+        return args.blender
+    try:
+        import bpy
+        return bpy.app.binary_path
+    except ImportError:
+        sys.exit("ERROR: run this from Blender (blender -b --python batch_cli.py -- ...) or pass --blender")
+
+
+def worker_command(args):
+    command = [get_blender_path(args), "-b", "--factory-startup", "--python", os.path.abspath(__file__), "--", "--worker"]
+    if args.game:
+        command += ["--game", args.game]
+    if args.studiomdl:
+        command += ["--studiomdl", args.studiomdl]
+    return command
+
+
+def run_coordinator(args):
+    if not args.folder or not os.path.isdir(args.folder):
+        sys.exit("ERROR: give a folder to look for .blend files in")
+
+    start_time = time.perf_counter()
+    pending = find_blend_files(args.folder)
+    file_count = len(pending)
+    results = []
+    print(f"AutoMDL batch: {file_count} .blend files under {args.folder}")
+
+    worker_count = max(1, min(args.workers or os.cpu_count() or 1, len(pending)))
+    workers = [Worker(worker_command(args)).start() for _ in range(worker_count if pending else 0)]
+
+    # restarts are allowed once per file, a file that takes its worker down twice is given up on
+    crashed = set()
+
+    while workers:
+        for worker in list(workers):
+            try:
+                kind, value = worker.messages.get(timeout=0.05)
+            except queue.Empty:
+                continue
+
+            if kind == "result":
+                results.append(value)
+                print(f"[{len(results)}/{file_count}] {value['status']}: {value['blend']}")
+                worker.current = None
+                kind = "ready"
+
+            if kind == "ready":
+                worker.ready = True
+                if pending:
+                    worker.send(pending.pop(0))
+                else:
+                    worker.stop()
+
+            elif kind == "exit":
+                workers.remove(worker)
+
+                # the worker died on a file (crash, or Blender couldn't start at all)
+                if worker.current is not None:
+                    if not worker.ready:
+                        results.append({"blend": worker.current, "status": "failed", "error": f"worker didn't start (exit code {value})"})
+                    elif worker.current in crashed:
+                        results.append({"blend": worker.current, "status": "failed", "error": f"Blender exited with code {value} while compiling"})
+                    else:
+                        crashed.add(worker.current)
+                        pending.insert(0, worker.current)
+
+                # replace it, unless it never got going, then the next one wouldn't either
+                if pending and worker.ready:
+                    workers.append(worker.start())
+
+    for blend_path in pending:
+        results.append({"blend": blend_path, "status": "failed", "error": "no worker left to compile it"})
+
+    summary = {
+        "folder": os.path.abspath(args.folder),
+        "workers": worker_count,
+        "total_seconds": round(time.perf_counter() - start_time, 3),
+        "succeeded": sum(1 for result in results if result["status"] == "ok"),
+        "failed": sum(1 for result in results if result["status"] != "ok"),
+        "files": sorted(results, key=lambda result: result["blend"])
+    }
+
+    text = json.dumps(summary, indent=2)
+    if args.summary:
+        with open(args.summary, "w", encoding="utf-8") as file:
+            file.write(text + "\n")
+        print(f"AutoMDL batch: {summary['succeeded']} compiled, {summary['failed']} failed in {summary['total_seconds']:.1f}s, summary written to {args.summary}")
+    else:
+        print(text)
+
+    return 1 if summary["failed"] else 0
+
+
+# ---------------------------------------------------------------------------
+# worker (inside a background Blender)
+
+def enable_addon():
+    import addon_utils
+    sys.path.insert(0, os.path.dirname(ADDON_DIR))
+    automdl = addon_utils.enable(ADDON_NAME, default_set=True, handle_error=None)
+    if automdl is None:
+        raise RuntimeError(f"couldn't enable the {ADDON_NAME} addon")
+
+    # the game lookup normally finishes on a timer, which never fires while this script runs
+    if automdl.steam_discovery_thread is not None:
+        automdl.steam_discovery_thread.join()
+    automdl.finish_steam_discovery()
+    return automdl
+
+
+def choose_game(automdl, args, scene):
+    """Point the opened file's scene at the game to compile for. Returns an error or None."""
+    if automdl.game_select_method_is_dropdown:
+        games = [str(path) for path in automdl.games_paths_list]
+        if args.game:
+            matches = [path for path in games if path == args.game or args.game.lower() in os.path.basename(os.path.dirname(path)).lower()]
+            if not matches:
+                return f"no installed game matches \"{args.game}\""
+            scene.game_select = matches[0]
+        elif scene.game_select not in games:
+            automdl.select_default_game_path()
+        return None
+
+    if not args.studiomdl:
+        return "Steam wasn't found, pass --studiomdl with the folder containing studiomdl.exe"
+    scene.studiomdl_manual_input = args.studiomdl
+    if automdl.gameManualTextInputIsInvalid:
+        return f"no studiomdl.exe and gameinfo.txt found for \"{args.studiomdl}\""
+    return None
+
+
+def compile_blend(automdl, args, blend_path):
+    import bpy
+
+    result = {"blend": blend_path, "status": "failed"}
+    start = time.perf_counter()
+    try:
+        bpy.ops.wm.open_mainfile(filepath=blend_path)
+    except RuntimeError as e:
+        result["error"] = f"couldn't open: {e}"
+        return result
+    result["open_seconds"] = round(time.perf_counter() - start, 3)
+
+    scene = bpy.context.scene
+    error = choose_game(automdl, args, scene)
+    if error is not None:
+        result["error"] = error
+        return result
+
+    # both operators run to completion right away when there's no window
+    compile_start = time.perf_counter()
+    try:
+        if len(scene.batch_jobs) > 0:
+            outcome = bpy.ops.wm.automdl_batch()
+            result["jobs"] = [
+                {"model": job.model_path, "status": job.status, "export_seconds": round(job.export_time, 3), "compile_seconds": round(job.compile_time, 3)}
+                for job in scene.batch_jobs
+            ]
+            failed_jobs = [job for job in result["jobs"] if job["status"] != "Done"]
+            if failed_jobs:
+                outcome = {'CANCELLED'}
+                result["error"] = f"{len(failed_jobs)} of {len(result['jobs'])} batch jobs failed"
+        else:
+            outcome = bpy.ops.wm.automdl()
+    except RuntimeError as e:
+        # operators' error reports end up here
+        outcome = {'CANCELLED'}
+        result["error"] = str(e).strip()
+    result["compile_seconds"] = round(time.perf_counter() - compile_start, 3)
+
+    if 'FINISHED' in outcome:
+        result["status"] = "ok"
+    else:
+        result.setdefault("error", "compile failed")
+        result["log"] = automdl.compile_log_lines[-automdl.COMPILE_LOG_SHOWN_LINES:]
+
+    return result
+
+
+def run_worker(args):
+    automdl = enable_addon()
+    print(READY_LINE, flush=True)
+
+    for line in sys.stdin:
+        if not line.strip():
+            continue
+        request = json.loads(line)
+        try:
+            result = compile_blend(automdl, args, request["blend"])
+        except Exception as e:
+            result = {"blend": request["blend"], "status": "failed", "error": f"{type(e).__name__}: {e}"}
+        print(RESULT_PREFIX + json.dumps(result), flush=True)
+
+    return 0
+
+
+def main():
+    args = parse_args()
+    code = run_worker(args) if args.worker else run_coordinator(args)
+    sys.exit(code)
+
+
+if __name__ == "__main__":
+    main()
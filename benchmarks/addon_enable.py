@@ -0,0 +1,69 @@
+"""Measure how long enabling the addon takes.
+
+Run from background Blender:
+
+    blender -b --factory-startup --python benchmarks/addon_enable.py -- [--repeat N] [--max-ms MS]
+
+Every run imports the addon from scratch (its modules are dropped from
+sys.modules first) and calls register(), so import time is included. The
+Steam game lookup runs on a background thread and isn't part of the enable
+time, how long it takes to finish is reported separately. With --max-ms the
+script exits with an error when the best enable time is over the limit, so it
+can guard against startup regressions.
+"""
+
+import argparse
+import importlib
+import os
+import sys
+import time
+
+ADDON_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+ADDON_NAME = os.path.basename(ADDON_DIR)
+sys.path.insert(0, os.path.dirname(ADDON_DIR))
+
+
+def parse_args():
+    argv = sys.argv[sys.argv.index("--") + 1:] if "--" in sys.argv else []
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=5, help="enable/disable cycles, the best one is reported")
+    parser.add_argument("--max-ms", type=float, help="fail when enabling takes longer than this")
+    return parser.parse_args(argv)
+
+
+def forget_addon():
+    for name in list(sys.modules):
+        if name == ADDON_NAME or name.startswith(ADDON_NAME + "."):
+            del sys.modules[name]
+
+
+def enable_once():
+    forget_addon()
+    start = time.perf_counter()
+    automdl = importlib.import_module(ADDON_NAME)
+    automdl.register()
+    enable_time = time.perf_counter() - start
+
+    # the discovery timer can't fire while this script runs, so wait on the thread itself
+    thread = automdl.steam_discovery_thread
+    if thread is not None:
+        thread.join()
+    discovery_time = time.perf_counter() - start
+
+    automdl.unregister()
+    return enable_time, discovery_time
+
+
+def main():
+    args = parse_args()
+    runs = [enable_once() for _ in range(args.repeat)]
+    enable_time = min(run[0] for run in runs)
+    discovery_time = min(run[1] for run in runs)
+
+    print(f"enable: {enable_time * 1000:.1f}ms (best of {args.repeat}), games found after {discovery_time * 1000:.1f}ms")
+    if args.max_ms is not None and enable_time * 1000 > args.max_ms:
+        print(f"ERROR: enabling took longer than {args.max_ms:.1f}ms")
+        sys.exit(1)
+
+
+main()
@@ -0,0 +1,54 @@
+"""Stand-in for studiomdl, so the whole compile pipeline can be benchmarked without the Source SDK.
+
+Takes studiomdl's command line (-game FOLDER ... QC), reads the QC and every
+mesh file it references (so parsing has a realistic cost), and writes the
+files studiomdl would into FOLDER/models: .mdl, .vvd, the .vtx files, and a
+.phy when the QC has a $collisionmodel. The files contain no real model
+data, only their size is in proportion to the meshes.
+
+FAKE_STUDIOMDL_DELAY (seconds) adds a fixed compile time on top, and
+FAKE_STUDIOMDL_FAIL=1 makes it exit with an error.
+"""
+
+import os
+import re
+import sys
+import time
+
+COMPILED_EXTENSIONS = [".dx80.vtx", ".dx90.vtx", ".mdl", ".sw.vtx", ".vvd"]
+
+
+def main(argv):
+    game = argv[argv.index("-game") + 1]
+    qc_path = argv[-1]
+    print(f"qdir:    \"{os.path.dirname(qc_path)}\"")
+    print(f"gamedir: \"{game}\"")
+
+    with open(qc_path, "r", encoding="utf-8", errors="replace") as file:
+        qc_text = file.read()
+
+    model_name = re.search(r'\$modelname\s+"([^"]+)"', qc_text).group(1)
+    mesh_bytes = 0
+    for name in re.findall(r'"([^"]+\.(?:smd|dmx))"', qc_text, re.IGNORECASE):
+        with open(os.path.join(os.path.dirname(qc_path), name), "rb") as file:
+            mesh_bytes += len(file.read())
+        print(f"Processing {name}")
+
+    time.sleep(float(os.environ.get("FAKE_STUDIOMDL_DELAY", "0")))
+    if os.environ.get("FAKE_STUDIOMDL_FAIL") == "1":
+        print("ERROR: fake studiomdl asked to fail")
+        return 1
+
+    extensions = COMPILED_EXTENSIONS + ([".phy"] if "$collisionmodel" in qc_text else [])
+    output_base = os.path.join(game, "models", os.path.splitext(model_name)[0])
+    os.makedirs(os.path.dirname(output_base), exist_ok=True)
+    for extension in extensions:
+        with open(output_base + extension, "wb") as file:
+            file.write(b"\0" * max(64, mesh_bytes // 20))
+
+    print(f"Completed \"{os.path.basename(qc_path)}\"")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
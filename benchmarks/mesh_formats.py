@@ -0,0 +1,107 @@
+"""Compare the SMD and DMX mesh backends on a real mesh.
+
+Run from background Blender:
+
+    blender -b prop.blend --python benchmarks/mesh_formats.py -- [--object NAME] [--studiomdl PATH --game PATH] [--repeat N]
+
+For each format this reports the file size, the export time, and (when a
+studiomdl is given) how long studiomdl takes to compile a minimal QC that
+references the file.
+"""
+
+import argparse
+import importlib
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+import bpy
+
+ADDON_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.dirname(ADDON_DIR))
+automdl = importlib.import_module(os.path.basename(ADDON_DIR))
+# the addon only imports its exporters when they're first used
+smd_export = importlib.import_module(automdl.__name__ + ".smd_export")
+dmx_export = importlib.import_module(automdl.__name__ + ".dmx_export")
+
+FORMATS = ["smd", "dmx"]
+
+
+def parse_args():
+    argv = sys.argv[sys.argv.index("--") + 1:] if "--" in sys.argv else []
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--object", help="object to export (defaults to the scene's visual mesh, then the active object)")
+    parser.add_argument("--studiomdl", help="studiomdl.exe to time parsing with")
+    parser.add_argument("--game", help="game folder (the one containing gameinfo.txt) to pass to studiomdl")
+    parser.add_argument("--repeat", type=int, default=3, help="runs per measurement, the best one is reported")
+    return parser.parse_args(argv)
+
+
+def pick_object(name):
+    if name:
+        return bpy.data.objects[name]
+    scene = bpy.context.scene
+    if getattr(scene, "vis_mesh", None) is not None:
+        return scene.vis_mesh
+    return bpy.context.active_object
+
+
+def export(obj, path, mesh_ext):
+    arrays = automdl.getObjectMeshArrays(obj)
+    material_names = [slot.name for slot in obj.material_slots] or ["None"]
+    if mesh_ext == "dmx":
+        dmx_export.write_dmx(path + ".dmx", arrays, material_names, True, os.path.basename(path))
+    else:
+        smd_export.write_smd(path + ".smd", arrays, material_names, True)
+    return arrays.triangle_count
+
+
+def time_studiomdl(args, folder, mesh_name, mesh_ext):
+    qc_path = os.path.join(folder, f"bench_{mesh_ext}.qc")
+    with open(qc_path, "w") as file:
+        file.write(f"$modelname \"automdl_bench/bench_{mesh_ext}.mdl\"\n")
+        file.write(f"$body \"Body\" \"{mesh_name}.{mesh_ext}\"\n")
+        file.write(f"$sequence \"idle\" \"{mesh_name}.{mesh_ext}\"\n")
+
+    start = time.perf_counter()
+    subprocess.run([args.studiomdl, "-game", args.game, "-nop4", "-quiet", "-nowarnings", qc_path], stdout=subprocess.DEVNULL)
+    return time.perf_counter() - start
+
+
+def main():
+    args = parse_args()
+    obj = pick_object(args.object)
+    if obj is None or obj.type != 'MESH':
+        print("ERROR: no mesh object to benchmark")
+        return
+
+    print(f"Benchmarking \"{obj.name}\"")
+    with tempfile.TemporaryDirectory() as folder:
+        rows = []
+        for mesh_ext in FORMATS:
+            mesh_name = f"bench_{mesh_ext}_ref"
+            path = os.path.join(folder, mesh_name)
+
+            export_times = []
+            for _ in range(args.repeat):
+                start = time.perf_counter()
+                triangles = export(obj, path, mesh_ext)
+                export_times.append(time.perf_counter() - start)
+
+            size = os.path.getsize(f"{path}.{mesh_ext}")
+
+            parse_time = None
+            if args.studiomdl and args.game:
+                parse_time = min(time_studiomdl(args, folder, mesh_name, mesh_ext) for _ in range(args.repeat))
+
+            rows.append((mesh_ext, triangles, size, min(export_times), parse_time))
+
+    print(f"{'format':<8}{'triangles':>12}{'size (KB)':>14}{'export (s)':>14}{'studiomdl (s)':>16}")
+    for mesh_ext, triangles, size, export_time, parse_time in rows:
+        parse_text = f"{parse_time:.3f}" if parse_time is not None else "-"
+        print(f"{mesh_ext:<8}{triangles:>12}{size / 1024:>14.1f}{export_time:>14.3f}{parse_text:>16}")
+
+
+main()
@@ -0,0 +1,346 @@
+"""Benchmark suite for mesh reading, export, island counting, hulls and the whole compile.
+
+Run from background Blender:
+
+    blender -b --factory-startup --python benchmarks/suite.py -- [--sizes 1k,10k,100k,1M,5M] [--variants ...] [--repeat N] [--output results.json] [--baseline old.json --threshold 1.2]
+
+Synthetic meshes are generated for every size (in triangles) and variant:
+
+    smooth             one connected grid, smooth shaded, no UVs, no materials
+    flat_uv_materials  one connected grid, flat shaded, UVs, 4 materials
+    loose_parts        separate cubes (12 triangles each), flat shaded, UVs, 2 materials
+
+and each stage is timed (best of --repeat), then run once more under
+tracemalloc for its peak Python/NumPy memory. The "pipeline" stage runs the
+real wm.automdl operator against benchmarks/fake_studiomdl.py in a throwaway
+game folder, so the whole export, QC and compile path is measured without
+the Source SDK. The addon's export and model caches are turned off unless
+--cached is given.
+
+Results go to --output as JSON. With --baseline, every stage that got slower
+than threshold times its baseline time (and by more than --noise seconds) is
+listed and the script exits with 1.
+"""
+
+import argparse
+import importlib
+import json
+import os
+import platform
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import bpy
+import numpy as np
+
+ADDON_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+ADDON_NAME = os.path.basename(ADDON_DIR)
+FAKE_STUDIOMDL = os.path.join(ADDON_DIR, "benchmarks", "fake_studiomdl.py")
+
+VARIANTS = {
+    "smooth": dict(layout="grid", smooth=True, uvs=False, materials=0),
+    "flat_uv_materials": dict(layout="grid", smooth=False, uvs=True, materials=4),
+    "loose_parts": dict(layout="parts", smooth=False, uvs=True, materials=2),
+}
+
+STAGES = ["read", "export_smd", "export_dmx", "count_islands", "convex_hulls", "pipeline"]
+
+
+def parse_size(text):
+    text = text.strip().lower()
+    scale = {"k": 1000, "m": 1000000}.get(text[-1], 1)
+    return int(float(text.rstrip("km")) * scale)
+
+
+def parse_args():
+    argv = sys.argv[sys.argv.index("--") + 1:] if "--" in sys.argv else []
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", default="1k,10k,100k,1M,5M", help="triangle counts to generate, comma separated (k and M suffixes work)")
+    parser.add_argument("--variants", default=",".join(VARIANTS), help="mesh variants to generate, comma separated")
+    parser.add_argument("--stages", default=",".join(STAGES), help="stages to run, comma separated")
+    parser.add_argument("--repeat", type=int, default=3, help="runs per stage, the best one is reported")
+    parser.add_argument("--hull-max-triangles", type=int, default=200000, help="skip convex hulls (and use no collision mesh in the pipeline) above this many triangles")
+    parser.add_argument("--cached", action="store_true", help="leave the export and compiled model caches on")
+    parser.add_argument("--output", help="write the results here as JSON")
+    parser.add_argument("--baseline", help="earlier results to compare against")
+    parser.add_argument("--threshold", type=float, default=1.2, help="a stage regressed when it takes more than this times its baseline time")
+    parser.add_argument("--noise", type=float, default=0.005, help="differences below this many seconds never count as a regression")
+    return parser.parse_args(argv)
+
+
+def enable_addon():
+    import addon_utils
+    sys.path.insert(0, os.path.dirname(ADDON_DIR))
+    automdl = addon_utils.enable(ADDON_NAME, default_set=True, handle_error=None)
+    if automdl is None:
+        sys.exit(f"ERROR: couldn't enable the {ADDON_NAME} addon")
+    if automdl.steam_discovery_thread is not None:
+        automdl.steam_discovery_thread.join()
+    return automdl
+
+
+# ---------------------------------------------------------------------------
+# synthetic meshes
+
+def grid_geometry(triangles):
+    """Quads of a square grid with about triangles / 2 quads."""
+    side = max(1, int(round((triangles / 2) ** 0.5)))
+    coords = np.linspace(-1.0, 1.0, side + 1, dtype=np.float32)
+    x, y = np.meshgrid(coords, coords)
+    z = 0.1 * np.sin(x * 7.0) * np.cos(y * 5.0)
+    positions = np.stack([x, y, z], axis=-1).reshape(-1, 3)
+
+    corner = (np.arange(side)[:, None] * (side + 1) + np.arange(side)[None, :]).ravel()
+    quads = np.stack([corner, corner + 1, corner + side + 2, corner + side + 1], axis=1)
+    return positions, quads
+
+
+def parts_geometry(triangles):
+    """Separate cubes, 12 triangles each, laid out on a lattice."""
+    count = max(1, triangles // 12)
+    side = int(np.ceil(count ** (1 / 3)))
+    index = np.arange(count)
+    centers = np.stack([index % side, (index // side) % side, index // (side * side)], axis=1).astype(np.float32) * 2.0
+
+    cube_positions = np.array([[x, y, z] for z in (-0.5, 0.5) for y in (-0.5, 0.5) for x in (-0.5, 0.5)], dtype=np.float32)
+    cube_quads = np.array([[0, 2, 3, 1], [4, 5, 7, 6], [0, 1, 5, 4], [2, 6, 7, 3], [0, 4, 6, 2], [1, 3, 7, 5]])
+
+    positions = (centers[:, None, :] + cube_positions[None, :, :]).reshape(-1, 3)
+    quads = (cube_quads[None, :, :] + (index * 8)[:, None, None]).reshape(-1, 4)
+    return positions, quads
+
+
+def make_mesh_object(name, triangles, layout, smooth, uvs, materials):
+    positions, quads = grid_geometry(triangles) if layout == "grid" else parts_geometry(triangles)
+
+    mesh = bpy.data.meshes.new(name)
+    mesh.vertices.add(len(positions))
+    mesh.vertices.foreach_set("co", positions.astype(np.float32).ravel())
+    mesh.loops.add(quads.size)
+    mesh.loops.foreach_set("vertex_index", quads.astype(np.int32).ravel())
+    mesh.polygons.add(len(quads))
+    mesh.polygons.foreach_set("loop_start", np.arange(0, quads.size, 4, dtype=np.int32))
+    mesh.polygons.foreach_set("use_smooth", np.full(len(quads), smooth, dtype=bool))
+
+    if uvs:
+        uv_layer = mesh.uv_layers.new(name="UVMap")
+        loop_positions = positions[quads.ravel()]
+        uv_layer.data.foreach_set("uv", (loop_positions[:, :2] * 0.5 + 0.5).astype(np.float32).ravel())
+
+    if materials:
+        for i in range(materials):
+            mesh.materials.append(bpy.data.materials.get(f"bench_{i}") or bpy.data.materials.new(f"bench_{i}"))
+        mesh.polygons.foreach_set("material_index", (np.arange(len(quads)) % materials).astype(np.int32))
+
+    mesh.update(calc_edges=True)
+
+    obj = bpy.data.objects.new(name, mesh)
+    bpy.context.scene.collection.objects.link(obj)
+    return obj
+
+
+def remove_mesh_object(obj):
+    mesh = obj.data
+    bpy.data.objects.remove(obj)
+    bpy.data.meshes.remove(mesh)
+
+
+# ---------------------------------------------------------------------------
+# the fake game studiomdl compiles for
+
+def make_fake_game(root, automdl):
+    """Game folder with a gameinfo.txt and the fake studiomdl in its bin folder. Returns the gameinfo folder."""
+    gameinfo_folder = os.path.join(root, "game", "mod")
+    bin_folder = os.path.join(root, "game", "bin")
+    os.makedirs(gameinfo_folder)
+    os.makedirs(bin_folder)
+    with open(os.path.join(gameinfo_folder, "gameinfo.txt"), "w") as file:
+        file.write("\"GameInfo\" { game \"AutoMDL benchmark\" }\n")
+
+    if os.name == 'nt':
+        # studiomdl.exe can't be a script here, so point the addon at a .cmd next to it instead
+        wrapper = os.path.join(bin_folder, "studiomdl.cmd")
+        with open(wrapper, "w") as file:
+            file.write(f"@\"{sys.executable}\" \"{FAKE_STUDIOMDL}\" %*\n")
+
+        def set_fake_game_path(self, context, new_game_path_value):
+            automdl.game_path = new_game_path_value
+            automdl.studiomdl_path = wrapper
+        automdl.setGamePath = set_fake_game_path
+    else:
+        wrapper = os.path.join(bin_folder, "studiomdl.exe")
+        with open(wrapper, "w") as file:
+            file.write(f"#!/bin/sh\nexec \"{sys.executable}\" \"{FAKE_STUDIOMDL}\" \"$@\"\n")
+        os.chmod(wrapper, 0o755)
+
+    # as if the studiomdl folder had been typed into the panel
+    automdl.game_select_method_is_dropdown = False
+    automdl.gameManualTextGameinfoPath = gameinfo_folder
+    return gameinfo_folder
+
+
+# ---------------------------------------------------------------------------
+# stages
+
+def stage_functions(automdl, obj, folder, args, triangles):
+    smd_export = importlib.import_module(automdl.__name__ + ".smd_export")
+    dmx_export = importlib.import_module(automdl.__name__ + ".dmx_export")
+    convex_hulls = importlib.import_module(automdl.__name__ + ".convex_hulls")
+    islands = importlib.import_module(automdl.__name__ + ".islands")
+
+    material_names = [slot.name for slot in obj.material_slots] or ["None"]
+    arrays = automdl.getObjectMeshArrays(obj)
+    scene = bpy.context.scene
+
+    def pipeline():
+        scene.vis_mesh = obj
+        scene.phy_mesh = obj if triangles <= args.hull_max_triangles else None
+        result = bpy.ops.wm.automdl()
+        if 'FINISHED' not in result:
+            raise RuntimeError("wm.automdl didn't finish")
+
+    stages = {
+        "read": lambda: automdl.getObjectMeshArrays(obj),
+        "export_smd": lambda: smd_export.write_smd(os.path.join(folder, "bench.smd"), arrays, material_names, True),
+        "export_dmx": lambda: dmx_export.write_dmx(os.path.join(folder, "bench.dmx"), arrays, material_names, True, "bench"),
+        "count_islands": lambda: count_islands(islands, automdl.getIslandEdges(obj), automdl.EXPORT_SLICE_EDGES),
+        "convex_hulls": lambda: convex_hulls.build_hull_arrays(arrays, 32),
+        "pipeline": pipeline,
+    }
+    if triangles > args.hull_max_triangles:
+        del stages["convex_hulls"]
+    return stages
+
+
+def count_islands(islands, island_edges, chunk_size):
+    """Islands of the edges, counted the way a compile does (chunk_size edges at a time)."""
+    steps = islands.iter_count_components(*island_edges, chunk_size)
+    while True:
+        try:
+            next(steps)
+        except StopIteration as finished:
+            return finished.value
+
+
+def measure(function, repeat):
+    """(best time, peak traced memory in MB) of running function."""
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        times.append(time.perf_counter() - start)
+
+    tracemalloc.start()
+    try:
+        function()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return min(times), peak / (1024 * 1024)
+
+
+def peak_rss_mb():
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on linux, bytes on macos
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def compare(results, baseline_path, threshold, noise):
+    with open(baseline_path, "r", encoding="utf-8") as file:
+        baseline = {(r["case"], r["stage"]): r for r in json.load(file)["results"] if "seconds" in r}
+
+    regressions = []
+    for result in results:
+        old = baseline.get((result["case"], result["stage"]))
+        if old is None or "seconds" not in result:
+            continue
+        result["baseline_seconds"] = old["seconds"]
+        if result["seconds"] > old["seconds"] * threshold and result["seconds"] - old["seconds"] > noise:
+            regressions.append(result)
+    return regressions
+
+
+def main():
+    args = parse_args()
+    sizes = [parse_size(size) for size in args.sizes.split(",")]
+    variants = args.variants.split(",")
+    wanted_stages = args.stages.split(",")
+
+    automdl = enable_addon()
+    prefs = bpy.context.preferences.addons[ADDON_NAME].preferences
+    prefs.use_export_cache = args.cached
+    prefs.use_model_cache = args.cached
+
+    root = tempfile.mkdtemp(prefix="automdl_bench_")
+    results = []
+    try:
+        make_fake_game(root, automdl)
+
+        # the operator needs the blend saved inside a models folder
+        blend_folder = os.path.join(root, "models", "bench")
+        os.makedirs(blend_folder)
+        bpy.ops.wm.save_as_mainfile(filepath=os.path.join(blend_folder, "bench.blend"))
+
+        for size in sizes:
+            for variant in variants:
+                case = f"{variant}_{size}"
+                obj = make_mesh_object(case, size, **VARIANTS[variant])
+                triangles = len(obj.data.polygons) * 2  # every generated face is a quad
+                print(f"{case}: {triangles} triangles")
+
+                stages = stage_functions(automdl, obj, root, args, triangles)
+                for stage in STAGES:
+                    if stage not in wanted_stages or stage not in stages:
+                        continue
+                    result = {"case": case, "variant": variant, "triangles": triangles, "stage": stage}
+                    try:
+                        seconds, peak_mb = measure(stages[stage], args.repeat)
+                        result["seconds"] = round(seconds, 5)
+                        result["peak_mb"] = round(peak_mb, 2)
+                        result["triangles_per_second"] = round(triangles / seconds) if seconds > 0 else None
+                        print(f"  {stage:<16}{seconds:>10.4f}s{peak_mb:>10.1f}MB")
+                    except Exception as e:
+                        result["error"] = f"{type(e).__name__}: {e}"
+                        print(f"  {stage:<16}failed: {result['error']}")
+                    results.append(result)
+
+                remove_mesh_object(obj)
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+
+    output = {
+        "blender": bpy.app.version_string,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "repeat": args.repeat,
+        "cached": args.cached,
+        "threshold": args.threshold,
+        "peak_rss_mb": peak_rss_mb(),
+        "results": results,
+    }
+
+    regressions = []
+    if args.baseline:
+        regressions = compare(results, args.baseline, args.threshold, args.noise)
+        output["regressions"] = [f"{r['case']}/{r['stage']}" for r in regressions]
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as file:
+            json.dump(output, file, indent=2)
+        print(f"Results written to {args.output}")
+
+    for r in regressions:
+        print(f"REGRESSION {r['case']}/{r['stage']}: {r['seconds']:.4f}s, was {r['baseline_seconds']:.4f}s")
+    if regressions or any("error" in r for r in results):
+        sys.exit(1)
+
+
+main()
@@ -0,0 +1,148 @@
+"""Running studiomdl in the background.
+
+A CompileJob starts studiomdl and collects its output on a reader thread, so
+whoever owns the job (a modal operator, a timer) only ever polls it and never
+blocks waiting on the process.
+"""
+
+import os
+import subprocess
+import threading
+import time
+
+
+class CompileJob:
+    """One studiomdl process, its output so far and its outcome."""
+
+    def __init__(self, args, cwd=None, env=None):
+        self.args = args
+        self.cwd = cwd
+        self.env = env
+        self.process = None
+        self.lines = []
+        self.cancelled = False
+        self.start_time = None
+        self.end_time = None
+        self._unread = 0
+        self._lock = threading.Lock()
+        self._reader = None
+
+    def start(self):
+        creationflags = subprocess.CREATE_NO_WINDOW if os.name == 'nt' else 0
+        self.start_time = time.perf_counter()
+        self.process = subprocess.Popen(
+            self.args,
+            cwd=self.cwd,
+            env=self.env,
+            stdin=subprocess.DEVNULL,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT,
+            text=True,
+            errors="replace",
+            bufsize=1,
+            creationflags=creationflags
+        )
+        self._reader = threading.Thread(target=self._read_output, daemon=True)
+        self._reader.start()
+        return self
+
+    def _read_output(self):
+        for line in self.process.stdout:
+            line = line.rstrip()
+            if line:
+                with self._lock:
+                    self.lines.append(line)
+        self.process.stdout.close()
+
+    def new_lines(self):
+        """Output lines that arrived since the last call."""
+        with self._lock:
+            lines = self.lines[self._unread:]
+            self._unread = len(self.lines)
+        return lines
+
+    def poll(self):
+        """True once the process has exited and all of its output has been read."""
+        if self.process is None or self.process.poll() is None:
+            return False
+        self._reader.join(timeout=0)
+        if self._reader.is_alive():
+            return False
+        if self.end_time is None:
+            self.end_time = time.perf_counter()
+        return True
+
+    def wait(self):
+        self.process.wait()
+        self._reader.join()
+        return self.poll()
+
+    def cancel(self):
+        if self.process is None:
+            # never started, and won't be
+            self.cancelled = True
+        elif self.process.poll() is None:
+            self.cancelled = True
+            self.process.kill()
+
+    @property
+    def succeeded(self):
+        return self.poll() and not self.cancelled and self.process.returncode == 0
+
+    @property
+    def elapsed(self):
+        if self.start_time is None:
+            return 0.0
+        return (self.end_time or time.perf_counter()) - self.start_time
+
+
+class CompilePool:
+    """Runs up to max_workers CompileJobs at once.
+
+    Jobs are started as soon as they are submitted and a worker is free, the
+    rest wait in submission order. Nothing here blocks, the owner calls
+    collect() regularly to start queued jobs and pick up finished ones,
+    including the queued jobs a cancel() dropped.
+    """
+
+    def __init__(self, max_workers):
+        self.max_workers = max(1, max_workers)
+        self.queued = []
+        self.running = {}
+        self.dropped = []
+        self.cancelled = False
+
+    def submit(self, key, job):
+        self.queued.append((key, job))
+        self._start_queued()
+
+    def _start_queued(self):
+        while self.queued and len(self.running) < self.max_workers:
+            key, job = self.queued.pop(0)
+            self.running[key] = job.start()
+
+    def has_free_worker(self):
+        return not self.cancelled and len(self.running) + len(self.queued) < self.max_workers
+
+    def collect(self):
+        """(key, job) of every job that finished since the last call."""
+        finished = [(key, job) for key, job in self.running.items() if job.poll()]
+        for key, _ in finished:
+            del self.running[key]
+        self._start_queued()
+        finished += self.dropped
+        self.dropped = []
+        return finished
+
+    def is_idle(self):
+        return not self.running and not self.queued and not self.dropped
+
+    def cancel(self):
+        self.cancelled = True
+        # handed back by the next collect(), so whoever submitted them can clean up after them
+        for key, job in self.queued:
+            job.cancel()
+            self.dropped.append((key, job))
+        self.queued.clear()
+        for job in self.running.values():
+            job.cancel()
@@ -0,0 +1,96 @@
+"""Where the time (and memory) of a compile goes.
+
+A CompileProfile collects one entry per stage of a compile: wall time, peak
+Python memory while it ran (tracemalloc, which NumPy reports its arrays to),
+and whatever counts the stage adds (triangles, bytes written). It can be
+summed up per stage for the panel and appended to a JSON-lines log.
+"""
+
+import json
+import os
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+# the log is started over (the old one kept as .1) once it gets this big
+LOG_MAX_BYTES = 8 * 1024 * 1024
+
+
+class CompileProfile:
+
+    def __init__(self, model, track_memory=True):
+        self.model = model
+        self.track_memory = track_memory
+        self.stages = []
+        self.status = None
+        self.started = time.time()
+        self.start_time = time.perf_counter()
+        self.end_time = None
+
+    @contextmanager
+    def stage(self, name, **info):
+        """Time the body as a stage. Yields the stage's entry, so counts found along the way can be added to it."""
+        entry = dict(info, stage=name)
+        started_tracing = self.track_memory and not tracemalloc.is_tracing()
+        if started_tracing:
+            tracemalloc.start()
+        if self.track_memory:
+            baseline = tracemalloc.get_traced_memory()[0]
+            tracemalloc.reset_peak()
+
+        start = time.perf_counter()
+        try:
+            yield entry
+        finally:
+            entry["seconds"] = time.perf_counter() - start
+            if self.track_memory:
+                entry["peak_bytes"] = max(0, tracemalloc.get_traced_memory()[1] - baseline)
+                if started_tracing:
+                    tracemalloc.stop()
+            self.stages.append(entry)
+
+    def add(self, name, seconds, **info):
+        """A stage timed by someone else (e.g. studiomdl, which runs in its own process)."""
+        self.stages.append(dict(info, stage=name, seconds=seconds))
+
+    def finish(self, status):
+        self.status = status
+        self.end_time = time.perf_counter()
+
+    @property
+    def total_seconds(self):
+        return (self.end_time or time.perf_counter()) - self.start_time
+
+    def totals(self):
+        """(stage, seconds) summed over repeats of a stage, slowest first."""
+        totals = {}
+        for entry in self.stages:
+            totals[entry["stage"]] = totals.get(entry["stage"], 0.0) + entry["seconds"]
+        return sorted(totals.items(), key=lambda item: item[1], reverse=True)
+
+    def sum(self, key):
+        return sum(entry.get(key, 0) for entry in self.stages)
+
+    def peak_bytes(self):
+        return max((entry.get("peak_bytes", 0) for entry in self.stages), default=0)
+
+    def to_dict(self):
+        return {
+            "time": time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(self.started)),
+            "model": self.model,
+            "status": self.status,
+            "total_seconds": round(self.total_seconds, 4),
+            "triangles": self.sum("triangles"),
+            "bytes_written": self.sum("bytes"),
+            "peak_python_bytes": self.peak_bytes() if self.track_memory else None,
+            "stages": [
+                {key: round(value, 4) if isinstance(value, float) else value for key, value in entry.items()}
+                for entry in self.stages
+            ],
+        }
+
+    def append_to_log(self, log_path):
+        if os.path.isfile(log_path) and os.path.getsize(log_path) > LOG_MAX_BYTES:
+            os.replace(log_path, log_path + ".1")
+        with open(log_path, "a", encoding="utf-8") as file:
+            file.write(json.dumps(self.to_dict()) + "\n")
@@ -0,0 +1,288 @@
+"""Convex hull collision preprocessing.
+
+Splits a collision mesh into its islands and replaces every island with its
+convex hull (quickhull), optionally cut down to a vertex budget, so studiomdl
+gets clean convex pieces instead of whatever was modelled.
+"""
+
+import numpy as np
+
+from . import islands
+from . import smd_export
+
+# edges and vertices gone through per step while finding the islands
+ISLAND_CHUNK_SIZE = 1 << 16
+
+
+def initial_tetrahedron(points):
+    """Indices of four extreme points spanning a volume, or None when the points are flat."""
+    if len(points) < 4:
+        return None
+
+    extent = points.max(axis=0) - points.min(axis=0)
+    eps = max(float(extent.max()), 1e-12) * 1e-9
+
+    axis = int(np.argmax(extent))
+    i0 = int(np.argmin(points[:, axis]))
+    i1 = int(np.argmax(points[:, axis]))
+
+    line = points[i1] - points[i0]
+    line_distances = np.linalg.norm(np.cross(points - points[i0], line), axis=1)
+    i2 = int(np.argmax(line_distances))
+    if line_distances[i2] <= eps * max(np.linalg.norm(line), eps):
+        return None
+
+    plane_normal = np.cross(points[i1] - points[i0], points[i2] - points[i0])
+    plane_normal /= np.linalg.norm(plane_normal)
+    plane_distances = (points - points[i0]) @ plane_normal
+    i3 = int(np.argmax(np.abs(plane_distances)))
+    if abs(plane_distances[i3]) <= eps:
+        return None
+
+    return i0, i1, i2, i3
+
+
+def quickhull(points):
+    """Convex hull of a set of 3D points.
+
+    Returns an (n, 3) array of triangles indexing into points, wound so their
+    normals point outwards, or None when the points don't span a volume.
+    """
+    points = np.asarray(points, dtype=np.float64)
+    simplex = initial_tetrahedron(points)
+    if simplex is None:
+        return None
+
+    i0, i1, i2, i3 = simplex
+    extent = points.max(axis=0) - points.min(axis=0)
+    eps = max(float(extent.max()), 1e-12) * 1e-9
+    plane_normal = np.cross(points[i1] - points[i0], points[i2] - points[i0])
+
+    faces = []        # [a, b, c] per face
+    normals = []      # outward unit normal per face
+    offsets = []      # plane offset per face, distance = points @ normal - offset
+    outside = []      # indices of points in front of the face
+    alive = []
+    edge_faces = {}   # directed edge (a, b) -> face whose winding contains it
+
+    def add_face(a, b, c):
+        # np.cross and np.linalg.norm cost far more than the arithmetic for a single face
+        ux, uy, uz = (points[b] - points[a]).tolist()
+        vx, vy, vz = (points[c] - points[a]).tolist()
+        normal = np.array((uy * vz - uz * vy, uz * vx - ux * vz, ux * vy - uy * vx))
+        length = float(np.sqrt(normal @ normal))
+        normal = normal / length if length > 0 else normal
+        face = len(faces)
+        faces.append((a, b, c))
+        normals.append(normal)
+        offsets.append(float(points[a] @ normal))
+        outside.append(None)
+        alive.append(True)
+        edge_faces[(a, b)] = face
+        edge_faces[(b, c)] = face
+        edge_faces[(c, a)] = face
+        return face
+
+    def assign(candidates, new_faces):
+        """Hand each candidate point to the new face it is furthest in front of."""
+        if len(candidates) == 0:
+            return
+        face_normals = np.array([normals[f] for f in new_faces])
+        face_offsets = np.array([offsets[f] for f in new_faces])
+        distances = points[candidates] @ face_normals.T - face_offsets
+        best = np.argmax(distances, axis=1)
+        in_front = distances[np.arange(len(candidates)), best] > eps
+        for k, face in enumerate(new_faces):
+            owned = candidates[in_front & (best == k)]
+            outside[face] = owned if len(owned) else None
+
+    # orient the tetrahedron's faces away from its fourth corner
+    tetrahedron = [(i0, i1, i2), (i0, i3, i1), (i1, i3, i2), (i2, i3, i0)]
+    if (points[i3] - points[i0]) @ plane_normal > 0:
+        tetrahedron = [(a, c, b) for a, b, c in tetrahedron]
+    new_faces = [add_face(*face) for face in tetrahedron]
+
+    remaining = np.setdiff1d(np.arange(len(points)), [i0, i1, i2, i3])
+    assign(remaining, new_faces)
+
+    pending = [f for f in new_faces if outside[f] is not None]
+    while pending:
+        face = pending.pop()
+        if not alive[face] or outside[face] is None:
+            continue
+
+        candidates = outside[face]
+        eye = int(candidates[np.argmax(points[candidates] @ normals[face] - offsets[face])])
+
+        # every face the eye point can see, found by walking across neighbours
+        visible = {face}
+        stack = [face]
+        while stack:
+            current = stack.pop()
+            a, b, c = faces[current]
+            for edge in ((b, a), (c, b), (a, c)):
+                neighbour = edge_faces.get(edge)
+                if neighbour is None or neighbour in visible or not alive[neighbour]:
+                    continue
+                if points[eye] @ normals[neighbour] - offsets[neighbour] > eps:
+                    visible.add(neighbour)
+                    stack.append(neighbour)
+
+        # the horizon is every edge of a visible face whose neighbour isn't visible
+        horizon = []
+        for current in visible:
+            a, b, c = faces[current]
+            for edge in ((a, b), (b, c), (c, a)):
+                if edge_faces.get((edge[1], edge[0])) not in visible:
+                    horizon.append(edge)
+
+        orphans = []
+        for current in visible:
+            if outside[current] is not None:
+                orphans.append(outside[current])
+            alive[current] = False
+            a, b, c = faces[current]
+            for edge in ((a, b), (b, c), (c, a)):
+                if edge_faces.get(edge) == current:
+                    del edge_faces[edge]
+
+        new_faces = [add_face(a, b, eye) for a, b in horizon]
+
+        orphans = np.concatenate(orphans)
+        assign(orphans[orphans != eye], new_faces)
+        pending.extend(f for f in new_faces if outside[f] is not None)
+
+    return np.array([faces[f] for f in range(len(faces)) if alive[f]], dtype=np.int32)
+
+
+def fibonacci_directions(count):
+    """count unit vectors spread evenly over the sphere."""
+    i = np.arange(count) + 0.5
+    z = 1.0 - 2.0 * i / count
+    radius = np.sqrt(1.0 - z * z)
+    angle = np.pi * (1.0 + 5.0 ** 0.5) * i
+    return np.stack([radius * np.cos(angle), radius * np.sin(angle), z], axis=1)
+
+
+def island_hull(points, max_vertices):
+    """Hull triangles of one island's points, with at most max_vertices vertices (0 for no limit).
+
+    A budget under 4 is taken as 4, the fewest a hull with volume can have.
+    Returns (hull points, triangles into them) or None for islands without volume.
+    """
+    triangles = quickhull(points)
+    if triangles is None:
+        return None
+
+    used = np.unique(triangles)
+    if max_vertices and len(used) > max(max_vertices, 4):
+        max_vertices = max(max_vertices, 4)
+        # keep the furthest hull vertex in max_vertices evenly spread directions, and hull those
+        hull_points = points[used]
+        support = np.unique(np.argmax(hull_points @ fibonacci_directions(max_vertices).T, axis=0))
+        reduced = quickhull(hull_points[support])
+        if reduced is None:
+            # the support points of a thin island can all lie in one plane, start over from
+            # a tetrahedron of the hull and fill the rest of the budget with them
+            simplex = np.array(initial_tetrahedron(hull_points))
+            support = np.concatenate([simplex, np.setdiff1d(support, simplex)])[:max_vertices]
+            reduced = quickhull(hull_points[support])
+        points = hull_points[support]
+        triangles = reduced
+        used = np.unique(triangles)
+
+    remap = np.full(len(points), -1, dtype=np.int32)
+    remap[used] = np.arange(len(used), dtype=np.int32)
+    return points[used], remap[triangles]
+
+
+def build_hull_arrays(arrays, max_vertices):
+    """Replace every island of a collision mesh with its convex hull.
+
+    arrays is the collision mesh as read by smd_export.read_mesh_arrays.
+    Islands that are flat or too small to have a hull are kept as they are.
+    Returns (MeshArrays of all pieces, vertex count of each piece).
+    """
+    steps = iter_build_hull_arrays(arrays, max_vertices)
+    while True:
+        try:
+            next(steps)
+        except StopIteration as finished:
+            return finished.value
+
+
+def iter_build_hull_arrays(arrays, max_vertices, chunk_size=ISLAND_CHUNK_SIZE):
+    """build_hull_arrays a chunk of edges or a single island at a time.
+
+    A generator yielding the number of triangles whose islands are done so
+    far, whose return value is what build_hull_arrays returns.
+    """
+    tri_verts = arrays.tri_verts
+    edges = np.concatenate([tri_verts[:, [0, 1]], tri_verts[:, [1, 2]]])
+    labelling = islands.iter_label_components(len(arrays.positions), edges, chunk_size)
+    while True:
+        try:
+            next(labelling)
+        except StopIteration as finished:
+            vertex_islands, count = finished.value
+            break
+        yield 0
+    triangle_islands = vertex_islands[tri_verts[:, 0]] if len(tri_verts) else np.zeros(0, dtype=np.int32)
+    island_triangle_indices = islands.MeshIslands(vertex_islands, triangle_islands, count).island_faces()
+    # mesh vertex -> index into the island's vertices, only the island's own entries are set at a time
+    remap = np.full(len(arrays.positions), -1, dtype=np.int32)
+
+    piece_positions = []
+    piece_triangles = []
+    piece_vertex_counts = []
+    vertex_offset = 0
+    triangles_done = 0
+
+    for triangle_indices in island_triangle_indices:
+        if len(triangle_indices) == 0:
+            continue
+        island_triangles = tri_verts[triangle_indices]
+
+        used = np.unique(island_triangles)
+        hull = island_hull(arrays.positions[used].astype(np.float64), max_vertices)
+        if hull is not None:
+            positions, triangles = hull
+        else:
+            remap[used] = np.arange(len(used), dtype=np.int32)
+            positions, triangles = arrays.positions[used], remap[island_triangles]
+            remap[used] = -1
+
+        piece_positions.append(positions.astype(np.float32))
+        piece_triangles.append(triangles + vertex_offset)
+        piece_vertex_counts.append(len(positions))
+        vertex_offset += len(positions)
+        triangles_done += len(triangle_indices)
+        yield triangles_done
+
+    if piece_positions:
+        positions = np.concatenate(piece_positions)
+        triangles = np.concatenate(piece_triangles).astype(np.int32)
+    else:
+        positions = np.zeros((0, 3), dtype=np.float32)
+        triangles = np.zeros((0, 3), dtype=np.int32)
+
+    # smooth normals: area weighted sum of the face normals around each vertex
+    corners = positions[triangles]
+    face_normals = np.cross(corners[:, 1] - corners[:, 0], corners[:, 2] - corners[:, 0])
+    normals = np.zeros_like(positions)
+    for corner in range(3):
+        np.add.at(normals, triangles[:, corner], face_normals)
+    lengths = np.linalg.norm(normals, axis=1)
+    normals[lengths > 0] /= lengths[lengths > 0, None]
+
+    tri_count = len(triangles)
+    hull_arrays = smd_export.MeshArrays(
+        positions,
+        normals.astype(np.float32),
+        np.zeros((tri_count * 3, 2), dtype=np.float32),
+        triangles,
+        np.arange(tri_count * 3, dtype=np.int32).reshape(-1, 3),
+        np.zeros(tri_count, dtype=np.int32),
+        np.ones(tri_count, dtype=bool)
+    )
+    return hull_arrays, piece_vertex_counts
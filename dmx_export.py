@@ -0,0 +1,388 @@
+"""Binary DMX model export.
+
+Writes the same mesh data as smd_export, but as an indexed binary DMX: every
+unique corner (position, normal, uv) is stored once and faces point at corner
+indices, so studiomdl has far less to parse than with the text SMD.
+"""
+
+import struct
+import uuid
+
+import numpy as np
+
+from . import smd_export
+
+# studiomdl from the 2013 SDK era reads binary encoding 2 and model format 18
+DMX_ENCODING = "binary"
+DMX_ENCODING_VERSION = 2
+DMX_FORMAT = "model"
+DMX_FORMAT_VERSION = 18
+
+# attribute type ids of binary encodings before version 9, arrays are offset by ATTR_ARRAY
+ATTR_ELEMENT = 1
+ATTR_INT = 2
+ATTR_FLOAT = 3
+ATTR_BOOL = 4
+ATTR_STRING = 5
+ATTR_VECTOR2 = 9
+ATTR_VECTOR3 = 10
+ATTR_QUATERNION = 13
+ATTR_ARRAY = 14
+
+# element ids are derived from the element's position in the file, so the same mesh always writes the same bytes
+DMX_ID_NAMESPACE = uuid.UUID("7b0d7b52-3f51-4b43-9bb1-3f0ef5a6d0c1")
+
+
+class DmxElement:
+    """A datamodel element: a type, a name and an ordered list of typed attributes."""
+
+    def __init__(self, type, name):
+        self.type = type
+        self.name = name
+        self.attributes = []
+
+    def add(self, name, attr_type, value):
+        self.attributes.append((name, attr_type, value))
+        return value
+
+
+class DmxWriter:
+    """Collects elements and serializes them in the binary datamodel encoding."""
+
+    def __init__(self):
+        self.elements = []
+
+    def add_element(self, type, name):
+        element = DmxElement(type, name)
+        self.elements.append(element)
+        return element
+
+    def write(self, path):
+        for _ in self.iter_write(path):
+            pass
+
+    def iter_write(self, path, chunk_size=smd_export.FORMAT_BLOCK_SIZE):
+        """Write the file, yielding after every element and every chunk_size items of the large arrays."""
+        indices = {id(element): i for i, element in enumerate(self.elements)}
+
+        strings = []
+        string_indices = {}
+        for element in self.elements:
+            for name in [element.type] + [attr[0] for attr in element.attributes]:
+                if name not in string_indices:
+                    string_indices[name] = len(strings)
+                    strings.append(name)
+
+        with open(path, "wb", buffering=smd_export.SMD_WRITE_BUFFER_SIZE) as file:
+            header = f"<!-- dmx encoding {DMX_ENCODING} {DMX_ENCODING_VERSION} format {DMX_FORMAT} {DMX_FORMAT_VERSION} -->\n"
+            file.write(encode_string(header))
+
+            # string dictionary (element types and attribute names)
+            file.write(struct.pack("<h", len(strings)))
+            for string in strings:
+                file.write(encode_string(string))
+
+            # element headers
+            file.write(struct.pack("<i", len(self.elements)))
+            for i, element in enumerate(self.elements):
+                file.write(struct.pack("<h", string_indices[element.type]))
+                file.write(encode_string(element.name))
+                file.write(uuid.uuid5(DMX_ID_NAMESPACE, str(i)).bytes_le)
+
+            # element bodies
+            for element in self.elements:
+                file.write(struct.pack("<i", len(element.attributes)))
+                for name, attr_type, value in element.attributes:
+                    file.write(struct.pack("<hb", string_indices[name], attr_type))
+                    if isinstance(value, np.ndarray):
+                        # the mesh data, packed a chunk at a time like encode_attribute would all at once
+                        dtype = "<i4" if attr_type == ATTR_ARRAY + ATTR_INT else "<f4"
+                        file.write(struct.pack("<i", len(value)))
+                        for start in range(0, len(value), chunk_size):
+                            file.write(np.ascontiguousarray(value[start:start + chunk_size], dtype=dtype).tobytes())
+                            yield
+                    else:
+                        file.write(encode_attribute(attr_type, value, indices))
+                yield
+
+
+def encode_string(value):
+    return value.encode("utf-8") + b"\0"
+
+
+def encode_attribute(attr_type, value, element_indices):
+    if attr_type == ATTR_ELEMENT:
+        return struct.pack("<i", -1 if value is None else element_indices[id(value)])
+    if attr_type == ATTR_INT:
+        return struct.pack("<i", value)
+    if attr_type == ATTR_FLOAT:
+        return struct.pack("<f", value)
+    if attr_type == ATTR_BOOL:
+        return struct.pack("<?", value)
+    if attr_type == ATTR_STRING:
+        return encode_string(value)
+    if attr_type in (ATTR_VECTOR2, ATTR_VECTOR3, ATTR_QUATERNION):
+        return struct.pack(f"<{len(value)}f", *value)
+
+    # arrays: element count, then the packed items
+    item_type = attr_type - ATTR_ARRAY
+    if item_type == ATTR_ELEMENT:
+        return struct.pack(f"<i{len(value)}i", len(value), *[element_indices[id(element)] for element in value])
+    if item_type == ATTR_STRING:
+        return struct.pack("<i", len(value)) + b"".join(encode_string(string) for string in value)
+    if item_type == ATTR_INT:
+        return struct.pack("<i", len(value)) + np.ascontiguousarray(value, dtype="<i4").tobytes()
+    if item_type in (ATTR_FLOAT, ATTR_VECTOR2, ATTR_VECTOR3):
+        return struct.pack("<i", len(value)) + np.ascontiguousarray(value, dtype="<f4").tobytes()
+
+    raise ValueError(f"Unsupported DMX attribute type {attr_type}")
+
+
+def row_view(values):
+    """values (a contiguous 2D array) with every row as a single opaque item, for comparing whole rows."""
+    return values.view(np.dtype((np.void, values.dtype.itemsize * values.shape[1]))).ravel()
+
+
+def iter_unique_rows(values, chunk_size):
+    """Deduplicate the rows of a 2D array of 4 byte items, keeping first-occurrence order.
+
+    A generator yielding the fraction of the work done after every chunk of
+    about chunk_size rows, whose return value is (unique rows, index of each
+    input row into the unique rows). Rows are spread over buckets by a hash
+    of their bytes, so equal rows always share a bucket and every bucket is
+    deduplicated on its own, a chunk at a time.
+    """
+    values = np.ascontiguousarray(values)
+    count = len(values)
+    if count == 0:
+        return values, np.zeros(0, dtype=np.int32)
+
+    words = values.view(np.uint32)
+    bucket_count = -(-count // chunk_size)
+    chunks = range(0, count, chunk_size)
+    # the passes over every row, and about one more for going through the buckets
+    total_steps = 5 * len(chunks) + bucket_count
+    steps = 0
+
+    # FNV-1a over the row's words, the high half of which picks the bucket
+    buckets = np.empty(count, dtype=np.int64)
+    sizes = np.zeros(bucket_count, dtype=np.int64)
+    for start in chunks:
+        hashes = np.full(len(words[start:start + chunk_size]), 0xcbf29ce484222325, dtype=np.uint64)
+        for column in range(words.shape[1]):
+            hashes = (hashes ^ words[start:start + chunk_size, column]) * np.uint64(0x100000001b3)
+        buckets[start:start + chunk_size] = (hashes >> np.uint64(32)) % np.uint64(bucket_count)
+        sizes += np.bincount(buckets[start:start + chunk_size], minlength=bucket_count)
+        steps += 1
+        yield steps / total_steps
+
+    # rows grouped by bucket, in row order within each
+    bounds = np.concatenate([[0], np.cumsum(sizes)])
+    fill = bounds[:-1].copy()
+    order = np.empty(count, dtype=np.int64)
+    for start in chunks:
+        chunk_buckets = buckets[start:start + chunk_size]
+        chunk_order = np.argsort(chunk_buckets, kind="stable")
+        chunk_sizes = np.bincount(chunk_buckets, minlength=bucket_count)
+        sorted_buckets = chunk_buckets[chunk_order]
+        offsets = np.arange(len(chunk_order)) - (np.cumsum(chunk_sizes) - chunk_sizes)[sorted_buckets]
+        order[fill[sorted_buckets] + offsets] = start + chunk_order
+        fill += chunk_sizes
+        steps += 1
+        yield steps / total_steps
+
+    # every row's first occurrence, a bucket a chunk at a time. The rows found so far come first in every
+    # np.unique, so a row seen before keeps its earlier occurrence
+    first_of = np.empty(count, dtype=np.int64)
+    is_first = np.zeros(count, dtype=bool)
+    for bucket in range(bucket_count):
+        found = np.zeros(0, dtype=np.int64)
+        for start in range(bounds[bucket], bounds[bucket + 1], chunk_size):
+            rows = order[start:min(start + chunk_size, bounds[bucket + 1])]
+            candidates = np.concatenate([found, rows])
+            _, first, inverse = np.unique(row_view(values[candidates]), return_index=True, return_inverse=True)
+            found = candidates[first]
+            first_of[rows] = found[inverse.ravel()[len(candidates) - len(rows):]]
+            steps += 1
+            yield min(steps / total_steps, 1.0)
+        is_first[found] = True
+
+    # the unique rows are numbered in the order they first appear
+    rank = np.empty(count, dtype=np.int64)
+    unique_count = 0
+    for start in chunks:
+        chunk_firsts = is_first[start:start + chunk_size]
+        rank[start:start + chunk_size] = unique_count + np.cumsum(chunk_firsts) - 1
+        unique_count += int(np.count_nonzero(chunk_firsts))
+        steps += 1
+        yield min(steps / total_steps, 1.0)
+
+    unique = np.empty((unique_count,) + values.shape[1:], dtype=values.dtype)
+    inverse = np.empty(count, dtype=np.int32)
+    for start in chunks:
+        inverse[start:start + chunk_size] = rank[first_of[start:start + chunk_size]]
+        firsts = start + np.flatnonzero(is_first[start:start + chunk_size])
+        unique[rank[firsts]] = values[firsts]
+        steps += 1
+        yield min(steps / total_steps, 1.0)
+
+    return unique, inverse
+
+
+def iter_build_indexed_mesh(arrays, use_flat_shading, block_size):
+    """Turn loop triangles into shared vertex data and per-triangle corner indices.
+
+    A generator yielding the fraction of the work done after every block of
+    about block_size triangles, whose return value is (positions, normals,
+    uvs, position_indices, normal_indices, uv_indices, triangle_corners),
+    where the *_indices arrays are per unique corner and triangle_corners is
+    (tris, 3).
+    """
+    triangle_count = arrays.triangle_count
+    corner_block_size = block_size * 3
+    # gathering the corners, then deduplicating normals, uvs and corners, each about as much work
+    phases = 4
+
+    corners = np.empty((triangle_count * 3, smd_export.CORNER_FLOATS), dtype=np.float32)
+    for start in range(0, triangle_count, block_size):
+        stop = min(start + block_size, triangle_count)
+        corners[start * 3:stop * 3] = smd_export.gather_corners(arrays, start, stop, use_flat_shading).reshape(-1, smd_export.CORNER_FLOATS)
+        yield stop / triangle_count / phases
+
+    normals, normal_indices = yield from scale_fractions(iter_unique_rows(corners[:, 3:6], corner_block_size), 1, phases)
+    uvs, uv_indices = yield from scale_fractions(iter_unique_rows(corners[:, 6:8], corner_block_size), 2, phases)
+    del corners
+    position_indices = arrays.tri_verts.reshape(-1).astype(np.int32)
+
+    corner_keys = np.stack([position_indices, normal_indices, uv_indices], axis=1)
+    unique_corners, triangle_corners = yield from scale_fractions(iter_unique_rows(corner_keys, corner_block_size), 3, phases)
+
+    return (
+        arrays.positions,
+        normals,
+        uvs,
+        unique_corners[:, 0],
+        unique_corners[:, 1],
+        unique_corners[:, 2],
+        triangle_corners.reshape(-1, 3)
+    )
+
+
+def scale_fractions(steps, phase, phases):
+    """Pass on the fractions steps yields as part phase of phases, returning its return value."""
+    while True:
+        try:
+            fraction = next(steps)
+        except StopIteration as finished:
+            return finished.value
+        yield (phase + fraction) / phases
+
+
+def make_transform(dmx, name):
+    transform = dmx.add_element("DmeTransform", name)
+    transform.add("position", ATTR_VECTOR3, (0.0, 0.0, 0.0))
+    transform.add("orientation", ATTR_QUATERNION, (0.0, 0.0, 0.0, 1.0))
+    return transform
+
+
+def write_dmx(path, arrays, material_names, use_flat_shading, model_name):
+    """Write the mesh as a binary DMX model.
+
+    material_names follows the same rules as smd_export.iter_triangle_blocks.
+    """
+    for _ in iter_write_dmx(path, arrays, material_names, use_flat_shading, model_name):
+        pass
+
+
+def iter_write_dmx(path, arrays, material_names, use_flat_shading, model_name, block_size=smd_export.FORMAT_BLOCK_SIZE):
+    """write_dmx as a generator doing about block_size triangles of work per step.
+
+    Yields how many triangles' worth of the work is done so far. Closing it
+    early closes the file, leaving it partly written.
+    """
+    triangle_count = arrays.triangle_count
+    building = iter_build_indexed_mesh(arrays, use_flat_shading, block_size)
+    while True:
+        try:
+            fraction = next(building)
+        except StopIteration as finished:
+            positions, normals, uvs, position_indices, normal_indices, uv_indices, triangle_corners = finished.value
+            break
+        # the rest (face sets, writing) is quick next to this
+        yield int(fraction * triangle_count)
+
+    dmx = DmxWriter()
+    root = dmx.add_element("DmElement", "root")
+    model = dmx.add_element("DmeModel", model_name)
+    dag = dmx.add_element("DmeDag", model_name)
+    mesh = dmx.add_element("DmeMesh", model_name)
+    vertex_data = dmx.add_element("DmeVertexData", "bind")
+
+    root.add("skeleton", ATTR_ELEMENT, model)
+    root.add("model", ATTR_ELEMENT, model)
+
+    base_transforms = dmx.add_element("DmeTransformList", "base")
+    base_transforms.add("transforms", ATTR_ARRAY + ATTR_ELEMENT, [make_transform(dmx, model_name)])
+
+    model.add("transform", ATTR_ELEMENT, make_transform(dmx, model_name))
+    model.add("shape", ATTR_ELEMENT, None)
+    model.add("visible", ATTR_BOOL, True)
+    model.add("children", ATTR_ARRAY + ATTR_ELEMENT, [dag])
+    model.add("jointList", ATTR_ARRAY + ATTR_ELEMENT, [dag])
+    model.add("baseStates", ATTR_ARRAY + ATTR_ELEMENT, [base_transforms])
+
+    dag.add("transform", ATTR_ELEMENT, make_transform(dmx, model_name))
+    dag.add("shape", ATTR_ELEMENT, mesh)
+    dag.add("visible", ATTR_BOOL, True)
+    dag.add("children", ATTR_ARRAY + ATTR_ELEMENT, [])
+
+    vertex_data.add("vertexFormat", ATTR_ARRAY + ATTR_STRING, ["positions", "normals", "textureCoordinates"])
+    vertex_data.add("jointCount", ATTR_INT, 0)
+    vertex_data.add("flipVCoordinates", ATTR_BOOL, True)
+    vertex_data.add("positions", ATTR_ARRAY + ATTR_VECTOR3, positions)
+    vertex_data.add("positionsIndices", ATTR_ARRAY + ATTR_INT, position_indices)
+    vertex_data.add("normals", ATTR_ARRAY + ATTR_VECTOR3, normals)
+    vertex_data.add("normalsIndices", ATTR_ARRAY + ATTR_INT, normal_indices)
+    vertex_data.add("textureCoordinates", ATTR_ARRAY + ATTR_VECTOR2, uvs)
+    vertex_data.add("textureCoordinatesIndices", ATTR_ARRAY + ATTR_INT, uv_indices)
+
+    # one face set per material, faces are corner indices terminated by -1
+    if len(material_names) == 1:
+        material_indices = np.zeros(arrays.triangle_count, dtype=np.int32)
+    else:
+        material_indices = np.clip(arrays.material_indices, 0, len(material_names) - 1)
+
+    # every material's triangles, gathered a block at a time
+    material_triangles = [[] for _ in material_names]
+    for start in range(0, triangle_count, block_size):
+        block_materials = material_indices[start:start + block_size]
+        for material_index, triangles in enumerate(material_triangles):
+            triangles.append(triangle_corners[start:start + block_size][block_materials == material_index])
+        yield triangle_count
+
+    face_sets = []
+    for material_name, triangles in zip(material_names, material_triangles):
+        triangles = np.concatenate(triangles) if triangles else np.zeros((0, 3), dtype=np.int32)
+        if len(triangles) == 0:
+            continue
+
+        faces = np.full((len(triangles), 4), -1, dtype=np.int32)
+        faces[:, 0:3] = triangles
+
+        material = dmx.add_element("DmeMaterial", material_name)
+        material.add("mtlName", ATTR_STRING, material_name)
+
+        face_set = dmx.add_element("DmeFaceSet", material_name)
+        face_set.add("material", ATTR_ELEMENT, material)
+        face_set.add("faces", ATTR_ARRAY + ATTR_INT, faces.ravel())
+        face_sets.append(face_set)
+
+    mesh.add("visible", ATTR_BOOL, True)
+    mesh.add("bindState", ATTR_ELEMENT, vertex_data)
+    mesh.add("currentState", ATTR_ELEMENT, vertex_data)
+    mesh.add("baseStates", ATTR_ARRAY + ATTR_ELEMENT, [vertex_data])
+    mesh.add("deltaStates", ATTR_ARRAY + ATTR_ELEMENT, [])
+    mesh.add("faceSets", ATTR_ARRAY + ATTR_ELEMENT, face_sets)
+
+    for _ in dmx.iter_write(path, block_size * 3):
+        yield triangle_count
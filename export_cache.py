@@ -0,0 +1,102 @@
+"""Persistent cache of exported mesh files.
+
+Exports are keyed on a fingerprint of everything that ends up in the file
+(evaluated mesh data, world matrix, material names, format and exporter
+version). When the fingerprint matches a previous export, the file is reused
+instead of being exported again.
+"""
+
+import hashlib
+import os
+
+from . import workspace
+
+# bump whenever the bytes written for the same mesh change, so stale cache entries are never reused
+EXPORTER_VERSION = 1
+
+
+def fingerprint(arrays, matrix_world, material_names, mesh_ext, use_flat_shading, model_name):
+    """Hash of the evaluated mesh and every export setting that affects the file."""
+    digest = hashlib.blake2b(digest_size=20)
+    digest.update(f"automdl {EXPORTER_VERSION} {mesh_ext} {use_flat_shading} {model_name}\n".encode("utf-8"))
+    digest.update(("\n".join(material_names) + "\n").encode("utf-8"))
+    digest.update(" ".join(repr(value) for row in matrix_world for value in row).encode("utf-8"))
+
+    for array in (arrays.positions, arrays.normals, arrays.uvs, arrays.tri_verts, arrays.tri_loops, arrays.material_indices, arrays.smooth):
+        digest.update(str(array.shape).encode("utf-8"))
+        digest.update(array.tobytes())
+
+    return digest.hexdigest()
+
+
+class ExportCache:
+    """Folder of exported files named after their fingerprint, evicted least recently used first.
+
+    Recency is the file's mtime, which is bumped on every hit, so it survives restarts.
+    """
+
+    def __init__(self, folder, max_bytes):
+        self.folder = folder
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(folder, exist_ok=True)
+
+    def entry_path(self, key, mesh_ext):
+        return os.path.join(self.folder, f"{key}.{mesh_ext}")
+
+    def fetch(self, key, dest_path):
+        """Put the cached export for key at dest_path. Returns False on a miss."""
+        mesh_ext = os.path.splitext(dest_path)[1][1:]
+        entry = self.entry_path(key, mesh_ext)
+
+        if not os.path.isfile(entry):
+            self.misses += 1
+            return False
+
+        os.utime(entry)
+        self.hits += 1
+
+        # exports are never written to again once done, so the entry and the job's file can share their data
+        workspace.link_file(entry, dest_path)
+        return True
+
+    def store(self, key, src_path):
+        mesh_ext = os.path.splitext(src_path)[1][1:]
+        workspace.link_file(src_path, self.entry_path(key, mesh_ext))
+        self.evict()
+
+    def entries(self):
+        """(path, size, mtime) of every cached file."""
+        result = []
+        for entry in os.scandir(self.folder):
+            if entry.is_file():
+                stat = entry.stat()
+                result.append((entry.path, stat.st_size, stat.st_mtime))
+        return result
+
+    def size(self):
+        return sum(size for _, size, _ in self.entries())
+
+    def evict(self):
+        entries = self.entries()
+        total = sum(size for _, size, _ in entries)
+
+        # oldest first
+        entries.sort(key=lambda entry: entry[2])
+        for path, size, _ in entries:
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+                total -= size
+            except OSError as e:
+                print(f"Error evicting {path}: {e}")
+
+    def clear(self):
+        for path, _, _ in self.entries():
+            os.remove(path)
+
+    def hit_rate(self):
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
@@ -0,0 +1,142 @@
+"""Finding Source games in a Steam library, with the results kept on disk.
+
+Scanning steamapps/common touches every installed game (bin/studiomdl.exe,
+then every subfolder for a gameinfo.txt), which is slow on big libraries and
+network drives. The results are stored in a JSON file together with the
+mtimes of the folders they were read from, and at startup only folders whose
+mtime changed are scanned again.
+"""
+
+import json
+import os
+import re
+from pathlib import Path
+
+# bump when the layout of the cache file changes, older files are then ignored
+CACHE_VERSION = 1
+
+
+# "path"		"D:\\SteamLibrary" lines of steamapps/libraryfolders.vdf
+LIBRARY_PATH_LINE = re.compile(r'^\s*"path"\s+"(.*)"\s*$', re.MULTILINE)
+
+
+def steam_library_folders(steam_path):
+    """Every Steam library: steam_path itself, then the ones listed in its libraryfolders.vdf."""
+    libraries = [os.path.normpath(steam_path)]
+    try:
+        with open(os.path.join(steam_path, "steamapps", "libraryfolders.vdf"), "r", encoding="utf-8", errors="replace") as file:
+            text = file.read()
+    except OSError:
+        return libraries
+
+    for path in LIBRARY_PATH_LINE.findall(text):
+        path = os.path.normpath(path.replace("\\\\", "\\"))
+        if path not in libraries and os.path.isdir(path):
+            libraries.append(path)
+    return libraries
+
+
+def find_gameinfo_folder(game_folder):
+    """First subfolder of game_folder that has a gameinfo.txt, or None.
+
+    In a lot of games several folders have one, the first is used. todo: is this an issue?
+    """
+    for subdir in Path(game_folder).iterdir():
+        if subdir.is_dir() and os.path.exists(os.path.join(subdir, "gameinfo.txt")):
+            return str(subdir)
+    return None
+
+
+def scan_game_folder(game_folder):
+    """gameinfo folder of a game that ships studiomdl.exe in its bin folder, None for anything else."""
+    if not os.path.exists(os.path.join(game_folder, "bin", "studiomdl.exe")):
+        return None
+    return find_gameinfo_folder(game_folder)
+
+
+def folder_mtime(path):
+    try:
+        return os.stat(path).st_mtime_ns
+    except OSError:
+        return None
+
+
+def game_folder_stamp(game_folder):
+    """mtimes that change when a game gets or loses studiomdl.exe or a gameinfo folder."""
+    return [folder_mtime(game_folder), folder_mtime(os.path.join(game_folder, "bin"))]
+
+
+class GameDiscoveryCache:
+    """Discovered games per library, saved as JSON at cache_path.
+
+    The file holds, for every library folder (steamapps/common), the folder's
+    mtime and for every game folder in it its stamp and gameinfo folder.
+    """
+
+    def __init__(self, cache_path):
+        self.cache_path = cache_path
+        self.libraries = {}
+        self.scanned = 0
+        self.reused = 0
+        self.load()
+
+    def load(self):
+        try:
+            with open(self.cache_path, "r", encoding="utf-8") as file:
+                data = json.load(file)
+        except (OSError, ValueError):
+            return
+        if isinstance(data, dict) and data.get("version") == CACHE_VERSION:
+            self.libraries = data.get("libraries", {})
+
+    def save(self):
+        os.makedirs(os.path.dirname(self.cache_path), exist_ok=True)
+        temp_path = self.cache_path + ".tmp"
+        with open(temp_path, "w", encoding="utf-8") as file:
+            json.dump({"version": CACHE_VERSION, "libraries": self.libraries}, file, indent=1)
+        os.replace(temp_path, self.cache_path)
+
+    def games(self, library, force=False):
+        """gameinfo folders of every game in library with a studiomdl.exe.
+
+        Game folders whose stamp matches the cache aren't looked into. When the
+        library folder's own mtime is unchanged nothing was added or removed, so
+        only the known game folders are checked. force rescans everything.
+        """
+        library = str(library)
+        if not os.path.isdir(library):
+            return []
+
+        self.scanned = 0
+        self.reused = 0
+        cached = {} if force else self.libraries.get(library, {})
+        cached_games = cached.get("games", {})
+        library_mtime = folder_mtime(library)
+
+        if cached and cached.get("mtime") == library_mtime:
+            names = list(cached_games)
+        else:
+            names = sorted(entry.name for entry in os.scandir(library) if entry.is_dir())
+
+        games = {}
+        for name in names:
+            game_folder = os.path.join(library, name)
+            stamp = game_folder_stamp(game_folder)
+            entry = cached_games.get(name)
+            if entry is not None and entry["stamp"] == stamp:
+                self.reused += 1
+            else:
+                self.scanned += 1
+                entry = {"stamp": stamp, "gameinfo": scan_game_folder(game_folder) if stamp[0] is not None else None}
+            if stamp[0] is not None:
+                games[name] = entry
+
+        changed = force or cached.get("mtime") != library_mtime or self.scanned > 0 or len(games) != len(cached_games)
+        self.libraries[library] = {"mtime": library_mtime, "games": games}
+        if changed:
+            try:
+                self.save()
+            except OSError as e:
+                print(f"Error saving game discovery cache: {e}")
+
+        return [Path(entry["gameinfo"]) for entry in games.values() if entry["gameinfo"] is not None]
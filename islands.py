@@ -0,0 +1,149 @@
+"""Loose part (island) detection.
+
+Connected components of a mesh's vertex graph, computed on whole edge arrays
+with a vectorized union-find (hooking plus pointer jumping), so the cost is a
+handful of NumPy passes over the edges instead of Python work per vertex.
+"""
+
+import numpy as np
+
+
+class MeshIslands:
+    """Island of every vertex and face of a mesh, islands numbered 0..count-1."""
+
+    def __init__(self, vertex_islands, face_islands, count):
+        self.vertex_islands = vertex_islands  # (verts,) int32
+        self.face_islands = face_islands      # (faces,) int32
+        self.count = count
+
+    def island_faces(self):
+        """Face indices of each island (empty for islands that are only loose vertices/edges)."""
+        order = np.argsort(self.face_islands, kind="stable")
+        bounds = np.searchsorted(self.face_islands[order], np.arange(self.count + 1))
+        return [order[bounds[i]:bounds[i + 1]] for i in range(self.count)]
+
+
+def find_roots(parent, vertices, visited=None):
+    """Root of every one of vertices in the parent forest.
+
+    The vertices passed on the way there are appended to visited, when given.
+    """
+    roots = parent[vertices]
+    while True:
+        next_roots = parent[roots]
+        moved = next_roots != roots
+        if not moved.any():
+            return roots
+        if visited is not None:
+            visited.append(roots[moved])
+        roots = next_roots
+
+
+def union_edges(parent, edges):
+    """Merge the components that edges connect, in place.
+
+    parent is a forest in which every vertex leads to the lowest vertex of its
+    component (np.arange to begin with). Only the vertices of edges and the
+    paths to their roots are visited and compressed, so a large graph can be
+    gone through an edge chunk at a time.
+    """
+    edge_a = edges[:, 0].astype(np.int64)
+    edge_b = edges[:, 1].astype(np.int64)
+    visited = []
+    root_a = find_roots(parent, edge_a, visited)
+    root_b = find_roots(parent, edge_b, visited)
+
+    # components of the graph the edges make between the roots, the lowest root of each becomes the root of the rest
+    roots, local = np.unique(np.concatenate([root_a, root_b]), return_inverse=True)
+    labels, _ = connected_components(len(roots), local.reshape(2, -1).T)
+    _, lowest = np.unique(labels, return_index=True)
+    parent[roots] = roots[lowest][labels]
+
+    # the vertices just looked at, and the ones on their way up, point straight at their roots from now on
+    parent[edge_a] = parent[root_a]
+    parent[edge_b] = parent[root_b]
+    if visited:
+        visited = np.unique(np.concatenate(visited))
+        parent[visited] = find_roots(parent, visited)
+
+
+def iter_count_components(vertex_count, edges, chunk_size):
+    """Count the connected components of a graph a chunk of edges at a time.
+
+    A generator yielding the number of edges gone through so far after every
+    chunk_size edges, whose return value is the count.
+    """
+    parent = np.arange(vertex_count, dtype=np.int64)
+    for start in range(0, len(edges), chunk_size):
+        union_edges(parent, edges[start:start + chunk_size])
+        yield min(start + chunk_size, len(edges))
+
+    # every component has exactly one vertex that is its own root, however deep the trees are
+    return int(np.count_nonzero(parent == np.arange(vertex_count)))
+
+
+def iter_label_components(vertex_count, edges, chunk_size):
+    """connected_components a chunk of edges, then of vertices, at a time.
+
+    A generator yielding the number of edges and vertices gone through so far
+    after every chunk, whose return value is (labels, count), the same as
+    connected_components returns.
+    """
+    parent = np.arange(vertex_count, dtype=np.int64)
+    for start in range(0, len(edges), chunk_size):
+        union_edges(parent, edges[start:start + chunk_size])
+        yield min(start + chunk_size, len(edges))
+
+    # every root is the lowest vertex of its component, so its label is the number of roots before it,
+    # and it's labelled by the time the rest of the component is
+    labels = np.empty(vertex_count, dtype=np.int32)
+    count = 0
+    for start in range(0, vertex_count, chunk_size):
+        vertices = np.arange(start, min(start + chunk_size, vertex_count))
+        roots = find_roots(parent, vertices)
+        is_root = roots == vertices
+        root_count = int(np.count_nonzero(is_root))
+        labels[vertices[is_root]] = np.arange(count, count + root_count)
+        labels[vertices] = labels[roots]
+        count += root_count
+        yield len(edges) + vertices[-1] + 1
+
+    return labels, count
+
+
+def connected_components(vertex_count, edges):
+    """Label the connected components of a graph.
+
+    edges is an (n, 2) array of vertex indices. Returns (labels, count), with
+    labels numbered 0..count-1 in order of each component's lowest vertex.
+    Vertices without edges are components of their own.
+    """
+    parent = np.arange(vertex_count, dtype=np.int64)
+    if vertex_count == 0:
+        return parent.astype(np.int32), 0
+
+    edge_a = edges[:, 0].astype(np.int64)
+    edge_b = edges[:, 1].astype(np.int64)
+
+    while True:
+        root_a = parent[edge_a]
+        root_b = parent[edge_b]
+        differ = root_a != root_b
+        if not differ.any():
+            break
+
+        # hook the higher root under the lower one, then flatten the trees
+        np.minimum.at(parent, np.maximum(root_a[differ], root_b[differ]), np.minimum(root_a[differ], root_b[differ]))
+        while True:
+            grandparent = parent[parent]
+            if np.array_equal(grandparent, parent):
+                break
+            parent = grandparent
+
+        # only edges that still straddle two components matter next round
+        edge_a = edge_a[differ]
+        edge_b = edge_b[differ]
+
+    roots, labels = np.unique(parent, return_inverse=True)
+    return labels.astype(np.int32).ravel(), len(roots)
+
@@ -0,0 +1,83 @@
+"""Mesh statistics for the panel, worked out a slice at a time.
+
+The panel shows the triangles and vertices of the chosen meshes, how the
+triangles are spread over the material slots, and how many loose parts
+(islands) the collision mesh has, so a mesh studiomdl is going to refuse is
+noticed before compiling it. Reading and going through the arrays of a
+mesh of millions of triangles takes a while, so a MeshStatsJob does both a
+piece at a time, from a timer that runs it a few milliseconds at a time.
+
+Like smd_export, this module doesn't need bpy, the arrays are read on the
+Blender side.
+"""
+
+import time
+
+import numpy as np
+
+from . import islands
+
+# studiomdl's limits for a single model (MAXSTUDIOTRIANGLES and MAXSTUDIOVERTS)
+MAX_STUDIO_TRIANGLES = 65536
+MAX_STUDIO_VERTS = 65536
+
+# faces or edges gone through between checks of the time budget
+CHUNK_SIZE = 1 << 14
+
+
+class MeshStats:
+    """What the panel shows about one mesh."""
+
+    def __init__(self, vertices, triangles, material_triangles, islands):
+        self.vertices = vertices
+        self.triangles = triangles
+        self.material_triangles = material_triangles  # triangles of every material slot, by slot index
+        self.islands = islands                          # None when they weren't counted
+
+    @property
+    def over_limits(self):
+        return self.triangles > MAX_STUDIO_TRIANGLES or self.vertices > MAX_STUDIO_VERTS
+
+
+class MeshStatsJob:
+    """MeshStats of a mesh, computed chunk by chunk.
+
+    read is a generator that reads the mesh's arrays a piece at a time,
+    yielding in between, and returns (vertex_count, loop_totals,
+    material_indices, slot_count, edges). edges is only needed (and may be
+    None otherwise) when count_islands is set.
+    """
+
+    def __init__(self, read, count_islands=False):
+        self.count_islands = count_islands
+        self.result = None
+        self._steps = self._run(read)
+
+    def step(self, budget):
+        """Work for about budget seconds. Returns True once result is there."""
+        deadline = time.perf_counter() + budget
+        for _ in self._steps:
+            if time.perf_counter() >= deadline:
+                return False
+        return True
+
+    def _run(self, read):
+        vertex_count, loop_totals, material_indices, slot_count, edges = yield from read
+
+        # faces of slots that don't exist end up in the last one, like they do when exporting
+        slot_count = max(slot_count, 1)
+        material_indices = np.clip(material_indices, 0, slot_count - 1)
+
+        triangles = 0
+        material_triangles = np.zeros(slot_count, dtype=np.int64)
+        for start in range(0, len(loop_totals), CHUNK_SIZE):
+            face_triangles = np.maximum(loop_totals[start:start + CHUNK_SIZE].astype(np.int64) - 2, 0)
+            triangles += int(face_triangles.sum())
+            material_triangles += np.bincount(material_indices[start:start + CHUNK_SIZE], weights=face_triangles, minlength=slot_count).astype(np.int64)
+            yield
+
+        island_count = None
+        if self.count_islands:
+            island_count = yield from islands.iter_count_components(vertex_count, edges, CHUNK_SIZE)
+
+        self.result = MeshStats(vertex_count, triangles, material_triangles.tolist(), island_count)
@@ -0,0 +1,161 @@
+"""Persistent cache of compiled models.
+
+A compile is keyed on everything studiomdl reads or is told: the QC text, the
+bytes of every mesh file the QC references, the studiomdl arguments, the
+studiomdl executable itself (path, size and mtime, standing in for its
+version) and the game. When the key matches an earlier compile, its
+.mdl/.vvd/.phy/.vtx files are copied back instead of running studiomdl again.
+Entries never share their data with the game folder, where other tools (or a
+later compile writing in place) could change a file under the cache.
+"""
+
+import hashlib
+import os
+import re
+import shutil
+
+from . import workspace
+
+# bump whenever what goes into the key changes, so entries made under the old key are never reused
+CACHE_VERSION = 1
+
+# every file studiomdl writes for a model
+COMPILED_EXTENSIONS = [".dx80.vtx", ".dx90.vtx", ".mdl", ".phy", ".sw.vtx", ".vvd"]
+
+# mesh files named in the qc, e.g. $body "Body" "prop_ref.smd"
+QC_MESH_REFERENCE = re.compile(r'"([^"]+\.(?:smd|dmx))"', re.IGNORECASE)
+
+HASH_CHUNK_SIZE = 1024 * 1024
+
+
+def referenced_meshes(qc_path, qc_text):
+    """Paths of the mesh files a qc references, relative ones resolved against the qc's folder."""
+    qc_folder = os.path.dirname(qc_path)
+    paths = []
+    for name in QC_MESH_REFERENCE.findall(qc_text):
+        path = os.path.join(qc_folder, name)
+        if path not in paths:
+            paths.append(path)
+    return paths
+
+
+def compile_key(qc_path, studiomdl_args, studiomdl_path, game_path):
+    """Hash of everything that decides what studiomdl writes for this qc."""
+    with open(qc_path, "r", encoding="utf-8", errors="replace") as file:
+        qc_text = file.read()
+
+    digest = hashlib.blake2b(digest_size=20)
+    digest.update(f"automdl model {CACHE_VERSION}\n{game_path}\n{studiomdl_path}\n".encode("utf-8"))
+
+    try:
+        stat = os.stat(studiomdl_path)
+        digest.update(f"{stat.st_size} {stat.st_mtime_ns}\n".encode("utf-8"))
+    except OSError:
+        digest.update(b"missing studiomdl\n")
+
+    # the qc path is the last argument and only says where the qc is, its contents are hashed below
+    digest.update(("\n".join(str(arg) for arg in studiomdl_args[1:-1]) + "\n").encode("utf-8"))
+    digest.update(qc_text.encode("utf-8"))
+
+    for path in referenced_meshes(qc_path, qc_text):
+        digest.update(f"\n{os.path.basename(path)}\n".encode("utf-8"))
+        try:
+            with open(path, "rb") as file:
+                for chunk in iter(lambda: file.read(HASH_CHUNK_SIZE), b""):
+                    digest.update(chunk)
+        except OSError:
+            digest.update(b"missing")
+
+    return digest.hexdigest()
+
+
+class ModelCache:
+    """Folder per compile key holding that compile's output, evicted least recently used first.
+
+    Files are stored as "model" plus their compiled extension, so an entry can
+    be restored under the model's name. Recency is the entry folder's mtime,
+    which is bumped on every hit, so it survives restarts.
+    """
+
+    def __init__(self, folder, max_bytes):
+        self.folder = folder
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(folder, exist_ok=True)
+
+    def entry_path(self, key):
+        return os.path.join(self.folder, key)
+
+    def fetch(self, key, model_name, dest_folder):
+        """Put the compiled files for key into dest_folder as model_name.*
+
+        Returns the restored paths, or None on a miss.
+        """
+        entry = self.entry_path(key)
+        if not os.path.isdir(entry):
+            self.misses += 1
+            return None
+
+        restored = []
+        os.makedirs(dest_folder, exist_ok=True)
+        for filename in os.listdir(entry):
+            extension = filename[len("model"):]
+            dest_path = os.path.join(dest_folder, model_name + extension)
+            workspace.copy_file(os.path.join(entry, filename), dest_path)
+            restored.append(dest_path)
+
+        os.utime(entry)
+        self.hits += 1
+        return restored
+
+    def store(self, key, model_name, compiled_paths):
+        """Keep the compiled files of model_name (paths as delivered) under key."""
+        entry = self.entry_path(key)
+        staging = entry + ".tmp"
+        shutil.rmtree(staging, ignore_errors=True)
+        os.makedirs(staging)
+
+        for path in compiled_paths:
+            extension = os.path.basename(path)[len(model_name):]
+            workspace.copy_file(path, os.path.join(staging, "model" + extension))
+
+        # a half copied entry must never be found, so it only gets its real name once complete
+        shutil.rmtree(entry, ignore_errors=True)
+        os.replace(staging, entry)
+        self.evict()
+
+    def entries(self):
+        """(path, size, mtime) of every cached compile."""
+        result = []
+        for entry in os.scandir(self.folder):
+            if entry.is_dir() and not entry.name.endswith(".tmp"):
+                size = sum(file.stat().st_size for file in os.scandir(entry.path) if file.is_file())
+                result.append((entry.path, size, entry.stat().st_mtime))
+        return result
+
+    def size(self):
+        return sum(size for _, size, _ in self.entries())
+
+    def evict(self):
+        entries = self.entries()
+        total = sum(size for _, size, _ in entries)
+
+        # oldest first
+        entries.sort(key=lambda entry: entry[2])
+        for path, size, _ in entries:
+            if total <= self.max_bytes:
+                break
+            try:
+                shutil.rmtree(path)
+                total -= size
+            except OSError as e:
+                print(f"Error evicting {path}: {e}")
+
+    def clear(self):
+        for path, _, _ in self.entries():
+            shutil.rmtree(path, ignore_errors=True)
+
+    def hit_rate(self):
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
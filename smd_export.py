@@ -0,0 +1,392 @@
+"""SMD triangle export.
+
+Everything the exporter needs is pulled out of the evaluated mesh with
+foreach_get in one go, and triangles are formatted a whole block at a time
+instead of walking mesh.loop_triangles one RNA lookup at a time.
+"""
+
+import importlib
+import multiprocessing
+import os
+import sys
+import time
+from collections import deque
+from multiprocessing import shared_memory
+
+import numpy as np
+
+SMD_HEADER = "version 1\nnodes\n0 \"root\" -1\nend\nskeleton\ntime 0\n0 0 0 0 0 0 0\nend\ntriangles\n"
+SMD_FOOTER = "end\n"
+
+# one line per triangle corner: bone, position, normal, uv, and a zero for the (unused) bone links
+SMD_CORNER_FORMAT = "0  %.6f %.6f %.6f  %.6f %.6f %.6f  %.6f %.6f 0\n"
+SMD_TRIANGLE_FORMAT = "%s\n" + SMD_CORNER_FORMAT * 3
+
+# floats per triangle in a gathered block: 3 corners * (3 position + 3 normal + 2 uv)
+CORNER_FLOATS = 8
+TRIANGLE_FLOATS = CORNER_FLOATS * 3
+
+# how many triangles are formatted with a single % call, and written to the file at once
+FORMAT_BLOCK_SIZE = 16384
+
+SMD_WRITE_BUFFER_SIZE = 1024 * 1024
+
+# blocks whose unique corners are more than this share of all corners are formatted corner by corner
+MAX_UNIQUE_CORNER_SHARE = 0.75
+
+# meshes with at least this many triangles are formatted by a pool of worker processes
+PARALLEL_MIN_TRIANGLES = 500000
+# triangles per shard handed to a worker
+PARALLEL_SHARD_SIZE = 65536
+
+
+class MeshArrays:
+    """Flat copies of the mesh data read by the SMD exporter."""
+
+    __slots__ = ("positions", "normals", "uvs", "tri_verts", "tri_loops", "material_indices", "smooth")
+
+    def __init__(self, positions, normals, uvs, tri_verts, tri_loops, material_indices, smooth):
+        self.positions = positions                # (verts, 3) float32
+        self.normals = normals                    # (verts, 3) float32
+        self.uvs = uvs                            # (loops, 2) float32
+        self.tri_verts = tri_verts                # (tris, 3) int32
+        self.tri_loops = tri_loops                # (tris, 3) int32
+        self.material_indices = material_indices  # (tris,) int32
+        self.smooth = smooth                      # (tris,) bool
+
+    @property
+    def triangle_count(self):
+        return len(self.tri_verts)
+
+
+def read_mesh_arrays(mesh):
+    """Read positions, normals, uvs and loop triangles of a mesh with foreach_get.
+
+    calc_loop_triangles() must already have been called on the mesh.
+    """
+    vert_count = len(mesh.vertices)
+    loop_count = len(mesh.loops)
+    tri_count = len(mesh.loop_triangles)
+
+    positions = np.empty(vert_count * 3, dtype=np.float32)
+    mesh.vertices.foreach_get("co", positions)
+
+    normals = np.empty(vert_count * 3, dtype=np.float32)
+    mesh.vertex_normals.foreach_get("vector", normals)
+
+    uvs = np.zeros(loop_count * 2, dtype=np.float32)
+    if mesh.uv_layers.active is not None:
+        mesh.uv_layers.active.data.foreach_get("uv", uvs)
+
+    tri_verts = np.empty(tri_count * 3, dtype=np.int32)
+    mesh.loop_triangles.foreach_get("vertices", tri_verts)
+
+    tri_loops = np.empty(tri_count * 3, dtype=np.int32)
+    mesh.loop_triangles.foreach_get("loops", tri_loops)
+
+    material_indices = np.empty(tri_count, dtype=np.int32)
+    mesh.loop_triangles.foreach_get("material_index", material_indices)
+
+    smooth = np.empty(tri_count, dtype=bool)
+    mesh.loop_triangles.foreach_get("use_smooth", smooth)
+
+    return MeshArrays(
+        positions.reshape(-1, 3),
+        normals.reshape(-1, 3),
+        uvs.reshape(-1, 2),
+        tri_verts.reshape(-1, 3),
+        tri_loops.reshape(-1, 3),
+        material_indices,
+        smooth
+    )
+
+
+def merge_mesh_arrays(parts):
+    """Join several meshes into one MeshArrays, like joining their objects in Blender would.
+
+    parts are (arrays, matrix, material_map): a mesh's arrays in its object's
+    space, the object's 4x4 world matrix, and the merged material index of
+    each of its material indices (empty for objects without slots, whose
+    triangles get the first material). Every part is transformed in bulk.
+    There has to be at least one part.
+    """
+    positions, normals, uvs, tri_verts, tri_loops, material_indices, smooth = ([] for _ in range(7))
+    vertex_offset = 0
+    loop_offset = 0
+    for arrays, matrix, material_map in parts:
+        matrix = np.asarray(matrix, dtype=np.float64)
+        linear = matrix[:3, :3]
+        positions.append((arrays.positions @ linear.T + matrix[:3, 3]).astype(np.float32))
+
+        # normals go through the inverse transpose, so they stay perpendicular under non uniform scale
+        part_normals = arrays.normals @ np.linalg.pinv(linear)
+        lengths = np.linalg.norm(part_normals, axis=1, keepdims=True)
+        normals.append((part_normals / np.where(lengths > 0, lengths, 1)).astype(np.float32))
+        uvs.append(arrays.uvs)
+
+        # a mirrored object's triangles are wound the other way round, so they keep facing outwards
+        corner_order = [0, 2, 1] if np.linalg.det(linear) < 0 else [0, 1, 2]
+        tri_verts.append(arrays.tri_verts[:, corner_order] + vertex_offset)
+        tri_loops.append(arrays.tri_loops[:, corner_order] + loop_offset)
+
+        material_map = np.asarray(material_map if len(material_map) > 0 else [0], dtype=np.int32)
+        material_indices.append(material_map[np.clip(arrays.material_indices, 0, len(material_map) - 1)])
+        smooth.append(arrays.smooth)
+
+        vertex_offset += len(arrays.positions)
+        loop_offset += len(arrays.uvs)
+
+    return MeshArrays(
+        np.concatenate(positions),
+        np.concatenate(normals),
+        np.concatenate(uvs),
+        np.concatenate(tri_verts).astype(np.int32),
+        np.concatenate(tri_loops).astype(np.int32),
+        np.concatenate(material_indices),
+        np.concatenate(smooth)
+    )
+
+
+def flat_normals(pos_a, pos_b, pos_c):
+    """Face normals of triangles, one row per triangle.
+
+    Follows mathutils' (pos_b - pos_a).cross(pos_c - pos_a).normalized() step
+    for step in single precision, so the result formats exactly like the
+    per-triangle version did. Degenerate triangles get a zero normal.
+    """
+    normal = np.cross(pos_b - pos_a, pos_c - pos_a)
+
+    # normalize_vn: products in float, summed (z, y, x) in double, then back to float
+    squared = normal * normal
+    length_sq = ((squared[:, 2].astype(np.float64) + squared[:, 1]) + squared[:, 0]).astype(np.float32)
+    valid = length_sq > np.float32(1.0e-35)
+
+    result = np.zeros_like(normal)
+    result[valid] = normal[valid] * (np.float32(1.0) / np.sqrt(length_sq[valid]))[:, None]
+    return result
+
+
+def gather_corners(arrays, start, stop, use_flat_shading):
+    """Gather positions, normals and uvs of triangles [start, stop) into one (n, 24) block."""
+    tri_verts = arrays.tri_verts[start:stop]
+    tri_loops = arrays.tri_loops[start:stop]
+
+    # (n, 3 corners, 3)
+    positions = arrays.positions[tri_verts]
+    normals = arrays.normals[tri_verts]
+    uvs = arrays.uvs[tri_loops]
+
+    if use_flat_shading:
+        flat = ~arrays.smooth[start:stop]
+        if flat.any():
+            tri_positions = positions[flat]
+            face_normals = flat_normals(tri_positions[:, 0], tri_positions[:, 1], tri_positions[:, 2])
+            normals[flat] = face_normals[:, None, :]
+
+    block = np.empty((stop - start, 3, CORNER_FLOATS), dtype=np.float32)
+    block[:, :, 0:3] = positions
+    block[:, :, 3:6] = normals
+    block[:, :, 6:8] = uvs
+    return block.reshape(-1, TRIANGLE_FLOATS)
+
+
+def triangle_material_names(arrays, material_names, start, stop):
+    """Material name of every triangle in [start, stop), as an object array."""
+    if len(material_names) == 1:
+        return np.full(stop - start, material_names[0], dtype=object)
+
+    names = np.array(material_names, dtype=object)
+    indices = np.clip(arrays.material_indices[start:stop], 0, len(material_names) - 1)
+    return names[indices]
+
+
+def format_triangles(names, corners):
+    """Format a block of triangles as SMD text.
+
+    names: per triangle material name, corners: (n, 24) gathered block
+
+    Corners shared between triangles (smooth shading, shared uvs) are only
+    formatted once, and the triangles are put together from the formatted
+    lines. Corners are told apart by their bytes, and identical bytes format
+    to identical text, so the output is the same as formatting every corner.
+    """
+    count = len(names)
+    if count == 0:
+        return ""
+
+    corner_rows = np.ascontiguousarray(corners).reshape(-1, CORNER_FLOATS)
+    row_view = corner_rows.view(np.dtype((np.void, corner_rows.dtype.itemsize * CORNER_FLOATS))).ravel()
+    unique_view, corner_indices = np.unique(row_view, return_inverse=True)
+
+    # hardly anything shared (flat shading), putting the lines together again would cost more than it saves
+    if len(unique_view) > len(row_view) * MAX_UNIQUE_CORNER_SHARE:
+        values = np.empty((count, TRIANGLE_FLOATS + 1), dtype=object)
+        values[:, 0] = names
+        values[:, 1:] = corners.astype(np.float64)
+        return (SMD_TRIANGLE_FORMAT * count) % tuple(values.ravel().tolist())
+
+    unique_corners = unique_view.view(np.float32).reshape(-1, CORNER_FLOATS)
+    lines = (SMD_CORNER_FORMAT * len(unique_corners)) % tuple(unique_corners.astype(np.float64).ravel().tolist())
+    corner_lines = np.array(lines.split("\n")[:-1], dtype=object)
+
+    values = np.empty((count, 4), dtype=object)
+    values[:, 0] = names
+    values[:, 1:] = corner_lines[corner_indices.ravel()].reshape(-1, 3)
+    return "\n".join(values.ravel().tolist()) + "\n"
+
+
+def iter_triangle_blocks(arrays, material_names, use_flat_shading, block_size=FORMAT_BLOCK_SIZE, start=0, stop=None):
+    """Yield the SMD triangles section of a mesh as text, block_size triangles at a time.
+
+    material_names is indexed by triangle material index. Pass a single name to
+    give every triangle the same material (collision meshes, meshes without slots).
+    start and stop limit the output to a range of triangles.
+    """
+    tri_count = arrays.triangle_count if stop is None else stop
+    for block_start in range(start, tri_count, block_size):
+        block_stop = min(block_start + block_size, tri_count)
+        names = triangle_material_names(arrays, material_names, block_start, block_stop)
+        corners = gather_corners(arrays, block_start, block_stop, use_flat_shading)
+        yield format_triangles(names, corners)
+
+
+class SharedMeshArrays:
+    """Copies of MeshArrays in shared memory blocks, so worker processes can read them without pickling."""
+
+    def __init__(self, arrays):
+        self.blocks = []
+        # (block name, shape, dtype) of every array, which is all a worker needs to attach to it
+        self.specs = {}
+        try:
+            for name in MeshArrays.__slots__:
+                array = getattr(arrays, name)
+                block = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+                self.blocks.append(block)
+                np.ndarray(array.shape, array.dtype, buffer=block.buf)[...] = array
+                self.specs[name] = (block.name, array.shape, array.dtype.str)
+        except:
+            self.close()
+            raise
+
+    def close(self):
+        for block in self.blocks:
+            block.close()
+            block.unlink()
+        self.blocks = []
+
+
+def format_shard(task):
+    """Worker process side: attach to the shared arrays and format triangles [start, stop)."""
+    specs, material_names, use_flat_shading, start, stop, block_size = task
+
+    blocks = {name: shared_memory.SharedMemory(name=spec[0]) for name, spec in specs.items()}
+    try:
+        views = {name: np.ndarray(spec[1], np.dtype(spec[2]), buffer=blocks[name].buf) for name, spec in specs.items()}
+        arrays = MeshArrays(**views)
+        text = "".join(iter_triangle_blocks(arrays, material_names, use_flat_shading, block_size, start, stop))
+
+        # the views must be gone before the blocks can be closed
+        del arrays, views
+        return text
+    finally:
+        for block in blocks.values():
+            block.close()
+
+
+def get_worker_module(name="smd_export"):
+    """A module of this addon (this one by default) imported under its own top-level name, or None if that isn't possible.
+
+    Worker processes can't import it through the addon package (that needs bpy),
+    so functions handed to them have to come from the top-level import.
+    """
+    folder = os.path.dirname(os.path.abspath(__file__))
+    if folder not in sys.path:
+        sys.path.append(folder)
+
+    try:
+        module = importlib.import_module(name)
+    except ImportError:
+        return None
+
+    # someone else's module of that name earlier on the path
+    if os.path.abspath(module.__file__) != os.path.join(folder, name + ".py"):
+        return None
+    return module
+
+
+def iter_triangle_shards(arrays, material_names, use_flat_shading, workers, shard_size=PARALLEL_SHARD_SIZE, block_size=FORMAT_BLOCK_SIZE):
+    """Like iter_triangle_blocks, but shards are formatted in a pool of worker processes.
+
+    Shards are yielded in order, and only a couple per worker are in flight at a
+    time, so memory stays bounded when writing is slower than formatting.
+    """
+    worker_module = get_worker_module()
+    if worker_module is None:
+        yield from iter_triangle_blocks(arrays, material_names, use_flat_shading, block_size)
+        return
+
+    shared = SharedMeshArrays(arrays)
+    try:
+        tri_count = arrays.triangle_count
+        tasks = deque(
+            (shared.specs, list(material_names), use_flat_shading, start, min(start + shard_size, tri_count), block_size)
+            for start in range(0, tri_count, shard_size)
+        )
+
+        with multiprocessing.get_context("spawn").Pool(workers) as pool:
+            in_flight = deque()
+            while tasks or in_flight:
+                while tasks and len(in_flight) < workers * 2:
+                    in_flight.append(pool.apply_async(worker_module.format_shard, (tasks.popleft(),)))
+                yield in_flight.popleft().get()
+    finally:
+        shared.close()
+
+
+def write_smd(path, arrays, material_names, use_flat_shading, block_size=FORMAT_BLOCK_SIZE, workers=1, parallel_min_triangles=PARALLEL_MIN_TRIANGLES, stats=None):
+    """Write a complete SMD, streaming each formatted block straight to the file.
+
+    Only one block of text is alive at a time, so peak memory does not grow with
+    the triangle count. With more than one worker, meshes of at least
+    parallel_min_triangles triangles are formatted in worker processes instead,
+    which writes exactly the same file.
+
+    When stats is a dict, the seconds spent writing (as opposed to formatting)
+    are stored in it as "write_seconds".
+    """
+    for _ in iter_write_smd(path, arrays, material_names, use_flat_shading, block_size, workers, parallel_min_triangles, stats):
+        pass
+
+
+def iter_write_smd(path, arrays, material_names, use_flat_shading, block_size=FORMAT_BLOCK_SIZE, workers=1, parallel_min_triangles=PARALLEL_MIN_TRIANGLES, stats=None):
+    """write_smd a block at a time: yields the triangles written so far after every block (or shard).
+
+    Closing the generator early closes the file, leaving it incomplete.
+    """
+    tri_count = arrays.triangle_count
+    if workers > 1 and tri_count >= parallel_min_triangles:
+        blocks = iter_triangle_shards(arrays, material_names, use_flat_shading, workers, block_size=block_size)
+        step = PARALLEL_SHARD_SIZE
+    else:
+        blocks = iter_triangle_blocks(arrays, material_names, use_flat_shading, block_size)
+        step = block_size
+
+    write_seconds = 0.0
+    written = 0
+    try:
+        with open(path, "w", buffering=SMD_WRITE_BUFFER_SIZE) as file:
+            file.write(SMD_HEADER)
+            for block in blocks:
+                write_start = time.perf_counter()
+                file.write(block)
+                write_seconds += time.perf_counter() - write_start
+                written = min(written + step, tri_count)
+                yield written
+            file.write(SMD_FOOTER)
+            close_start = time.perf_counter()
+    finally:
+        # the shard pool and its shared memory go right away, not whenever the generator is collected
+        blocks.close()
+
+    if stats is not None:
+        stats["write_seconds"] = write_seconds + time.perf_counter() - close_start
@@ -0,0 +1,16 @@
+"""Makes the add-on's modules importable as the automdl package outside Blender.
+
+The package's __init__.py is the Blender add-on itself and needs bpy. The
+modules tested here only need NumPy, so they get a package that doesn't run it.
+"""
+
+import os
+import sys
+import types
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+if "automdl" not in sys.modules:
+    package = types.ModuleType("automdl")
+    package.__path__ = [ROOT]
+    sys.modules["automdl"] = package
@@ -0,0 +1,78 @@
+import numpy as np
+import pytest
+
+from automdl import convex_hulls
+from automdl import smd_export
+
+
+def assert_closed_and_containing(points, hull_points, triangles):
+    # every edge is walked once in each direction by the two faces sharing it
+    edges = np.concatenate([triangles[:, [0, 1]], triangles[:, [1, 2]], triangles[:, [2, 0]]])
+    directed = {tuple(edge) for edge in edges.tolist()}
+    assert len(directed) == len(edges)
+    assert all((b, a) in directed for a, b in directed)
+
+    # and every point is behind (or on) every face
+    corners = hull_points[triangles]
+    normals = np.cross(corners[:, 1] - corners[:, 0], corners[:, 2] - corners[:, 0])
+    normals /= np.linalg.norm(normals, axis=1)[:, None]
+    distances = (points @ normals.T) - np.einsum("ij,ij->i", normals, corners[:, 0])
+    assert distances.max() <= 1e-9 * np.abs(points).max()
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_quickhull_is_closed_and_contains_the_points(seed):
+    rng = np.random.default_rng(seed)
+    points = rng.normal(size=(int(rng.integers(4, 500)), 3))
+    if seed % 2:
+        # many points on the hull at once
+        points /= np.linalg.norm(points, axis=1)[:, None]
+    triangles = convex_hulls.quickhull(points)
+    assert triangles is not None
+    assert_closed_and_containing(points, points, triangles)
+
+
+def test_quickhull_of_a_cube_keeps_its_corners():
+    corners = np.array([[x, y, z] for x in (0, 1) for y in (0, 1) for z in (0, 1)], dtype=np.float64)
+    inside = np.random.default_rng(0).random((50, 3)) * 0.8 + 0.1
+    points = np.concatenate([inside, corners])
+    triangles = convex_hulls.quickhull(points)
+    assert sorted(np.unique(triangles)) == list(range(50, 58))
+    assert len(triangles) == 12
+
+
+@pytest.mark.parametrize("points", [
+    np.zeros((3, 3)),
+    np.array([[0, 0, 0], [1, 0, 0], [2, 0, 0], [3, 0, 0]], dtype=np.float64),
+    np.random.default_rng(0).normal(size=(30, 3)) * [1, 1, 0],
+], ids=["too_few", "line", "plane"])
+def test_quickhull_without_volume(points):
+    assert convex_hulls.quickhull(points) is None
+
+
+@pytest.mark.parametrize("max_vertices", [1, 4, 5, 8, 32])
+@pytest.mark.parametrize("thickness", [1.0, 1e-3])
+def test_island_hull_keeps_to_the_vertex_budget(max_vertices, thickness):
+    points = np.random.default_rng(1).normal(size=(400, 3)) * [1, 1, thickness]
+    hull_points, triangles = convex_hulls.island_hull(points, max_vertices)
+    assert len(hull_points) <= max(max_vertices, 4)
+    assert_closed_and_containing(hull_points, hull_points, triangles)
+
+
+def test_build_hull_arrays_makes_a_piece_per_island():
+    rng = np.random.default_rng(2)
+    positions = []
+    tri_verts = []
+    for island in range(3):
+        points = rng.normal(size=(20, 3)) + island * 10
+        triangles = convex_hulls.quickhull(points) + island * 20
+        positions.append(points)
+        tri_verts.append(triangles)
+    positions = np.concatenate(positions).astype(np.float32)
+    tri_verts = np.concatenate(tri_verts).astype(np.int32)
+    arrays = smd_export.MeshArrays(positions, None, None, tri_verts, None, None, None)
+
+    hulls, piece_vertex_counts = convex_hulls.build_hull_arrays(arrays, 8)
+    assert len(piece_vertex_counts) == 3
+    assert all(count <= 8 for count in piece_vertex_counts)
+    assert sum(piece_vertex_counts) == len(hulls.positions)
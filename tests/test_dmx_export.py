@@ -0,0 +1,155 @@
+import struct
+
+import numpy as np
+import pytest
+
+from automdl import dmx_export
+from automdl import smd_export
+from test_smd_export import grid_arrays
+
+
+class DmxReader:
+    """Just enough of the binary datamodel encoding to read back what DmxWriter writes."""
+
+    def __init__(self, data):
+        self.data = data
+        self.offset = 0
+
+    def unpack(self, format):
+        values = struct.unpack_from(format, self.data, self.offset)
+        self.offset += struct.calcsize(format)
+        return values
+
+    def string(self):
+        end = self.data.index(b"\0", self.offset)
+        value = self.data[self.offset:end].decode("utf-8")
+        self.offset = end + 1
+        return value
+
+    def array(self, dtype, width=1):
+        (count,) = self.unpack("<i")
+        values = np.frombuffer(self.data, dtype=dtype, count=count * width, offset=self.offset)
+        self.offset += values.nbytes
+        return values.reshape(count, width) if width > 1 else values
+
+    def value(self, attr_type):
+        if attr_type in (dmx_export.ATTR_ELEMENT, dmx_export.ATTR_INT):
+            return self.unpack("<i")[0]
+        if attr_type == dmx_export.ATTR_FLOAT:
+            return self.unpack("<f")[0]
+        if attr_type == dmx_export.ATTR_BOOL:
+            return self.unpack("<?")[0]
+        if attr_type == dmx_export.ATTR_STRING:
+            return self.string()
+        if attr_type == dmx_export.ATTR_VECTOR2:
+            return self.unpack("<2f")
+        if attr_type == dmx_export.ATTR_VECTOR3:
+            return self.unpack("<3f")
+        if attr_type == dmx_export.ATTR_QUATERNION:
+            return self.unpack("<4f")
+
+        item_type = attr_type - dmx_export.ATTR_ARRAY
+        if item_type == dmx_export.ATTR_STRING:
+            (count,) = self.unpack("<i")
+            return [self.string() for _ in range(count)]
+        if item_type in (dmx_export.ATTR_ELEMENT, dmx_export.ATTR_INT):
+            return self.array("<i4")
+        widths = {dmx_export.ATTR_FLOAT: 1, dmx_export.ATTR_VECTOR2: 2, dmx_export.ATTR_VECTOR3: 3}
+        return self.array("<f4", widths[item_type])
+
+    def read(self):
+        """(header, [(type, name, {attribute: (type, value)})])"""
+        header = self.string()
+        (string_count,) = self.unpack("<h")
+        strings = [self.string() for _ in range(string_count)]
+
+        (element_count,) = self.unpack("<i")
+        elements = []
+        for _ in range(element_count):
+            (type_index,) = self.unpack("<h")
+            name = self.string()
+            self.unpack("16s")
+            elements.append((strings[type_index], name, {}))
+
+        for _, _, attributes in elements:
+            (attribute_count,) = self.unpack("<i")
+            for _ in range(attribute_count):
+                name_index, attr_type = self.unpack("<hb")
+                attributes[strings[name_index]] = (attr_type, self.value(attr_type))
+
+        assert self.offset == len(self.data)
+        return header, elements
+
+
+def read_dmx(path):
+    with open(path, "rb") as file:
+        return DmxReader(file.read()).read()
+
+
+@pytest.mark.parametrize("chunk_size", [3, smd_export.FORMAT_BLOCK_SIZE])
+def test_dmx_writer_round_trip(tmp_path, chunk_size):
+    dmx = dmx_export.DmxWriter()
+    root = dmx.add_element("DmElement", "root")
+    child = dmx.add_element("DmeThing", "child")
+    root.add("child", dmx_export.ATTR_ELEMENT, child)
+    root.add("nothing", dmx_export.ATTR_ELEMENT, None)
+    root.add("children", dmx_export.ATTR_ARRAY + dmx_export.ATTR_ELEMENT, [child, root])
+    child.add("count", dmx_export.ATTR_INT, -7)
+    child.add("scale", dmx_export.ATTR_FLOAT, 0.5)
+    child.add("visible", dmx_export.ATTR_BOOL, True)
+    child.add("label", dmx_export.ATTR_STRING, "ünïcode")
+    child.add("position", dmx_export.ATTR_VECTOR3, (1.0, 2.0, 3.0))
+    child.add("names", dmx_export.ATTR_ARRAY + dmx_export.ATTR_STRING, ["a", "bc"])
+    indices = np.arange(10, dtype=np.int32)
+    positions = np.arange(30, dtype=np.float32).reshape(10, 3)
+    child.add("indices", dmx_export.ATTR_ARRAY + dmx_export.ATTR_INT, indices)
+    child.add("positions", dmx_export.ATTR_ARRAY + dmx_export.ATTR_VECTOR3, positions)
+
+    path = tmp_path / "test.dmx"
+    steps = list(dmx.iter_write(str(path), chunk_size))
+    header, elements = read_dmx(path)
+
+    assert header == "<!-- dmx encoding binary 2 format model 18 -->\n"
+    assert [(type, name) for type, name, _ in elements] == [("DmElement", "root"), ("DmeThing", "child")]
+
+    root_attributes = elements[0][2]
+    assert root_attributes["child"] == (dmx_export.ATTR_ELEMENT, 1)
+    assert root_attributes["nothing"] == (dmx_export.ATTR_ELEMENT, -1)
+    assert list(root_attributes["children"][1]) == [1, 0]
+
+    child_attributes = elements[1][2]
+    assert child_attributes["count"][1] == -7
+    assert child_attributes["scale"][1] == 0.5
+    assert child_attributes["visible"][1] is True
+    assert child_attributes["label"][1] == "ünïcode"
+    assert child_attributes["position"][1] == (1.0, 2.0, 3.0)
+    assert child_attributes["names"][1] == ["a", "bc"]
+    np.testing.assert_array_equal(child_attributes["indices"][1], indices)
+    np.testing.assert_array_equal(child_attributes["positions"][1], positions)
+
+    # one step per element, and one per chunk of each large array
+    assert len(steps) == 2 + 2 * -(-10 // chunk_size)
+
+
+def test_write_dmx_indexes_every_corner(tmp_path):
+    arrays = grid_arrays(6, 0)
+    path = tmp_path / "mesh.dmx"
+    dmx_export.write_dmx(str(path), arrays, ["wall", "floor", "glass"], True, "mesh")
+    header, elements = read_dmx(path)
+
+    assert header == "<!-- dmx encoding binary 2 format model 18 -->\n"
+    by_type = {}
+    for type, name, attributes in elements:
+        by_type.setdefault(type, []).append(attributes)
+    assert len(by_type["DmeModel"]) == 1
+    assert len(by_type["DmeFaceSet"]) == 3
+
+    # the faces point at corners that have the positions the triangles had
+    vertex_data = by_type["DmeVertexData"][0]
+    positions = vertex_data["positions"][1]
+    position_indices = vertex_data["positionsIndices"][1]
+    corners = np.concatenate([face_set["faces"][1] for face_set in by_type["DmeFaceSet"]])
+    corners = corners[corners >= 0]
+    assert len(corners) == arrays.triangle_count * 3
+    expected = np.sort(arrays.positions[arrays.tri_verts].reshape(-1, 3), axis=0)
+    np.testing.assert_array_equal(np.sort(positions[position_indices[corners]], axis=0), expected)
@@ -0,0 +1,79 @@
+import numpy as np
+import pytest
+
+from automdl import islands
+
+
+def naive_components(vertex_count, edges):
+    """Union-find one edge at a time, labelled in order of each component's lowest vertex."""
+    parent = list(range(vertex_count))
+
+    def find(vertex):
+        while parent[vertex] != vertex:
+            parent[vertex] = parent[parent[vertex]]
+            vertex = parent[vertex]
+        return vertex
+
+    for a, b in edges:
+        root_a, root_b = find(int(a)), find(int(b))
+        if root_a != root_b:
+            parent[max(root_a, root_b)] = min(root_a, root_b)
+
+    labels = {}
+    result = np.empty(vertex_count, dtype=np.int32)
+    for vertex in range(vertex_count):
+        result[vertex] = labels.setdefault(find(vertex), len(labels))
+    return result, len(labels)
+
+
+def random_graph(seed):
+    rng = np.random.default_rng(seed)
+    vertex_count = int(rng.integers(1, 400))
+    edge_count = int(rng.integers(0, vertex_count * 2))
+    # few long chains and many small parts, in shuffled vertex order
+    edges = rng.integers(0, vertex_count, size=(edge_count, 2))
+    chain = rng.permutation(vertex_count)[:vertex_count // 3]
+    edges = np.concatenate([edges, np.stack([chain[:-1], chain[1:]], axis=1)]).astype(np.int32)
+    return vertex_count, edges[rng.permutation(len(edges))]
+
+
+def drain(steps):
+    while True:
+        try:
+            next(steps)
+        except StopIteration as finished:
+            return finished.value
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_connected_components_matches_naive_union_find(seed):
+    vertex_count, edges = random_graph(seed)
+    labels, count = islands.connected_components(vertex_count, edges)
+    expected_labels, expected_count = naive_components(vertex_count, edges)
+    assert count == expected_count
+    np.testing.assert_array_equal(labels, expected_labels)
+
+
+@pytest.mark.parametrize("seed", range(20))
+@pytest.mark.parametrize("chunk_size", [1, 7, 1 << 16])
+def test_chunked_components_match_naive_union_find(seed, chunk_size):
+    vertex_count, edges = random_graph(seed)
+    expected_labels, expected_count = naive_components(vertex_count, edges)
+
+    labels, count = drain(islands.iter_label_components(vertex_count, edges, chunk_size))
+    assert count == expected_count
+    np.testing.assert_array_equal(labels, expected_labels)
+
+    assert drain(islands.iter_count_components(vertex_count, edges, chunk_size)) == expected_count
+
+
+def test_connected_components_without_vertices():
+    labels, count = islands.connected_components(0, np.zeros((0, 2), dtype=np.int32))
+    assert count == 0
+    assert len(labels) == 0
+
+
+def test_island_faces_groups_faces_in_order():
+    mesh_islands = islands.MeshIslands(np.array([0, 0, 1, 2]), np.array([1, 0, 1, 0]), 3)
+    faces = mesh_islands.island_faces()
+    assert [list(island) for island in faces] == [[1, 3], [0, 2], []]
@@ -0,0 +1,94 @@
+import numpy as np
+import pytest
+
+from automdl import smd_export
+
+
+def grid_arrays(size, seed):
+    """A smooth grid whose triangles share their corners, like most meshes."""
+    rng = np.random.default_rng(seed)
+    x, y = np.meshgrid(np.arange(size + 1), np.arange(size + 1))
+    positions = np.stack([x.ravel(), y.ravel(), rng.normal(size=x.size)], axis=1).astype(np.float32)
+    normals = rng.normal(size=positions.shape).astype(np.float32)
+    normals /= np.linalg.norm(normals, axis=1)[:, None]
+
+    quads = (np.arange(size)[None, :] + np.arange(size)[:, None] * (size + 1)).ravel()
+    tri_verts = np.concatenate([
+        np.stack([quads, quads + 1, quads + size + 2], axis=1),
+        np.stack([quads, quads + size + 2, quads + size + 1], axis=1),
+    ]).astype(np.int32)
+    uvs = (positions[:, :2] / size).astype(np.float32)
+    material_indices = (np.arange(len(tri_verts)) % 3).astype(np.int32)
+    smooth = np.ones(len(tri_verts), dtype=bool)
+    return smd_export.MeshArrays(positions, normals, uvs, tri_verts, tri_verts.copy(), material_indices, smooth)
+
+
+def soup_arrays(count, seed):
+    """Triangles that share hardly anything, some flat shaded, some degenerate."""
+    rng = np.random.default_rng(seed)
+    positions = (rng.normal(size=(count, 3)) * 10).astype(np.float32)
+    # values that round to -0.000000 and 0.000000 at six decimals
+    positions[:4] = [[-1e-9, 1e-9, 0.0], [-0.0, 5e-7, -5e-7], [1.0, -0.0, 2.0], [0.5, 0.25, -1e-8]]
+    normals = rng.normal(size=(count, 3)).astype(np.float32)
+    normals /= np.linalg.norm(normals, axis=1)[:, None]
+    tri_verts = rng.integers(0, count, size=(count, 3)).astype(np.int32)
+    tri_verts[0] = [0, 0, 1]
+    tri_loops = np.arange(count * 3, dtype=np.int32).reshape(-1, 3)
+    uvs = rng.random(size=(count * 3, 2)).astype(np.float32)
+    # out of range material indices are clamped
+    material_indices = rng.integers(-1, 5, size=count).astype(np.int32)
+    smooth = rng.random(count) < 0.5
+    return smd_export.MeshArrays(positions, normals, uvs, tri_verts, tri_loops, material_indices, smooth)
+
+
+def reference_smd(arrays, material_names, use_flat_shading):
+    """The SMD as the exporter used to write it, one triangle at a time."""
+    text = [smd_export.SMD_HEADER]
+    for tri in range(arrays.triangle_count):
+        if len(material_names) == 1:
+            name = material_names[0]
+        else:
+            name = material_names[min(max(int(arrays.material_indices[tri]), 0), len(material_names) - 1)]
+
+        verts = arrays.tri_verts[tri]
+        normals = [arrays.normals[vert] for vert in verts]
+        if use_flat_shading and not arrays.smooth[tri]:
+            pos = arrays.positions[verts]
+            normals = [smd_export.flat_normals(pos[0:1], pos[1:2], pos[2:3])[0]] * 3
+
+        text.append(f"{name}\n")
+        for vert, loop, normal in zip(verts, arrays.tri_loops[tri], normals):
+            pos = arrays.positions[vert]
+            uv = arrays.uvs[loop]
+            text.append(f"0  {pos[0]:.6f} {pos[1]:.6f} {pos[2]:.6f}  {normal[0]:.6f} {normal[1]:.6f} {normal[2]:.6f}  {uv[0]:.6f} {uv[1]:.6f} 0\n")
+    text.append(smd_export.SMD_FOOTER)
+    return "".join(text)
+
+
+@pytest.mark.parametrize("arrays", [grid_arrays(12, 0), soup_arrays(300, 1)], ids=["shared", "soup"])
+@pytest.mark.parametrize("material_names", [["wall"], ["wall", "floor", "glass"]])
+@pytest.mark.parametrize("block_size", [7, smd_export.FORMAT_BLOCK_SIZE])
+def test_write_smd_matches_reference(tmp_path, arrays, material_names, block_size):
+    path = tmp_path / "mesh.smd"
+    smd_export.write_smd(str(path), arrays, material_names, True, block_size=block_size)
+    assert path.read_text() == reference_smd(arrays, material_names, True)
+
+
+def test_write_smd_smooth_only(tmp_path):
+    arrays = soup_arrays(50, 2)
+    path = tmp_path / "mesh.smd"
+    smd_export.write_smd(str(path), arrays, ["wall"], False)
+    assert path.read_text() == reference_smd(arrays, ["wall"], False)
+
+
+def test_write_smd_in_worker_processes(tmp_path):
+    arrays = soup_arrays(500, 3)
+    path = tmp_path / "mesh.smd"
+    smd_export.write_smd(str(path), arrays, ["wall", "floor"], True, block_size=64, workers=2, parallel_min_triangles=0)
+    assert path.read_text() == reference_smd(arrays, ["wall", "floor"], True)
+
+
+def test_iter_write_smd_counts_triangles(tmp_path):
+    arrays = grid_arrays(5, 4)
+    written = list(smd_export.iter_write_smd(str(tmp_path / "mesh.smd"), arrays, ["wall"], True, block_size=16))
+    assert written == [16, 32, 48, 50]
@@ -0,0 +1,310 @@
+"""VTF texture export.
+
+Converts RGBA pixels into a Valve Texture Format file: resized to powers of
+two, with a full mipmap chain, block compressed as DXT1 when the image is
+opaque and DXT5 when it has alpha. Compression is vectorized over all 4x4
+blocks of a mip at once with NumPy.
+
+Like smd_export, this module doesn't need bpy, so it can be imported in the
+worker processes of convert_textures. The pixels are read from the images
+on the main thread and handed to the workers in shared memory.
+"""
+
+import hashlib
+import multiprocessing
+import os
+import struct
+import time
+from collections import deque
+from multiprocessing import shared_memory
+
+import numpy as np
+
+# bump whenever the bytes written for the same pixels change, so unchanged textures get converted again
+CONVERTER_VERSION = 1
+
+VTF_VERSION = (7, 2)
+VTF_HEADER_SIZE = 80
+
+IMAGE_FORMAT_NONE = 0xFFFFFFFF
+IMAGE_FORMAT_DXT1 = 13
+IMAGE_FORMAT_DXT5 = 15
+
+TEXTUREFLAGS_EIGHTBITALPHA = 0x2000
+
+# largest side a texture is resized to, what the engine handles without complaint
+MAX_TEXTURE_SIZE = 4096
+
+# power iterations used to find the main color axis of a block
+COLOR_AXIS_ITERATIONS = 4
+
+PARTIAL_SUFFIX = ".automdl_partial"
+
+
+def power_of_two_size(size):
+    """The power of two nearest to size, at most MAX_TEXTURE_SIZE."""
+    return int(min(MAX_TEXTURE_SIZE, 2 ** round(np.log2(max(1, size)))))
+
+
+def resize(pixels, width, height):
+    """Bilinearly resample (h, w, c) float pixels to (height, width, c)."""
+    source_height, source_width = pixels.shape[:2]
+    if (source_width, source_height) == (width, height):
+        return pixels
+
+    ys = np.clip((np.arange(height) + 0.5) * source_height / height - 0.5, 0, source_height - 1)
+    xs = np.clip((np.arange(width) + 0.5) * source_width / width - 0.5, 0, source_width - 1)
+    y0 = np.floor(ys).astype(np.int64)
+    x0 = np.floor(xs).astype(np.int64)
+    y1 = np.minimum(y0 + 1, source_height - 1)
+    x1 = np.minimum(x0 + 1, source_width - 1)
+    fy = (ys - y0)[:, None, None].astype(np.float32)
+    fx = (xs - x0)[None, :, None].astype(np.float32)
+
+    top = pixels[y0][:, x0] * (1 - fx) + pixels[y0][:, x1] * fx
+    bottom = pixels[y1][:, x0] * (1 - fx) + pixels[y1][:, x1] * fx
+    return top * (1 - fy) + bottom * fy
+
+
+def mipmap_chain(pixels):
+    """(h, w, c) float pixels followed by every 2x2 box filtered mip down to 1x1."""
+    mips = [pixels]
+    while mips[-1].shape[0] > 1 or mips[-1].shape[1] > 1:
+        mip = mips[-1]
+        if mip.shape[0] > 1:
+            mip = (mip[0::2] + mip[1::2]) * 0.5
+        if mip.shape[1] > 1:
+            mip = (mip[:, 0::2] + mip[:, 1::2]) * 0.5
+        mips.append(mip)
+    return mips
+
+
+def to_blocks(pixels):
+    """Split (h, w, c) pixels into (blocks, 16, c) 4x4 blocks, row by row. Edges are padded by repeating them."""
+    height, width, channels = pixels.shape
+    padded_height = -(-height // 4) * 4
+    padded_width = -(-width // 4) * 4
+    if (padded_height, padded_width) != (height, width):
+        pixels = np.pad(pixels, ((0, padded_height - height), (0, padded_width - width), (0, 0)), mode="edge")
+    blocks = pixels.reshape(padded_height // 4, 4, padded_width // 4, 4, channels).transpose(0, 2, 1, 3, 4)
+    return blocks.reshape(-1, 16, channels)
+
+
+def pack_565(colors):
+    """(n, 3) colors in 0-255 to 16 bit 5:6:5, and the colors those decode back to."""
+    r = np.rint(colors[:, 0] * (31 / 255)).astype(np.uint16)
+    g = np.rint(colors[:, 1] * (63 / 255)).astype(np.uint16)
+    b = np.rint(colors[:, 2] * (31 / 255)).astype(np.uint16)
+    packed = (r << 11) | (g << 5) | b
+    decoded = np.stack([(r << 3) | (r >> 2), (g << 2) | (g >> 4), (b << 3) | (b >> 2)], axis=1).astype(np.float32)
+    return packed, decoded
+
+
+def compress_color_blocks(blocks):
+    """DXT1 color blocks for (n, 16, 3) float colors in 0-255. Returns (n, 8) bytes.
+
+    The endpoints are the block's extreme colors along its main axis (found by
+    power iteration on the color covariance), always in 4 color mode.
+    """
+    count = len(blocks)
+    mean = blocks.mean(axis=1)
+    centered = blocks - mean[:, None, :]
+    covariance = np.einsum("nki,nkj->nij", centered, centered)
+
+    axis = blocks.max(axis=1) - blocks.min(axis=1) + 1e-3
+    for _ in range(COLOR_AXIS_ITERATIONS):
+        axis = np.einsum("nij,nj->ni", covariance, axis)
+        axis /= np.maximum(np.linalg.norm(axis, axis=1, keepdims=True), 1e-12)
+
+    projection = np.einsum("nki,ni->nk", centered, axis)
+    rows = np.arange(count)
+    color0, decoded0 = pack_565(blocks[rows, projection.argmax(axis=1)])
+    color1, decoded1 = pack_565(blocks[rows, projection.argmin(axis=1)])
+
+    # 4 color mode needs color0 > color1
+    swap = color0 < color1
+    color0[swap], color1[swap] = color1[swap], color0[swap].copy()
+    decoded0[swap], decoded1[swap] = decoded1[swap], decoded0[swap].copy()
+
+    palette = np.stack([decoded0, decoded1, (2 * decoded0 + decoded1) / 3, (decoded0 + 2 * decoded1) / 3], axis=1)
+    distances = ((blocks[:, :, None, :] - palette[:, None, :, :]) ** 2).sum(axis=3)
+    indices = distances.argmin(axis=2).astype(np.uint32)
+    # equal endpoints would switch the block to 3 color mode, where index 3 is transparent
+    indices[color0 == color1] = 0
+
+    packed_indices = (indices << (2 * np.arange(16, dtype=np.uint32))).sum(axis=1, dtype=np.uint32)
+    out = np.empty(count, dtype=[("color0", "<u2"), ("color1", "<u2"), ("indices", "<u4")])
+    out["color0"] = color0
+    out["color1"] = color1
+    out["indices"] = packed_indices
+    return out.view(np.uint8).reshape(count, 8)
+
+
+def compress_alpha_blocks(alphas):
+    """DXT5 alpha blocks for (n, 16) float alphas in 0-255, in 8 alpha mode. Returns (n, 8) bytes."""
+    count = len(alphas)
+    alpha0 = np.rint(alphas.max(axis=1)).astype(np.uint8)
+    alpha1 = np.rint(alphas.min(axis=1)).astype(np.uint8)
+
+    a0 = alpha0.astype(np.float32)[:, None]
+    a1 = alpha1.astype(np.float32)[:, None]
+    weights = np.arange(1, 7, dtype=np.float32) / 7
+    palette = np.concatenate([a0, a1, a0 * (1 - weights) + a1 * weights], axis=1)
+    indices = np.abs(alphas[:, :, None] - palette[:, None, :]).argmin(axis=2).astype(np.uint64)
+    indices[alpha0 == alpha1] = 0
+
+    bits = (indices << (3 * np.arange(16, dtype=np.uint64))).sum(axis=1, dtype=np.uint64)
+    out = np.empty((count, 8), dtype=np.uint8)
+    out[:, 0] = alpha0
+    out[:, 1] = alpha1
+    out[:, 2:] = bits.astype("<u8").view(np.uint8).reshape(count, 8)[:, :6]
+    return out
+
+
+def compress_mip(mip, has_alpha):
+    blocks = to_blocks(mip)
+    colors = compress_color_blocks(blocks[:, :, :3])
+    if not has_alpha:
+        return colors.tobytes()
+    return np.concatenate([compress_alpha_blocks(blocks[:, :, 3]), colors], axis=1).tobytes()
+
+
+def encode_vtf(pixels):
+    """A complete VTF file for (h, w, 4) uint8 RGBA pixels, top row first. Returns (bytes, image format)."""
+    has_alpha = bool((pixels[:, :, 3] < 255).any())
+    image_format = IMAGE_FORMAT_DXT5 if has_alpha else IMAGE_FORMAT_DXT1
+    flags = TEXTUREFLAGS_EIGHTBITALPHA if has_alpha else 0
+
+    height, width = pixels.shape[:2]
+    target_width, target_height = power_of_two_size(width), power_of_two_size(height)
+    top = resize(pixels.astype(np.float32), target_width, target_height)
+    mips = mipmap_chain(top)
+
+    # linear average color, for vrad's bounce light
+    reflectivity = ((top[:, :, :3] / 255) ** 2.2).reshape(-1, 3).mean(axis=0)
+
+    header = struct.pack(
+        "<4s2IIHHIHH4x3f4xfIBIBBH",
+        b"VTF\0", VTF_VERSION[0], VTF_VERSION[1], VTF_HEADER_SIZE,
+        target_width, target_height, flags,
+        1, 0,
+        *reflectivity.tolist(),
+        1.0,
+        image_format, len(mips),
+        IMAGE_FORMAT_NONE, 0, 0,
+        1
+    ).ljust(VTF_HEADER_SIZE, b"\0")
+
+    # mips are stored smallest first
+    data = [compress_mip(mip, has_alpha) for mip in reversed(mips)]
+    return header + b"".join(data), image_format
+
+
+def write_vtf(path, pixels):
+    """Encode and write a VTF, replacing path only once it's complete. Returns the image format used."""
+    data, image_format = encode_vtf(pixels)
+    partial = path + PARTIAL_SUFFIX
+    with open(partial, "wb") as file:
+        file.write(data)
+    os.replace(partial, path)
+    return image_format
+
+
+def texture_key(source):
+    """Hash of what a texture is converted from: the image file's bytes, or its pixels when it has no file."""
+    digest = hashlib.blake2b(digest_size=20)
+    digest.update(f"automdl vtf {CONVERTER_VERSION}\n".encode("utf-8"))
+    if isinstance(source, np.ndarray):
+        digest.update(f"{source.shape}\n".encode("utf-8"))
+        digest.update(np.ascontiguousarray(source).tobytes())
+    else:
+        digest.update(source)
+    return digest.hexdigest()
+
+
+def convert_shared(task):
+    """Worker process side: attach to the shared pixels and write the VTF. Returns (path, image format, seconds)."""
+    name, shape, path = task
+    start = time.perf_counter()
+    block = shared_memory.SharedMemory(name=name)
+    try:
+        pixels = np.ndarray(shape, np.uint8, buffer=block.buf)
+        image_format = write_vtf(path, pixels)
+        # the view must be gone before the block can be closed
+        del pixels
+    finally:
+        block.close()
+    return path, image_format, time.perf_counter() - start
+
+
+def convert_textures(sources, workers):
+    """Write a VTF for every (path, pixels) in sources, with up to workers processes at once.
+
+    sources may be a generator reading the pixels only when asked: it is
+    consumed on the calling thread, a couple of textures ahead of the
+    workers, so reading the next image overlaps with compressing the last.
+    Returns (path, image format, seconds) for every texture, in order.
+    """
+    steps = iter_convert_textures(sources, workers, wait=True)
+    while True:
+        try:
+            next(steps)
+        except StopIteration as finished:
+            return finished.value
+
+
+def iter_convert_textures(sources, workers, wait=False):
+    """convert_textures as a generator, for running from a timer.
+
+    Yields after every texture read from sources and, unless wait is set,
+    whenever the next result isn't ready yet instead of waiting for it. Then
+    even a single texture goes to a worker process, so the calling thread
+    never compresses. Without worker processes every step converts a
+    texture. Closing it early stops the workers, the VTFs they were writing
+    are left unfinished under their PARTIAL_SUFFIX name.
+    """
+    from . import smd_export
+    worker_module = smd_export.get_worker_module("vtf_export")
+    if worker_module is None or (workers <= 1 and wait):
+        results = []
+        for path, pixels in sources:
+            start = time.perf_counter()
+            results.append((path, write_vtf(path, pixels), time.perf_counter() - start))
+            yield
+        return results
+
+    results = []
+    in_flight = deque()
+    sources = iter(sources)
+    exhausted = False
+    with multiprocessing.get_context("spawn").Pool(workers) as pool:
+        try:
+            while not exhausted or in_flight:
+                if not exhausted and len(in_flight) < workers * 2:
+                    source = next(sources, None)
+                    if source is None:
+                        exhausted = True
+                        continue
+                    path, pixels = source
+                    block = shared_memory.SharedMemory(create=True, size=max(pixels.nbytes, 1))
+                    np.ndarray(pixels.shape, np.uint8, buffer=block.buf)[...] = pixels
+                    task = (block.name, pixels.shape, path)
+                    in_flight.append((block, pool.apply_async(worker_module.convert_shared, (task,))))
+                    yield
+                    continue
+
+                block, result = in_flight[0]
+                if not wait and not result.ready():
+                    yield
+                    continue
+                in_flight.popleft()
+                try:
+                    results.append(result.get())
+                finally:
+                    block.close()
+                    block.unlink()
+        finally:
+            for block, _ in in_flight:
+                block.close()
+                block.unlink()
+    return results
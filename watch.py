@@ -0,0 +1,40 @@
+"""Debouncing for watch mode.
+
+Saves and edits to the watched meshes only ever call trigger(). A compile is
+due once no trigger arrived for the debounce interval, and however many
+triggers came in before that, they all end up as one compile of the latest
+state. The time of the first trigger is kept, so the latency from the save or
+edit to the compiled model can be shown.
+"""
+
+
+class WatchScheduler:
+
+    def __init__(self):
+        self.first_trigger = None
+        self.last_trigger = None
+        self.trigger_count = 0
+
+    @property
+    def pending(self):
+        return self.first_trigger is not None
+
+    def trigger(self, now):
+        if self.first_trigger is None:
+            self.first_trigger = now
+        self.last_trigger = now
+        self.trigger_count += 1
+
+    def remaining(self, now, debounce):
+        """Seconds until a compile is due, 0 when it is, None when nothing is pending."""
+        if self.last_trigger is None:
+            return None
+        return max(0.0, self.last_trigger + debounce - now)
+
+    def take(self):
+        """Claim the pending compile. Returns (time of the first trigger, triggers coalesced into it)."""
+        taken = (self.first_trigger, self.trigger_count)
+        self.first_trigger = None
+        self.last_trigger = None
+        self.trigger_count = 0
+        return taken
@@ -0,0 +1,144 @@
+"""Running studiomdl.exe on Linux, through Wine or Proton.
+
+Steam is looked for in the usual Linux places, and studiomdl.exe is started
+with Wine in a prefix of the addon's own. A cold Wine start (launching
+wineserver, checking the prefix, starting its services) costs seconds, so a
+WineSession keeps a persistent wineserver and one idle Wine process running
+between compiles, which leaves just the start of studiomdl itself.
+
+Only files that really are Windows executables go through Wine. Anything
+else named studiomdl.exe (a script standing in for it in tests) is run
+directly.
+"""
+
+import os
+import shutil
+import subprocess
+
+# where Steam ends up on Linux: the ~/.steam symlinks, the default install, and the Flatpak
+STEAM_CANDIDATES = [
+    "~/.steam/steam",
+    "~/.steam/root",
+    "~/.local/share/Steam",
+    "~/.var/app/com.valvesoftware.Steam/.local/share/Steam",
+]
+
+# Wine to use instead of looking for one, e.g. a specific Proton build's files/bin/wine
+WINE_ENVIRONMENT_VARIABLE = "AUTOMDL_WINE"
+
+# where Proton keeps its Wine, newer builds first
+PROTON_WINE_PATHS = [
+    os.path.join("files", "bin", "wine"),
+    os.path.join("dist", "bin", "wine"),
+]
+
+
+def find_steam_path():
+    """Steam's installation folder on Linux, or None."""
+    for candidate in STEAM_CANDIDATES:
+        path = os.path.realpath(os.path.expanduser(candidate))
+        if os.path.isdir(os.path.join(path, "steamapps")):
+            return path
+    return None
+
+
+def is_windows_executable(path):
+    """True for PE files (starting with MZ), the ones that need Wine to run."""
+    try:
+        with open(path, "rb") as file:
+            return file.read(2) == b"MZ"
+    except OSError:
+        return False
+
+
+def find_proton_wine(libraries):
+    """Wine of the newest looking Proton in any of the Steam libraries, or None."""
+    candidates = []
+    for library in libraries:
+        common = os.path.join(library, "steamapps", "common")
+        if not os.path.isdir(common):
+            continue
+        for name in os.listdir(common):
+            if name.startswith("Proton"):
+                for wine_path in PROTON_WINE_PATHS:
+                    path = os.path.join(common, name, wine_path)
+                    if os.access(path, os.X_OK):
+                        candidates.append((name, path))
+                        break
+
+    # by name, which puts e.g. "Proton 9.0" after "Proton 8.0"
+    candidates.sort()
+    return candidates[-1][1] if candidates else None
+
+
+def find_wine(libraries=()):
+    """Wine to run studiomdl.exe with: $AUTOMDL_WINE, then wine on the PATH, then Proton's. None if there is none."""
+    wine = os.environ.get(WINE_ENVIRONMENT_VARIABLE)
+    if wine:
+        return wine
+    return shutil.which("wine") or shutil.which("wine64") or find_proton_wine(libraries)
+
+
+def to_wine_path(arg):
+    """Absolute Unix paths as Windows sees them through the Z: drive every prefix has, anything else unchanged."""
+    if isinstance(arg, str) and os.path.isabs(arg) and os.path.exists(arg):
+        return "Z:" + arg.replace("/", "\\")
+    return arg
+
+
+class WineSession:
+    """A Wine prefix to run studiomdl.exe in, kept warm between compiles."""
+
+    def __init__(self, wine, prefix):
+        self.wine = wine
+        self.prefix = prefix
+        # wineserver is installed next to wine, in Proton as well
+        sibling = os.path.join(os.path.dirname(wine), "wineserver")
+        self.wineserver = sibling if os.access(sibling, os.X_OK) else (shutil.which("wineserver") or "wineserver")
+        self.keeper = None
+
+    @property
+    def env(self):
+        env = dict(os.environ)
+        env["WINEPREFIX"] = self.prefix
+        # no console noise in the compile log, and no prompts to install Mono and Gecko when the prefix is made
+        env["WINEDEBUG"] = "-all"
+        env["WINEDLLOVERRIDES"] = "mscoree,mshtml="
+        return env
+
+    def command(self, args):
+        """args (a Windows executable and its arguments) as a command running them under Wine."""
+        return [self.wine] + [to_wine_path(arg) for arg in args]
+
+    @property
+    def is_warm(self):
+        return self.keeper is not None and self.keeper.poll() is None
+
+    def warm(self):
+        """Start a wineserver that stays up, and an idle process keeping the prefix's services running.
+
+        Doesn't wait for either, the first start of a new prefix takes a while
+        and compiles started meanwhile simply wait for it inside Wine.
+        """
+        if self.is_warm:
+            return self
+        os.makedirs(self.prefix, exist_ok=True)
+        env = self.env
+        subprocess.Popen([self.wineserver, "--persistent"], env=env, stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        # cmd.exe waits on its stdin, which stays open until stop()
+        self.keeper = subprocess.Popen([self.wine, "cmd.exe"], env=env, stdin=subprocess.PIPE, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        return self
+
+    def stop(self):
+        """Let the idle process go and shut the prefix's wineserver down."""
+        if self.keeper is not None:
+            try:
+                self.keeper.stdin.close()
+                self.keeper.wait(timeout=5)
+            except (OSError, subprocess.TimeoutExpired):
+                self.keeper.kill()
+            self.keeper = None
+        try:
+            subprocess.run([self.wineserver, "--kill"], env=self.env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, timeout=10)
+        except (OSError, subprocess.TimeoutExpired):
+            pass
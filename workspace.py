@@ -0,0 +1,94 @@
+"""Per-compile working folders, and getting files where they belong.
+
+Every compile exports its meshes and QC into a folder of its own, so
+compiles never see each other's files. Files are put in place by renaming or
+hardlinking them whenever source and destination are on the same filesystem,
+and only copied (buffered, next to the destination, then renamed over it) when
+they aren't, so a destination is never seen half written.
+"""
+
+import errno
+import os
+import shutil
+import tempfile
+
+# suffix of the file a copy is written to before it replaces its destination
+PARTIAL_SUFFIX = ".automdl_partial"
+
+
+def create_job_folder(root):
+    """A new, empty folder under root for one compile."""
+    os.makedirs(root, exist_ok=True)
+    return tempfile.mkdtemp(prefix="job_", dir=root)
+
+
+def remove_job_folder(path):
+    shutil.rmtree(path, ignore_errors=True)
+
+
+def missing_folders(path, root):
+    """Folders between root (not included) and path that don't exist yet, deepest first.
+
+    Recorded before studiomdl runs, so exactly the folders it creates in the
+    game can be removed again afterwards.
+    """
+    root = os.path.normpath(root)
+    path = os.path.normpath(path)
+    missing = []
+    while path.startswith(root + os.sep) and not os.path.isdir(path):
+        missing.append(path)
+        path = os.path.dirname(path)
+    return missing
+
+
+def remove_empty_folders(folders):
+    """Remove those of folders that are empty, deepest first, so emptied parents go too."""
+    for folder in sorted(set(folders), key=len, reverse=True):
+        try:
+            os.rmdir(folder)
+        except OSError:
+            # not empty (or already gone), either way it stays as it is
+            pass
+
+
+def copy_file(src, dst):
+    partial = dst + PARTIAL_SUFFIX
+    try:
+        shutil.copyfile(src, partial)
+        os.replace(partial, dst)
+    except:
+        if os.path.exists(partial):
+            os.remove(partial)
+        raise
+
+
+def move_file(src, dst):
+    """Move src to dst, replacing dst. Returns "renamed", or "copied" when they are on different filesystems."""
+    try:
+        os.replace(src, dst)
+        return "renamed"
+    except OSError as e:
+        if e.errno != errno.EXDEV:
+            raise
+
+    copy_file(src, dst)
+    os.remove(src)
+    return "copied"
+
+
+def link_file(src, dst):
+    """Make dst a hardlink of src, replacing dst. Returns "linked", or "copied" where hardlinks aren't possible.
+
+    Only for files nobody writes to in place: both names share the same data.
+    """
+    partial = dst + PARTIAL_SUFFIX
+    if os.path.exists(partial):
+        os.remove(partial)
+    try:
+        os.link(src, partial)
+    except OSError:
+        copy_file(src, dst)
+        return "copied"
+
+    os.replace(partial, dst)
+    return "linked"